@@ -2,6 +2,8 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn core.asgi:application``) when
+GOOGLE_SHEETS_ASYNC_VIEWS is enabled.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
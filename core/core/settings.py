@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapi.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -115,7 +116,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'myapi.authentication.TimedJWTAuthentication',
     ],
 }
 
@@ -131,6 +132,11 @@ SIMPLE_JWT = {
 # Allow credentials for CORS (for token-based auth)
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend send and read HTTP cache validators and resume event streams
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-match', 'last-event-id')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'Retry-After']
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -156,3 +162,106 @@ GOOGLE_SHEETS_CREDENTIALS_FILE = BASE_DIR / 'credentials.json'
 # The ID is the long string in the sheet URL: https://docs.google.com/spreadsheets/d/SPREADSHEET_ID/edit
 GOOGLE_SHEETS_SPREADSHEET_ID = '1OQ46p-3KdKGB7o3fxRS3rLG99Y_kRTmTtWCehiN5C0E'
 
+# Seconds a cached snapshot of the sheet is served before re-reading it.
+# Set to 0 to read the sheet on every request.
+GOOGLE_SHEETS_CACHE_TTL = 30
+
+# Write-behind mode: apply mutations to the local snapshot immediately and
+# send them to the sheet in coalesced batches from a background thread.
+# Pending mutations are journaled to GOOGLE_SHEETS_JOURNAL_FILE.
+GOOGLE_SHEETS_WRITE_BEHIND = False
+GOOGLE_SHEETS_JOURNAL_FILE = BASE_DIR / 'sheets_journal.jsonl'
+GOOGLE_SHEETS_FLUSH_INTERVAL = 5
+GOOGLE_SHEETS_FLUSH_BATCH_SIZE = 500
+
+# Maximum number of gspread clients (each with its own keep-alive HTTP
+# session) a worker process uses concurrently.
+GOOGLE_SHEETS_POOL_SIZE = 4
+
+# Sheets API quota per worker process: requests per minute for reads and for
+# writes, and how many may be sent back to back. Google's default quota is 60
+# per minute per user for each, so divide it among worker processes.
+# 429/5xx responses are retried up to GOOGLE_SHEETS_MAX_RETRIES times.
+GOOGLE_SHEETS_READS_PER_MINUTE = 60
+GOOGLE_SHEETS_WRITES_PER_MINUTE = 60
+GOOGLE_SHEETS_RATE_BURST = 5
+GOOGLE_SHEETS_MAX_RETRIES = 5
+
+# Serve the sheet-items list/detail endpoints with async views that call the
+# Sheets REST API through httpx. Run the project under ASGI (core/asgi.py),
+# e.g. `uvicorn core.asgi:application`, to keep many requests in flight.
+GOOGLE_SHEETS_ASYNC_VIEWS = False
+GOOGLE_SHEETS_ASYNC_MAX_CONNECTIONS = 100
+
+# Seconds between sheet reloads while clients are subscribed to the
+# /api/sheet-items/events/ change stream, to pick up edits made outside the API.
+GOOGLE_SHEETS_FEED_POLL_INTERVAL = 10
+
+# Seconds between background checks of the spreadsheet's Drive modifiedTime;
+# the sheet is only re-read when it moved, and only changed rows are applied
+# to the snapshot. Lets GOOGLE_SHEETS_CACHE_TTL be long while still picking up
+# edits made in the Sheets UI. 0 disables the background sync thread.
+GOOGLE_SHEETS_SYNC_INTERVAL = 0
+
+# Mirror mode: keep a copy of the sheet's rows in the database (SheetRow,
+# indexed by id and email) and serve reads from it while it was synced from
+# the sheet within GOOGLE_SHEETS_MIRROR_MAX_STALENESS seconds, so processes
+# don't each read the sheet. Writes still go to the sheet and are written
+# through. Keep it synced with GOOGLE_SHEETS_SYNC_INTERVAL or a
+# `manage.py sync_sheet` process. Requires `manage.py migrate`.
+GOOGLE_SHEETS_MIRROR = False
+GOOGLE_SHEETS_MIRROR_MAX_STALENESS = 60
+
+# Store behind the sheet-items API: 'sheets' (Google Sheets), 'database'
+# (the SheetRow table), 'memory' (process-local, for offline load tests),
+# 'sharded' (several worksheets or spreadsheets, see below) or a dotted path to a myapi.storage.StorageBackend subclass.
+SHEET_ITEMS_BACKEND = 'sheets'
+# Seconds the database backend serves its in-process snapshot before
+# re-reading the table, and the SheetRow.sheet value holding its rows.
+SHEET_ITEMS_CACHE_TTL = 5
+SHEET_ITEMS_DATABASE_NAME = 'items'
+
+# Shards of the 'sharded' backend (myapi.sharding): each a dict with a 'name'
+# and the 'spreadsheet_id' (default: GOOGLE_SHEETS_SPREADSHEET_ID) and
+# 'worksheet' title (default: the first worksheet) holding its rows, e.g.
+# [{'name': 'a', 'worksheet': 'Items A'}, {'name': 'b', 'worksheet': 'Items B'}].
+# Rows are placed by a hash of their 'id' or their owner 'email'
+# (GOOGLE_SHEETS_SHARD_KEY); by email, a user's listing reads one shard.
+# To reshard, set GOOGLE_SHEETS_PREVIOUS_SHARDS to the old list while
+# `manage.py reshard_sheet` moves rows, then set it back to None.
+GOOGLE_SHEETS_SHARDS = []
+GOOGLE_SHEETS_SHARD_KEY = 'id'
+GOOGLE_SHEETS_PREVIOUS_SHARDS = None
+
+# Serve the Sheets and Drive API calls from an in-memory fake spreadsheet
+# (myapi.fake_sheets.FakeSheets) instead of Google, for offline development,
+# CI and load tests. Set to a dict of FakeSheets options, e.g.
+# {'latency': 0.2, 'reads_per_minute': 60, 'writes_per_minute': 60}; None uses
+# the real spreadsheet.
+GOOGLE_SHEETS_FAKE = None
+
+# Request metrics (myapi.metrics.RequestMetricsMiddleware): every response
+# gets a Server-Timing header breaking down auth, Sheets calls, filtering and
+# rendering, one JSON line per request is logged to 'myapi.requests', and
+# Prometheus metrics are served at /metrics.
+#
+# /metrics only answers clients whose address is in METRICS_ALLOWED_IPS, or
+# that send METRICS_TOKEN as a bearer token (Authorization: Bearer <token>,
+# e.g. Prometheus's authorization credentials). Set the token to a long
+# random string to let a remote scraper in; None disables token access.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = None
+# Also export the backend's cache/pool/quota/shard gauges. They reveal
+# internals of the deployment, so they are off unless enabled here.
+METRICS_INCLUDE_BACKEND_STATS = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'myapi.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.urls import path, include
 from django.contrib import admin
+from myapi.metrics import metrics_view
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -25,5 +26,6 @@ urlpatterns = [
     path('api/', include('myapi.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('admin/', admin.site.urls)
+    path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -4,6 +4,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
 from myapi.google_sheets import sheets_service
+from myapi.rate_limit import BATCH, set_priority
+
+set_priority(BATCH)
 
 # Define 10 items, one for each user
 items_data = [
@@ -29,13 +32,12 @@ try:
 except Exception as e:
     print(f"⚠️  Email column: {e}")
 
-# Add items
-for item in items_data:
-    try:
-        created = sheets_service.create_row(item, user_email=item['email'])
-        print(f"✅ Added: ID {created['id']} | {item['name']} | {item['email']}")
-    except Exception as e:
-        print(f"❌ Error adding {item['name']}: {e}")
+# Add all items with a single batch append
+try:
+    for created in sheets_service.create_rows(items_data):
+        print(f"✅ Added: ID {created['id']} | {created['name']} | {created['email']}")
+except Exception as e:
+    print(f"❌ Error adding items: {e}")
 
 print("-" * 60)
 print("Done! Check your Google Sheet for the new data.")
@@ -8,9 +8,12 @@ import LoginPage from './components/LoginPage';
 import { api } from './services/api';
 import './App.css';
 
+const PAGE_SIZE = 100;
+
 function AppContent() {
   const { isAuthenticated, loading: authLoading } = useAuth();
   const [items, setItems] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
   const [formOpen, setFormOpen] = useState(false);
   const [editItem, setEditItem] = useState(null);
@@ -25,12 +28,33 @@ function AppContent() {
     }
   }, [isAuthenticated]);
 
+  // Apply changes made elsewhere (other users, other tabs, the sheet itself)
+  useEffect(() => {
+    if (!isAuthenticated) {
+      return;
+    }
+    return api.watchItems((event) => {
+      if (event.type === 'reset') {
+        fetchItems();
+      } else if (event.type === 'create') {
+        setItems(current => current.some(item => item.id === event.id)
+          ? current
+          : [...current, event.row]);
+      } else if (event.type === 'update') {
+        setItems(current => current.map(item => item.id === event.id ? event.row : item));
+      } else if (event.type === 'delete') {
+        setItems(current => current.filter(item => item.id !== event.id));
+      }
+    });
+  }, [isAuthenticated]);
+
   const fetchItems = async () => {
     setLoading(true);
     setError('');
     try {
-      const data = await api.getItems();
-      setItems(data);
+      const page = await api.getItemsPage({ limit: PAGE_SIZE });
+      setItems(page.results);
+      setNextPage(page.next);
     } catch (err) {
       setError('Failed to load items. Make sure the Django server is running.');
       console.error(err);
@@ -39,6 +63,17 @@ function AppContent() {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const page = await api.getItemsPage({ next: nextPage });
+      setItems(current => [...current, ...page.results]);
+      setNextPage(page.next);
+    } catch (err) {
+      setError('Failed to load more items.');
+      console.error(err);
+    }
+  };
+
   const handleAddClick = () => {
     setEditItem(null);
     setFormOpen(true);
@@ -53,11 +88,13 @@ function AppContent() {
     if (id) {
       // Update existing item
       const updated = await api.updateItem(id, data);
-      setItems(items.map(item => item.id === id ? updated : item));
+      setItems(current => current.map(item => item.id === id ? updated : item));
     } else {
-      // Create new item
+      // Create new item (its change event may have added it already)
       const newItem = await api.createItem(data);
-      setItems([...items, newItem]);
+      setItems(current => current.some(item => item.id === newItem.id)
+        ? current
+        : [...current, newItem]);
     }
   };
 
@@ -69,7 +106,7 @@ function AppContent() {
     setDeleteLoading(true);
     try {
       await api.deleteItem(id);
-      setItems(items.filter(item => item.id !== id));
+      setItems(current => current.filter(item => item.id !== id));
       setDeleteItem(null);
     } catch (err) {
       console.error(err);
@@ -110,6 +147,12 @@ function AppContent() {
           onEdit={handleEditClick}
           onDelete={handleDeleteClick}
         />
+
+        {!loading && nextPage && (
+          <div className="load-more">
+            <button onClick={loadMore}>Load more</button>
+          </div>
+        )}
       </main>
 
       <ItemForm
@@ -63,6 +63,58 @@ const authFetch = async (url, options = {}) => {
     return response;
 };
 
+// Last response body and ETag per URL, used to revalidate GETs
+const validatorCache = new Map();
+
+// GET JSON, sending If-None-Match so unchanged data comes back as 304
+const getJson = async (url, errorMessage) => {
+    const cached = validatorCache.get(url);
+    const response = await authFetch(url, {
+        headers: cached ? { 'If-None-Match': cached.etag } : {},
+    });
+    if (response.status === 304 && cached) {
+        return cached.data;
+    }
+    if (!response.ok) {
+        throw new Error(errorMessage);
+    }
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        validatorCache.set(url, { etag, data });
+    }
+    return data;
+};
+
+// If-Match header for writing an item, so edits of stale data get a 412
+const ifMatchHeaders = (url) => {
+    const cached = validatorCache.get(url);
+    return cached ? { 'If-Match': cached.etag } : {};
+};
+
+// Parse Server-Sent Events messages out of a text buffer, returning the unparsed rest
+const parseEvents = (buffer, onMessage) => {
+    const blocks = buffer.split('\n\n');
+    const rest = blocks.pop();
+    for (const block of blocks) {
+        const message = { id: null, event: 'message', data: '' };
+        for (const line of block.split('\n')) {
+            const [field, ...value] = line.split(':');
+            const text = value.join(':').replace(/^ /, '');
+            if (field === 'id') message.id = text;
+            else if (field === 'event') message.event = text;
+            else if (field === 'data') message.data += text;
+        }
+        if (message.data) {
+            onMessage(message);
+        }
+    }
+    return rest;
+};
+
+// Milliseconds to wait before reconnecting a dropped event stream
+const RECONNECT_DELAY = 3000;
+
 export const api = {
     // Login - obtain JWT tokens
     async login(username, password) {
@@ -84,20 +136,28 @@ export const api = {
 
     // Get all items
     async getItems() {
-        const response = await authFetch(`${API_BASE_URL}/sheet-items/`);
-        if (!response.ok) {
-            throw new Error('Failed to fetch items');
+        return getJson(`${API_BASE_URL}/sheet-items/`, 'Failed to fetch items');
+    },
+
+    // Get one page of items; pass the previous page's `next` URL to continue
+    async getItemsPage({ limit = 100, ordering, q, next } = {}) {
+        let url = next;
+        if (!url) {
+            const params = new URLSearchParams({ limit, cursor: '' });
+            if (ordering) {
+                params.set('ordering', ordering);
+            }
+            if (q) {
+                params.set('q', q);
+            }
+            url = `${API_BASE_URL}/sheet-items/?${params}`;
         }
-        return response.json();
+        return getJson(url, 'Failed to fetch items');
     },
 
     // Get single item by ID
     async getItem(id) {
-        const response = await authFetch(`${API_BASE_URL}/sheet-items/${id}/`);
-        if (!response.ok) {
-            throw new Error('Item not found');
-        }
-        return response.json();
+        return getJson(`${API_BASE_URL}/sheet-items/${id}/`, 'Item not found');
     },
 
     // Create new item
@@ -118,28 +178,129 @@ export const api = {
 
     // Update item
     async updateItem(id, data) {
-        const response = await authFetch(`${API_BASE_URL}/sheet-items/${id}/`, {
+        const url = `${API_BASE_URL}/sheet-items/${id}/`;
+        const response = await authFetch(url, {
             method: 'PUT',
             headers: {
                 'Content-Type': 'application/json',
+                ...ifMatchHeaders(url),
             },
             body: JSON.stringify(data),
         });
         if (!response.ok) {
+            validatorCache.delete(url);
             const error = await response.json();
             throw new Error(error.error || 'Failed to update item');
         }
-        return response.json();
+        const item = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            validatorCache.set(url, { etag, data: item });
+        }
+        return item;
     },
 
     // Delete item
     async deleteItem(id) {
-        const response = await authFetch(`${API_BASE_URL}/sheet-items/${id}/`, {
+        const url = `${API_BASE_URL}/sheet-items/${id}/`;
+        const response = await authFetch(url, {
             method: 'DELETE',
+            headers: ifMatchHeaders(url),
         });
+        validatorCache.delete(url);
         if (!response.ok && response.status !== 204) {
             throw new Error('Failed to delete item');
         }
         return true;
     },
+
+    // Create many items in one request (returns per-item results)
+    async createItems(items) {
+        const response = await authFetch(`${API_BASE_URL}/sheet-items/bulk/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(items),
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to create items');
+        }
+        return (await response.json()).results;
+    },
+
+    // Update many items in one request (each item needs an id)
+    async updateItems(items) {
+        const response = await authFetch(`${API_BASE_URL}/sheet-items/bulk/`, {
+            method: 'PUT',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(items),
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to update items');
+        }
+        return (await response.json()).results;
+    },
+
+    // Delete many items by id in one request
+    async deleteItems(ids) {
+        const response = await authFetch(`${API_BASE_URL}/sheet-items/bulk/`, {
+            method: 'DELETE',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(ids),
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to delete items');
+        }
+        return (await response.json()).results;
+    },
+
+    // Watch item changes; onEvent gets { type, id, row } for 'create',
+    // 'update' and 'delete', and { type: 'reset' } when the items must be
+    // reloaded. Reconnects on errors. Returns a function that stops watching.
+    watchItems(onEvent) {
+        const controller = new AbortController();
+        let lastEventId = null;
+
+        const connect = async () => {
+            while (!controller.signal.aborted) {
+                try {
+                    // fetch rather than EventSource, which can't send the token
+                    const response = await authFetch(`${API_BASE_URL}/sheet-items/events/`, {
+                        headers: lastEventId ? { 'Last-Event-ID': lastEventId } : {},
+                        signal: controller.signal,
+                    });
+                    if (!response.ok) {
+                        throw new Error('Failed to watch items');
+                    }
+                    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                    let buffer = '';
+                    for (;;) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer = parseEvents(buffer + value, (message) => {
+                            if (message.id) {
+                                lastEventId = message.id;
+                            }
+                            onEvent({ type: message.event, ...JSON.parse(message.data) });
+                        });
+                    }
+                } catch (err) {
+                    if (controller.signal.aborted) return;
+                    console.error(err);
+                }
+                await new Promise(resolve => setTimeout(resolve, RECONNECT_DELAY));
+            }
+        };
+
+        connect();
+        return () => controller.abort();
+    },
 };
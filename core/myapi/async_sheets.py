@@ -0,0 +1,473 @@
+"""
+Async Google Sheets Service Module
+
+This module provides an asyncio-native counterpart of GoogleSheetsService.
+It calls the Sheets v4 REST API through a pooled httpx client, so a single
+process can keep hundreds of sheet requests in flight instead of blocking
+a worker per request. The snapshot cache, indexes, id allocator and
+write-behind queue are shared with the synchronous service.
+"""
+
+import asyncio
+import threading
+import weakref
+from urllib.parse import quote
+
+import httpx
+from asgiref.sync import sync_to_async
+from google.auth.transport.requests import Request
+from gspread.utils import numericise_all
+from django.conf import settings
+
+from .google_sheets import RowMovedError, sheets_service
+from .metrics import sheets_call
+
+SHEETS_API_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+OPERATIONS = {
+    ('GET', ''): 'spreadsheets.get',
+    ('POST', ':batchUpdate'): 'spreadsheets.batchUpdate',
+    ('GET', '/values:batchGet'): 'values.batchGet',
+    ('POST', '/values:batchUpdate'): 'values.batchUpdate',
+}
+
+
+def api_operation(method, path):
+    """
+    Name a REST call for request metrics, e.g. 'values.batchGet'.
+
+    Args:
+        method: HTTP method.
+        path: Path relative to the spreadsheet.
+
+    Returns:
+        str: The API method name.
+    """
+    if path.startswith('/values/'):
+        if path.endswith(':append'):
+            return 'values.append'
+        return 'values.get' if method == 'GET' else 'values.update'
+    return OPERATIONS.get((method, path), f'{method} {path}')
+
+
+def to_records(values):
+    """
+    Convert a sheet's values to records, like gspread's get_all_records.
+
+    Args:
+        values: Rows of cell values, the first being the header row.
+
+    Returns:
+        list: List of dictionaries keyed by header.
+    """
+    if not values:
+        return []
+    headers = values[0]
+    records = []
+    for row in values[1:]:
+        row = list(row) + [''] * (len(headers) - len(row))
+        records.append(dict(zip(headers, numericise_all(row))))
+    return records
+
+
+class AsyncGoogleSheetsService:
+    """Async service class for Google Sheets CRUD operations."""
+
+    def __init__(self, service, max_connections=100, timeout=30):
+        """
+        Initialize the async service.
+
+        Args:
+            service: The GoogleSheetsService whose cache and state are shared.
+            max_connections: Maximum concurrent connections to the Sheets API.
+            timeout: Seconds before a Sheets API request times out.
+        """
+        self._service = service
+        self._url = f'{SHEETS_API_URL}/{service.spreadsheet_id}'
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        self._timeout = timeout
+        # Answer from the service's stand-in API (e.g. the fake sheet), if any
+        self._transport = service._api.transport() if service._api is not None else None
+        # httpx clients are bound to the event loop they were created in
+        self._clients = weakref.WeakKeyDictionary()
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        self._worksheet = None
+
+    def _client(self):
+        """Get the HTTP client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=self._limits, timeout=self._timeout, transport=self._transport
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the HTTP client of the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def _load_credentials(self):
+        """Load or refresh OAuth2 credentials (blocking, run in a thread)."""
+        with self._credentials_lock:
+            if self._credentials is None:
+                self._credentials = self._service._get_credentials()
+            elif not self._credentials.valid:
+                self._credentials.refresh(Request())
+            return self._credentials
+
+    async def _request(self, method, path, idempotent=True, **kwargs):
+        """
+        Send an authorized request to the spreadsheet's REST endpoint.
+
+        Requests share the sync service's read/write quota buckets, and
+        429/5xx responses are retried with backoff.
+
+        Args:
+            method: HTTP method; GET counts against the read quota, others
+                    against the write quota.
+            path: Path relative to the spreadsheet, e.g. '/values:batchGet'.
+            idempotent: Whether a 5xx response may be retried safely.
+            **kwargs: Passed on to httpx (params, json).
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            httpx.HTTPStatusError: If the API returns an error status.
+            SheetsUnavailable: If the API still refuses after all retries.
+        """
+        async def send():
+            credentials = self._credentials
+            if credentials is None or not credentials.valid:
+                credentials = await asyncio.to_thread(self._load_credentials)
+            with sheets_call(operation, kind):
+                response = await self._client().request(
+                    method, self._url + path,
+                    headers={'Authorization': f'Bearer {credentials.token}'},
+                    **kwargs
+                )
+                response.raise_for_status()
+            return response.json()
+
+        kind = 'read' if method == 'GET' else 'write'
+        operation = api_operation(method, path)
+        return await self._service._limiter.acall(kind, send, idempotent=idempotent)
+
+    async def _get_worksheet(self):
+        """Get the (sheetId, title) of the service's worksheet."""
+        if self._worksheet is None:
+            data = await self._request(
+                'GET', '', params={'fields': 'sheets.properties(sheetId,title)'}
+            )
+            sheets = [sheet['properties'] for sheet in data['sheets']]
+            if self._service.worksheet is not None:
+                sheets = [p for p in sheets if p['title'] == self._service.worksheet]
+            properties = sheets[0]  # Use first sheet unless one is configured
+            self._worksheet = (properties['sheetId'], properties['title'])
+        return self._worksheet
+
+    async def _range(self, cells=None):
+        """Get an A1 range of the worksheet, e.g. 'Sheet1'!A2:D2."""
+        _, title = await self._get_worksheet()
+        name = "'%s'" % title.replace("'", "''")
+        return f'{name}!{cells}' if cells else name
+
+    async def _get_records(self):
+        """
+        Get all records, served from the shared snapshot cache while it is fresh.
+
+        A stale snapshot is reloaded from the database mirror if that is
+        fresh enough, otherwise from the sheet. Concurrent misses, from
+        tasks or from the sync service's threads, share a single reload.
+
+        Returns:
+            list: List of dictionaries representing rows.
+        """
+        self._service._sync_worker.ensure_started()
+        records = self._service._cache.get()
+        if records is None:
+            records = await self._service._refills.ado(self._refill)
+        return records
+
+    async def _refill(self):
+        """Reload the stale snapshot, once for all concurrent readers."""
+        cache = self._service._cache
+        if cache.is_fresh():
+            # Another reader's reload finished after our cache miss
+            return cache.get()
+        if await sync_to_async(self._service._mirror_is_fresh)():
+            mirrored = await sync_to_async(self._service._mirror.rows)()
+            records, _ = await sync_to_async(cache.sync)(mirrored)
+            return records
+        sheet_range = quote(await self._range(), safe='')
+        data = await self._request('GET', f'/values/{sheet_range}')
+        values = data.get('values', [])
+        # Building and syncing the snapshot (and reading the write-behind
+        # journal under its file lock) is O(rows) blocking work, kept off the loop
+        records, _ = await sync_to_async(
+            lambda: self._service._apply_fetched(to_records(values))
+        )()
+        return records
+
+    async def _lookup(self, row_id):
+        """Find a (row_number, record) pair through the snapshot's index."""
+        await self._get_records()  # Refresh the snapshot if it is stale
+        return self._service._cache.lookup(row_id)
+
+    async def ensure_email_column(self):
+        """Ensure the email column exists in the sheet."""
+        if self._service._has_email_column:
+            return
+        header_range = quote(await self._range('1:1'), safe='')
+        data = await self._request('GET', f'/values/{header_range}')
+        headers = data.get('values', [[]])[0]
+        if 'email' not in headers:
+            # Add email header in column D
+            cell = quote(await self._range('D1'), safe='')
+            await self._request(
+                'PUT', f'/values/{cell}',
+                params={'valueInputOption': 'USER_ENTERED'},
+                json={'values': [['email']]}
+            )
+        self._service._has_email_column = True
+
+    async def get_change_feed(self):
+        """
+        Get the change feed, with the snapshot loaded as its baseline.
+
+        Returns:
+            ChangeFeed: See GoogleSheetsService.change_feed.
+        """
+        await self._get_records()
+        return self._service.change_feed()
+
+    async def get_view_version(self, user_email=None):
+        """
+        Get a content version of the rows a user can list.
+
+        Returns:
+            tuple: (digest, last_modified), see GoogleSheetsService.get_view_version.
+        """
+        await self._get_records()
+        return self._service._digest.view(user_email)
+
+    async def get_ordered_view(self, user_email=None, ordering=(), filters=()):
+        """
+        Get rows in a given order, sorted once per snapshot version.
+
+        Returns:
+            OrderedView: See GoogleSheetsService.get_ordered_view.
+        """
+        records = await self._get_records()
+        return self._service._ordered_view(records, user_email, ordering, filters)
+
+    async def get_row(self, row_id, user_email=None):
+        """
+        Get a specific row by ID.
+
+        Returns:
+            dict: Row data or None if not found or not owned by user_email.
+        """
+        found = await self._lookup(row_id)
+        if found is None:
+            return None
+        record = found[1]
+        if user_email and record.get('email') != user_email:
+            return None
+        return record
+
+    async def get_row_version(self, row_id, user_email=None):
+        """
+        Get the version of a single row, for use as an ETag.
+
+        Returns:
+            tuple: (etag, last_modified) or None if not found.
+        """
+        record = await self.get_row(row_id, user_email=user_email)
+        if record is None:
+            return None
+        version = self._service._digest.row(row_id)
+        if version is None:
+            return None
+        return self._service.row_etag(record), version[1]
+
+    async def _read_rows(self, targets):
+        """
+        Re-read rows about to be written and check their ids.
+
+        Returns:
+            dict: {row_number: current record}, or None if rows have moved.
+            See GoogleSheetsService._read_rows.
+        """
+        cache = self._service._cache
+        if self._service._write_behind is not None:
+            return {n: cache.lookup(row_id)[1] for n, row_id in targets.items()}
+
+        row_numbers = sorted(targets)
+        ranges = [await self._range(f'A{n}:D{n}') for n in row_numbers]
+        data = await self._request('GET', '/values:batchGet', params={'ranges': ranges})
+        value_ranges = [value_range.get('values', []) for value_range in data['valueRanges']]
+        return self._service._check_rows(targets, row_numbers, value_ranges)
+
+    async def _apply_appends(self, rows):
+        """Append rows to the sheet (or the write-behind queue) and the snapshot."""
+        service = self._service
+        if service._write_behind is not None:
+            await asyncio.to_thread(service._write_behind.enqueue, 'create', rows)
+        else:
+            sheet_range = quote(await self._range(), safe='')
+            await self._request(
+                'POST', f'/values/{sheet_range}:append', idempotent=False,
+                params={'valueInputOption': 'RAW'},
+                json={'values': [service._row_values(row) for row in rows]}
+            )
+        for row in rows:
+            service._cache.append(row)
+
+    async def _apply_updates(self, updates):
+        """Write (row_number, row) updates to the sheet (or queue) and the snapshot."""
+        service = self._service
+        if service._write_behind is not None:
+            await asyncio.to_thread(
+                service._write_behind.enqueue, 'update', [row for _, row in updates]
+            )
+        else:
+            await self._request('POST', '/values:batchUpdate', json={
+                'valueInputOption': 'RAW',
+                'data': [
+                    {
+                        'range': await self._range(f'A{row_number}:D{row_number}'),
+                        'values': [service._row_values(row)],
+                    }
+                    for row_number, row in updates
+                ],
+            })
+        for _, row in updates:
+            service._cache.replace(row['id'], row)
+
+    async def _apply_deletes(self, targets):
+        """Delete a {row_number: row_id} mapping from the sheet (or queue) and the snapshot."""
+        service = self._service
+        if service._write_behind is not None:
+            await asyncio.to_thread(
+                service._write_behind.enqueue, 'delete',
+                [{'id': row_id} for row_id in targets.values()]
+            )
+        else:
+            sheet_id, _ = await self._get_worksheet()
+            await self._request('POST', ':batchUpdate', idempotent=False, json={
+                'requests': service._delete_requests(sheet_id, targets)
+            })
+        for row_id in targets.values():
+            service._cache.remove(row_id)
+
+    async def create_row(self, data, user_email=None):
+        """
+        Create a new row in the sheet.
+
+        Args:
+            data: Dictionary with 'name' and 'description' keys.
+            user_email: Email of the user creating the row.
+
+        Returns:
+            dict: The created row data with assigned ID.
+        """
+        await self.ensure_email_column()
+        await self._get_records()  # Id allocation checks the snapshot
+
+        # The id counter lives in the database
+        row_ids = await sync_to_async(self._service._next_ids)(1)
+        new_row = self._service._new_row(row_ids[0], data, user_email)
+
+        await self._apply_appends([new_row])
+
+        return new_row
+
+    async def update_row(self, row_id, data, user_email=None, if_match=None):
+        """
+        Update an existing row.
+
+        Args:
+            row_id: The ID of the row to update.
+            data: Dictionary with fields to update.
+            user_email: Email to verify ownership.
+            if_match: Optional list of acceptable row ETags.
+
+        Returns:
+            dict: Updated row data or None if not found.
+
+        Raises:
+            PreconditionFailed: If the row no longer matches if_match.
+            RowMovedError: If the row kept moving during the write.
+        """
+        for _ in range(2):
+            found = await self._lookup(row_id)
+            if found is None:
+                return None
+            row_number, current = found
+
+            if user_email and current.get('email') != user_email:
+                return None
+
+            rows = await self._read_rows({row_number: row_id})
+            if rows is None:
+                # Rows shifted since the snapshot was taken, reload and retry
+                self._service.invalidate_cache()
+                continue
+            current = rows[row_number]
+            self._service._check_if_match(current, if_match)
+
+            updated = self._service._merge_update(row_id, current, data)
+            await self._apply_updates([(row_number, updated)])
+
+            return updated
+        raise RowMovedError('Rows moved while updating, please retry')
+
+    async def delete_row(self, row_id, user_email=None, if_match=None):
+        """
+        Delete a row by ID.
+
+        Args:
+            row_id: The ID of the row to delete.
+            user_email: Email to verify ownership.
+            if_match: Optional list of acceptable row ETags.
+
+        Returns:
+            bool: True if deleted, False if not found or not authorized.
+
+        Raises:
+            PreconditionFailed: If the row no longer matches if_match.
+            RowMovedError: If the row kept moving during the delete.
+        """
+        for _ in range(2):
+            found = await self._lookup(row_id)
+            if found is None:
+                return False
+            row_number, current = found
+
+            if user_email and current.get('email') != user_email:
+                return False
+
+            rows = await self._read_rows({row_number: row_id})
+            if rows is None:
+                self._service.invalidate_cache()
+                continue
+            self._service._check_if_match(rows[row_number], if_match)
+
+            await self._apply_deletes({row_number: row_id})
+            return True
+        raise RowMovedError('Rows moved while deleting, please retry')
+
+
+# Async service sharing the state of the synchronous singleton
+async_sheets_service = AsyncGoogleSheetsService(
+    sheets_service,
+    max_connections=getattr(settings, 'GOOGLE_SHEETS_ASYNC_MAX_CONNECTIONS', 100),
+)
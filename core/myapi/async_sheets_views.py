@@ -0,0 +1,308 @@
+"""
+Async Google Sheets API Views
+
+Async variants of the sheet-items list and detail views, backed by the
+asyncio Sheets service. Served through core/asgi.py (e.g. with uvicorn),
+a worker waits on many Google round trips at once instead of blocking on
+each. Enable them with GOOGLE_SHEETS_ASYNC_VIEWS in settings. Other
+SHEET_ITEMS_BACKEND stores are called in a worker thread.
+
+Also the Server-Sent Events stream of row changes, which is always async.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .backends import get_async_backend
+from .rate_limit import SheetsUnavailable
+from .sheet_stream import parse_stream, stream_response
+from .sheets_views import (
+    check_preconditions, if_match, list_data, list_etag, parse_list_query, set_validators
+)
+from .storage import PreconditionFailed, RowMovedError, StorageBackend
+
+# Seconds between keep-alive comments on an idle event stream
+KEEPALIVE_INTERVAL = 15
+
+
+def json_response(data, status_code):
+    """Render data as compact JSON, like DRF's JSONRenderer."""
+    return JsonResponse(
+        data, status=status_code, safe=False,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False}
+    )
+
+
+def error_response(e):
+    """Build the 503 (quota exhausted) or 500 response for an unexpected error."""
+    if isinstance(e, SheetsUnavailable):
+        response = json_response({'error': str(e)}, status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = str(int(e.retry_after))
+        return response
+    error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
+    return json_response({'error': error_msg}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncSheetItemView(View):
+    """
+    Base view that authenticates the JWT bearer token before dispatching.
+
+    Mirrors the IsAuthenticated permission of the sync views; the token is
+    checked in a thread since fetching the user hits the database.
+    """
+    authenticator = JWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Authenticate the request, then run the async handler."""
+        try:
+            result = await sync_to_async(self.authenticator.authenticate)(request)
+        except AuthenticationFailed as e:
+            return json_response({'detail': e.detail}, status.HTTP_401_UNAUTHORIZED)
+        if result is None:
+            return json_response(
+                {'detail': 'Authentication credentials were not provided.'},
+                status.HTTP_401_UNAUTHORIZED
+            )
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def parse_body(request):
+        """Decode a JSON request body; raises ValueError if it is invalid."""
+        return json.loads(request.body or b'{}')
+
+
+class AsyncSheetItemListCreateView(AsyncSheetItemView):
+    """
+    Async variant of SheetItemListCreateAPIView (same parameters and responses).
+
+    GET: Returns all rows from the sheet (filtered by user email for non-superusers).
+    POST: Creates a new row with user's email automatically assigned.
+    """
+
+    async def get(self, request):
+        """Get all items from Google Sheets."""
+        try:
+            try:
+                ordering, fields, page, filters = parse_list_query(request.GET)
+                stream = parse_stream(request.GET, request.META.get('HTTP_ACCEPT', ''))
+            except ValueError as e:
+                return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+            user = request.user
+            # Superusers see all, regular users see only their items
+            user_email = None if user.is_superuser else user.email
+
+            digest, last_modified = await get_async_backend().get_view_version(
+                user_email=user_email
+            )
+            etag = list_etag(request, digest, user_email, stream)
+            not_modified = check_preconditions(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            view = await get_async_backend().get_ordered_view(
+                user_email=user_email, ordering=ordering, filters=filters
+            )
+            if stream:
+                response = stream_response(view.rows, fields, stream, asynchronous=True)
+                return set_validators(response, etag, last_modified)
+            data = list_data(request, view, page, ordering, fields)
+            return set_validators(json_response(data, status.HTTP_200_OK), etag, last_modified)
+        except Exception as e:
+            return error_response(e)
+
+    async def post(self, request):
+        """Create a new item in Google Sheets."""
+        try:
+            try:
+                data = self.parse_body(request)
+            except ValueError:
+                return json_response({'error': 'Invalid JSON'}, status.HTTP_400_BAD_REQUEST)
+            if not isinstance(data, dict) or not data.get('name'):
+                return json_response({'error': 'Name is required'}, status.HTTP_400_BAD_REQUEST)
+
+            # Auto-assign user's email
+            item = await get_async_backend().create_row(data, user_email=request.user.email)
+            return json_response(item, status.HTTP_201_CREATED)
+        except Exception as e:
+            return error_response(e)
+
+
+class AsyncSheetItemDetailView(AsyncSheetItemView):
+    """
+    Async variant of SheetItemDetailAPIView (same parameters and responses).
+
+    GET: Returns a single row by ID (with ownership check for non-superusers).
+    PUT: Updates a row by ID (only if owned by user or superuser).
+    DELETE: Deletes a row by ID (only if owned by user or superuser).
+    """
+
+    async def get(self, request, row_id):
+        """Get a specific item by ID."""
+        try:
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+
+            version = await get_async_backend().get_row_version(row_id, user_email=user_email)
+            if version is None:
+                return json_response({'error': 'Item not found'}, status.HTTP_404_NOT_FOUND)
+            etag, last_modified = version
+            not_modified = check_preconditions(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            item = await get_async_backend().get_row(row_id, user_email=user_email)
+            if item is None:
+                return json_response({'error': 'Item not found'}, status.HTTP_404_NOT_FOUND)
+            return set_validators(json_response(item, status.HTTP_200_OK), etag, last_modified)
+        except Exception as e:
+            return error_response(e)
+
+    async def put(self, request, row_id):
+        """Update a specific item by ID."""
+        try:
+            try:
+                data = self.parse_body(request)
+            except ValueError:
+                return json_response({'error': 'Invalid JSON'}, status.HTTP_400_BAD_REQUEST)
+            if not isinstance(data, dict):
+                return json_response({'error': 'Expected an object'}, status.HTTP_400_BAD_REQUEST)
+
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+
+            item = await get_async_backend().update_row(
+                row_id, data, user_email=user_email, if_match=if_match(request)
+            )
+            if item is None:
+                return json_response(
+                    {'error': 'Item not found or not authorized'},
+                    status.HTTP_404_NOT_FOUND
+                )
+            response = json_response(item, status.HTTP_200_OK)
+            response['ETag'] = StorageBackend.row_etag(item)
+            return response
+        except PreconditionFailed as e:
+            return json_response({'error': str(e)}, status.HTTP_412_PRECONDITION_FAILED)
+        except RowMovedError as e:
+            return json_response({'error': str(e)}, status.HTTP_409_CONFLICT)
+        except Exception as e:
+            return error_response(e)
+
+    async def delete(self, request, row_id):
+        """Delete a specific item by ID."""
+        try:
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+
+            deleted = await get_async_backend().delete_row(
+                row_id, user_email=user_email, if_match=if_match(request)
+            )
+            if not deleted:
+                return json_response(
+                    {'error': 'Item not found or not authorized'},
+                    status.HTTP_404_NOT_FOUND
+                )
+            return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+        except PreconditionFailed as e:
+            return json_response({'error': str(e)}, status.HTTP_412_PRECONDITION_FAILED)
+        except RowMovedError as e:
+            return json_response({'error': str(e)}, status.HTTP_409_CONFLICT)
+        except Exception as e:
+            return error_response(e)
+
+
+def sse_message(event_type, data, event_id=None):
+    """Format one Server-Sent Events message."""
+    lines = [f'id: {event_id}'] if event_id else []
+    lines.append(f'event: {event_type}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+def sse_messages(feed, events):
+    """Format drained events, or a reset if the subscription overflowed."""
+    if events is None:
+        return [sse_message('reset', {})]
+    return [
+        sse_message(event['type'], {'id': event['id'], 'row': event['row']}, feed.event_id(event))
+        for event in events
+    ]
+
+
+def stream_events(feed, subscription, resumed):
+    """Yield a subscription's events as SSE messages, blocking between them."""
+    try:
+        yield 'retry: 3000\n\n'
+        if not resumed:
+            yield sse_message('reset', {})
+        while True:
+            messages = sse_messages(feed, subscription.drain())
+            yield from messages
+            if not messages and not subscription.wait(KEEPALIVE_INTERVAL):
+                yield ': keep-alive\n\n'
+    finally:
+        subscription.close()
+
+
+async def astream_events(feed, subscription, resumed):
+    """Yield a subscription's events as SSE messages, awaiting between them."""
+    try:
+        yield 'retry: 3000\n\n'
+        if not resumed:
+            yield sse_message('reset', {})
+        while True:
+            messages = sse_messages(feed, subscription.drain())
+            for message in messages:
+                yield message
+            if not messages and not await subscription.wait_async(KEEPALIVE_INTERVAL):
+                yield ': keep-alive\n\n'
+    finally:
+        subscription.close()
+
+
+class SheetItemEventsView(AsyncSheetItemView):
+    """
+    Server-Sent Events stream of changes to the user's rows.
+
+    GET: Streams 'create', 'update' and 'delete' events, each with the row
+         id and (except for deletes) the row, as they happen. Superusers see
+         every row. A 'reset' event means the client missed events and
+         must reload its rows; send the last event id back in the
+         Last-Event-ID header when reconnecting to resume instead.
+    """
+
+    async def get(self, request):
+        """Stream change events."""
+        try:
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+
+            feed = await get_async_backend().get_change_feed()
+            subscription, resumed = feed.subscribe(
+                user_email=user_email,
+                last_event_id=request.headers.get('Last-Event-ID')
+            )
+        except Exception as e:
+            return error_response(e)
+
+        if isinstance(request, ASGIRequest):
+            stream = astream_events(feed, subscription, resumed)
+        else:
+            # Under WSGI the stream is iterated synchronously by the worker
+            stream = stream_events(feed, subscription, resumed)
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+        return response
@@ -0,0 +1,19 @@
+"""
+Authentication Module
+
+This module wraps the JWT authentication used by the API so its cost shows
+up as the 'auth' span of request metrics (see myapi.metrics).
+"""
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .metrics import span
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that records how long authentication takes."""
+
+    def authenticate(self, request):
+        """Authenticate the request, timed as the 'auth' span."""
+        with span('auth'):
+            return super().authenticate(request)
@@ -0,0 +1,438 @@
+"""
+Sheet Items Backends Module
+
+This module provides the stores the sheet-item API can run against, chosen
+with SHEET_ITEMS_BACKEND in settings:
+
+- 'sheets': Google Sheets (GoogleSheetsService), the default.
+- 'database': the SheetRow table, through the Django ORM.
+- 'memory': a process-local dictionary, for load-testing the HTTP layer
+  without a Google account.
+- 'sharded': rows spread over several worksheets or spreadsheets
+  (myapi.sharding.ShardedSheetsBackend).
+
+A dotted path to a StorageBackend subclass also works. The database and
+memory backends keep the same snapshot, digest, ordered-view and search
+index machinery as the Sheets service, so validators, ordering, filtering
+and the change feed behave identically.
+"""
+
+import itertools
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .change_feed import ChangeFeed
+from .id_allocator import SheetIdAllocator
+from .metrics import span
+from .models import SheetRow
+from .sheet_cache import SheetSnapshot, normalize_id
+from .sheet_digest import SnapshotDigest
+from .sheet_query import OrderedViewCache, sort_rows
+from .sheet_search import SheetSearchIndex
+from .single_flight import SingleFlight
+from .storage import StorageBackend
+
+BACKENDS = {
+    'database': 'myapi.backends.DatabaseBackend',
+    'memory': 'myapi.backends.MemoryBackend',
+    'sharded': 'myapi.sharding.ShardedSheetsBackend',
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Get the configured sheet-items backend.
+
+    Returns:
+        StorageBackend: The process-wide backend instance.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = getattr(settings, 'SHEET_ITEMS_BACKEND', 'sheets')
+            if name == 'sheets':
+                from .google_sheets import sheets_service
+                _backend = sheets_service
+            else:
+                _backend = import_string(BACKENDS.get(name, name))()
+        return _backend
+
+
+def get_async_backend():
+    """
+    Get an awaitable interface to the configured backend.
+
+    Returns:
+        The asyncio Sheets service for the Sheets backend, otherwise an
+        AsyncBackend running the backend's methods in a thread.
+    """
+    if getattr(settings, 'SHEET_ITEMS_BACKEND', 'sheets') == 'sheets':
+        from .async_sheets import async_sheets_service
+        return async_sheets_service
+    return AsyncBackend(get_backend())
+
+
+class AsyncBackend:
+    """Awaitable wrapper around a synchronous backend."""
+
+    def __init__(self, backend):
+        """
+        Initialize the wrapper.
+
+        Args:
+            backend: The StorageBackend to wrap.
+        """
+        self.backend = backend
+
+    def __getattr__(self, name):
+        """Wrap backend methods so they run in a worker thread."""
+        return sync_to_async(getattr(self.backend, name))
+
+    async def get_change_feed(self):
+        """Get the backend's change feed."""
+        return await sync_to_async(self.backend.change_feed)()
+
+
+class SnapshotBackend(StorageBackend):
+    """
+    Backend serving reads from an in-process SheetSnapshot of a store.
+
+    Subclasses provide the store: _read_all, _read_row, _allocate_ids and
+    the _write_* methods. Writes go to the store and through to the
+    snapshot, under a lock so concurrent updates of one row don't interleave.
+    """
+
+    def __init__(self, cache_ttl=30):
+        """
+        Initialize the snapshot and its derived indexes.
+
+        Args:
+            cache_ttl: Seconds the snapshot is served before re-reading the store.
+        """
+        self._cache = SheetSnapshot(ttl=cache_ttl)
+        self._refills = SingleFlight()
+        self._digest = SnapshotDigest()
+        self._cache.subscribe(self._digest)
+        self._search = SheetSearchIndex()
+        self._cache.subscribe(self._search)
+        self._views = OrderedViewCache()
+        self._feed = None
+        self._lock = threading.RLock()
+
+    def _read_all(self):
+        """Get every row of the store, in store order."""
+        raise NotImplementedError
+
+    def _read_row(self, row_id):
+        """Get the store's current copy of a row, or None."""
+        raise NotImplementedError
+
+    def _allocate_ids(self, count):
+        """Reserve count new row ids."""
+        raise NotImplementedError
+
+    def _write_appends(self, rows):
+        """Add rows to the store."""
+        raise NotImplementedError
+
+    def _write_updates(self, rows):
+        """Replace rows in the store, matched by id."""
+        raise NotImplementedError
+
+    def _write_deletes(self, row_ids):
+        """Remove rows from the store by id."""
+        raise NotImplementedError
+
+    def _get_records(self):
+        """Get all records, served from the snapshot while it is fresh."""
+        records = self._cache.get()
+        if records is None:
+            # Concurrent misses share one read of the store
+            records = self._refills.do(self.refresh)
+        return records
+
+    def refresh(self):
+        """
+        Re-read the store into the snapshot.
+
+        Returns:
+            list: The reloaded records.
+        """
+        records, _ = self._cache.sync(self._read_all())
+        return records
+
+    def cache_stats(self):
+        """
+        Get snapshot cache hit/miss counters.
+
+        Returns:
+            dict: Cache statistics, plus the number of reloads after a miss
+            and of readers that shared another reader's reload.
+        """
+        refills = self._refills.stats()
+        return dict(
+            self._cache.stats(), refills=refills['calls'], refills_shared=refills['shared']
+        )
+
+    def _visible_rows(self, records, user_email=None):
+        """Get the snapshot rows a user can see, in store order."""
+        if user_email:
+            return self._cache.rows_for_email(user_email)
+        return records.select()
+
+    def _owned(self, record, user_email):
+        """Whether a user may access a row."""
+        return record is not None and (not user_email or record.get('email') == user_email)
+
+    def get_all_rows(self, user_email=None):
+        """Get all rows, from the snapshot."""
+        return list(self._visible_rows(self._get_records(), user_email))
+
+    def iter_rows(self, user_email=None, chunk_size=5000):
+        """Iterate over the snapshot's rows, building each dict on the way."""
+        return iter(self._visible_rows(self._get_records(), user_email))
+
+    def get_view_version(self, user_email=None):
+        """Get the digest and modification time of the rows a user can list."""
+        self._get_records()
+        return self._digest.view(user_email)
+
+    def get_ordered_view(self, user_email=None, ordering=(), filters=()):
+        """Get rows in a given order, sorted once per snapshot version."""
+        records = self._get_records()
+
+        def build():
+            with span('filter'):
+                if filters:
+                    ids = self._search.search(filters)
+                    if user_email:
+                        ids &= self._cache.ids_for_email(user_email)
+                    rows = self._cache.rows_for_ids(ids)
+                else:
+                    rows = self._visible_rows(records, user_email)
+                return sort_rows(rows, ordering) if ordering else rows
+
+        return self._views.get(self._cache.version, (ordering, user_email, filters), build)
+
+    def get_row(self, row_id, user_email=None):
+        """Get a specific row by ID, through the snapshot's index."""
+        self._get_records()
+        found = self._cache.lookup(row_id)
+        record = found[1] if found is not None else None
+        return record if self._owned(record, user_email) else None
+
+    def get_row_version(self, row_id, user_email=None):
+        """Get the ETag and modification time of a row."""
+        record = self.get_row(row_id, user_email=user_email)
+        version = self._digest.row(row_id) if record is not None else None
+        if version is None:
+            return None
+        return self.row_etag(record), version[1]
+
+    def create_rows(self, items, user_email=None):
+        """Create several rows."""
+        if not items:
+            return []
+        with self._lock:
+            self._get_records()  # Load first, so the new rows are appended to it
+            new_rows = [
+                self._new_row(row_id, data, user_email)
+                for row_id, data in zip(self._allocate_ids(len(items)), items)
+            ]
+            self._write_appends(new_rows)
+            for row in new_rows:
+                self._cache.append(row)
+        return new_rows
+
+    def update_row(self, row_id, data, user_email=None, if_match=None):
+        """Update a row, checking If-Match against the store's copy."""
+        with self._lock:
+            current = self._read_row(row_id)
+            if not self._owned(current, user_email):
+                return None
+            self._check_if_match(current, if_match)
+            updated = self._merge_update(current.get('id'), current, data)
+            self._write_updates([updated])
+            self._cache.replace(updated['id'], updated)
+        return updated
+
+    def update_rows(self, updates, user_email=None):
+        """Update several rows."""
+        with self._lock:
+            results = []
+            writes = {}
+            for data in updates:
+                row_id = normalize_id(data.get('id'))
+                # Repeated ids build on the previous update in this batch
+                current = writes.get(row_id) or self._read_row(row_id)
+                if not self._owned(current, user_email):
+                    results.append(None)
+                    continue
+                updated = self._merge_update(current.get('id'), current, data)
+                writes[row_id] = updated
+                results.append(updated)
+            if writes:
+                self._write_updates(list(writes.values()))
+                for row in writes.values():
+                    self._cache.replace(row['id'], row)
+        return results
+
+    def delete_row(self, row_id, user_email=None, if_match=None):
+        """Delete a row, checking If-Match against the store's copy."""
+        with self._lock:
+            current = self._read_row(row_id)
+            if not self._owned(current, user_email):
+                return False
+            self._check_if_match(current, if_match)
+            self._write_deletes([current.get('id')])
+            self._cache.remove(current.get('id'))
+        return True
+
+    def delete_rows(self, row_ids, user_email=None):
+        """Delete several rows by ID."""
+        with self._lock:
+            results = []
+            targets = {}
+            for row_id in row_ids:
+                key = normalize_id(row_id)
+                current = None if key in targets else self._read_row(row_id)
+                owned = self._owned(current, user_email)
+                if owned:
+                    targets[key] = current.get('id')
+                results.append(owned)
+            if targets:
+                self._write_deletes(list(targets.values()))
+                for row_id in targets.values():
+                    self._cache.remove(row_id)
+        return results
+
+    def change_feed(self):
+        """Get the change feed, starting it on first use."""
+        with self._lock:
+            if self._feed is None:
+                self._feed = ChangeFeed(
+                    poll=self.refresh,
+                    poll_interval=getattr(settings, 'GOOGLE_SHEETS_FEED_POLL_INTERVAL', 10)
+                )
+                self._cache.subscribe(self._feed)
+            return self._feed
+
+
+class MemoryBackend(SnapshotBackend):
+    """Process-local store; data is lost on restart and not shared between workers."""
+
+    def __init__(self, rows=()):
+        """
+        Initialize the store.
+
+        Args:
+            rows: Optional initial rows.
+        """
+        # The store never changes behind the snapshot's back
+        super().__init__(cache_ttl=float('inf'))
+        self._rows = {}
+        for row in rows:
+            self._rows.setdefault(normalize_id(row.get('id')), dict(row))
+        numeric = [row_id for row_id in self._rows if isinstance(row_id, int)]
+        self._ids = itertools.count(max(numeric, default=0) + 1)
+
+    def _read_all(self):
+        """Get every row, in store order."""
+        return list(self._rows.values())
+
+    def _read_row(self, row_id):
+        """Get the current copy of a row, or None."""
+        return self._rows.get(normalize_id(row_id))
+
+    def _allocate_ids(self, count):
+        """Reserve count new row ids."""
+        return [next(self._ids) for _ in range(count)]
+
+    def _write_appends(self, rows):
+        """Add rows to the store."""
+        for row in rows:
+            self._rows[normalize_id(row['id'])] = row
+
+    def _write_updates(self, rows):
+        """Replace rows in the store, matched by id."""
+        for row in rows:
+            self._rows[normalize_id(row['id'])] = row
+
+    def _write_deletes(self, row_ids):
+        """Remove rows from the store by id."""
+        for row_id in row_ids:
+            self._rows.pop(normalize_id(row_id), None)
+
+
+class DatabaseBackend(SnapshotBackend):
+    """Store in the SheetRow table, shared by every worker process."""
+
+    def __init__(self, name=None, cache_ttl=None):
+        """
+        Initialize the store.
+
+        Args:
+            name: SheetRow.sheet value holding this store's rows
+                  (default: SHEET_ITEMS_DATABASE_NAME).
+            cache_ttl: Seconds the snapshot is served before re-reading
+                       the table (default: SHEET_ITEMS_CACHE_TTL).
+        """
+        super().__init__(
+            cache_ttl=getattr(settings, 'SHEET_ITEMS_CACHE_TTL', 5) if cache_ttl is None else cache_ttl
+        )
+        self.name = name or getattr(settings, 'SHEET_ITEMS_DATABASE_NAME', 'items')
+        self._ids = SheetIdAllocator(name=f'database:{self.name}', seed=self._max_id)
+
+    def _rows(self):
+        """Get this store's rows."""
+        return SheetRow.objects.filter(sheet=self.name)
+
+    def _max_id(self):
+        """Get the highest numeric row id in the table."""
+        ids = self._rows().values_list('row_id', flat=True)
+        return max((int(row_id) for row_id in ids if row_id.isdigit()), default=0)
+
+    def _read_all(self):
+        """Get every row, in store order."""
+        return list(self._rows().order_by('position').values_list('data', flat=True))
+
+    def _read_row(self, row_id):
+        """Get the current copy of a row, or None."""
+        return self._rows().filter(row_id=str(normalize_id(row_id))).values_list(
+            'data', flat=True
+        ).first()
+
+    def _allocate_ids(self, count):
+        """Reserve count new row ids."""
+        return list(self._ids.allocate(count))
+
+    def _write_appends(self, rows):
+        """Add rows to the store."""
+        with transaction.atomic():
+            last = self._rows().aggregate(last=Max('position'))['last']
+            start = 0 if last is None else last + 1
+            SheetRow.objects.bulk_create([
+                SheetRow(
+                    sheet=self.name, row_id=str(normalize_id(row['id'])),
+                    email=row.get('email', ''), position=start + idx, data=row
+                )
+                for idx, row in enumerate(rows)
+            ])
+
+    def _write_updates(self, rows):
+        """Replace rows in the store, matched by id."""
+        with transaction.atomic():
+            for row in rows:
+                self._rows().filter(row_id=str(normalize_id(row['id']))).update(data=row)
+
+    def _write_deletes(self, row_ids):
+        """Remove rows from the store by id."""
+        self._rows().filter(row_id__in=[str(normalize_id(row_id)) for row_id in row_ids]).delete()
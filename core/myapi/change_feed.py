@@ -0,0 +1,276 @@
+"""
+Change Feed Module
+
+This module turns changes of the cached sheet snapshot into row-level
+create/update/delete events and fans them out to subscribers, so clients
+can keep a live copy of their rows instead of polling. Events come from
+the service's own mutations and from reloads of the sheet, which a
+background poller triggers while anyone is subscribed so that edits made
+in the Google Sheets UI (or by other worker processes) show up too.
+
+Event ids are only meaningful to the process that issued them; a client
+that reconnects to another process is told to reset.
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from .sheet_cache import normalize_id
+from .sheet_digest import row_key
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A subscriber's queue of events, filtered by row ownership."""
+
+    def __init__(self, feed, user_email=None, max_events=1000):
+        """
+        Initialize the subscription.
+
+        Args:
+            feed: The ChangeFeed delivering events.
+            user_email: Owner email to filter by, or None for all rows.
+            max_events: Events buffered before the subscriber must reset.
+        """
+        self.feed = feed
+        self.user_email = user_email
+        self.max_events = max_events
+        self.overflowed = False
+        self._events = deque()
+        self._wakers = set()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _visible(self, event):
+        """Whether the subscriber may see an event."""
+        return self.user_email is None or event['email'] == self.user_email
+
+    def _push(self, event):
+        """Queue an event if visible (called by the feed)."""
+        if not self._visible(event):
+            return
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                # The client fell too far behind; it has to start over
+                self._events.clear()
+                self.overflowed = True
+            else:
+                self._events.append(event)
+            wakers = list(self._wakers)
+        self._ready.set()
+        for wake in wakers:
+            wake()
+
+    def drain(self):
+        """
+        Take all queued events.
+
+        Returns:
+            list: Events in order, or None if the subscription overflowed
+            and the client must reload its rows.
+        """
+        with self._lock:
+            self._ready.clear()
+            if self.overflowed:
+                self.overflowed = False
+                return None
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def wait(self, timeout):
+        """Block until events are queued or the timeout passes."""
+        return self._ready.wait(timeout)
+
+    async def wait_async(self, timeout):
+        """Await queued events without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(ready.set)
+
+        with self._lock:
+            if self._events or self.overflowed:
+                return True
+            self._wakers.add(wake)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._wakers.discard(wake)
+
+    def close(self):
+        """Stop receiving events."""
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    """
+    Snapshot listener publishing row events to subscribers.
+
+    Subscribe it to a SheetSnapshot. The first load only records a baseline;
+    later loads are diffed row by row against it.
+    """
+
+    def __init__(self, poll=None, poll_interval=10, history=1000):
+        """
+        Initialize the feed.
+
+        Args:
+            poll: Callable reloading the sheet, run periodically while there
+                  are subscribers (e.g. GoogleSheetsService.refresh).
+            poll_interval: Seconds between polls.
+            history: Recent events kept for clients resuming after a disconnect.
+        """
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.published = 0
+        # Distinguishes this process's event ids from other processes'
+        self.epoch = uuid.uuid4().hex[:8]
+        self._rows = None
+        self._history = deque(maxlen=history)
+        self._sequence = itertools.count(1)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._poller = None
+
+    def event_id(self, event):
+        """Get the id a client sends back to resume after an event."""
+        return f"{self.epoch}-{event['seq']}"
+
+    def _publish(self, event_type, record):
+        """Record and fan out one event (call with the lock held)."""
+        event = {
+            'seq': next(self._sequence),
+            'type': event_type,
+            'id': record.get('id'),
+            'email': record.get('email', ''),
+            'row': record if event_type != 'delete' else None,
+        }
+        self.published += 1
+        self._history.append(event)
+        for subscription in list(self._subscribers):
+            subscription._push(event)
+
+    def on_load(self, records):
+        """Publish the row-level diff between the previous and the new snapshot."""
+        with self._lock:
+            current = {}
+            for record in records:
+                current.setdefault(normalize_id(record.get('id')), record)
+            if self._rows is None:
+                self._rows = current
+                return
+            for row_id, record in current.items():
+                previous = self._rows.get(row_id)
+                if previous is None:
+                    self._publish('create', record)
+                elif row_key(previous) != row_key(record):
+                    self._publish('update', record)
+            for row_id, previous in self._rows.items():
+                if row_id not in current:
+                    self._publish('delete', previous)
+            self._rows = current
+
+    def on_add(self, record):
+        """Publish a row added to the snapshot."""
+        with self._lock:
+            if self._rows is None:
+                return
+            self._rows[normalize_id(record.get('id'))] = record
+            self._publish('create', record)
+
+    def on_replace(self, old, new):
+        """Publish a row updated in the snapshot."""
+        with self._lock:
+            if self._rows is None:
+                return
+            self._rows[normalize_id(new.get('id'))] = new
+            if row_key(old) != row_key(new):
+                self._publish('update', new)
+
+    def on_remove(self, record):
+        """Publish a row removed from the snapshot."""
+        with self._lock:
+            if self._rows is None:
+                return
+            self._rows.pop(normalize_id(record.get('id')), None)
+            self._publish('delete', record)
+
+    def subscribe(self, user_email=None, last_event_id=None):
+        """
+        Start receiving events.
+
+        Args:
+            user_email: Owner email to filter by, or None for all rows.
+            last_event_id: Id of the last event the client saw, to replay
+                           what it missed while disconnected.
+
+        Returns:
+            tuple: (Subscription, resumed) - resumed is False if the client
+            asked to resume but the missed events are no longer available,
+            so it must reload its rows.
+        """
+        subscription = Subscription(self, user_email)
+        resumed = last_event_id is None
+        with self._lock:
+            if last_event_id is not None:
+                epoch, _, seq = last_event_id.partition('-')
+                oldest = self._history[0]['seq'] if self._history else self.published + 1
+                if epoch == self.epoch and seq.isdigit() and int(seq) >= oldest - 1:
+                    resumed = True
+                    for event in self._history:
+                        if event['seq'] > int(seq):
+                            subscription._push(event)
+            self._subscribers.add(subscription)
+            self._ensure_poller()
+        return subscription, resumed
+
+    def unsubscribe(self, subscription):
+        """Stop delivering events to a subscription."""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _ensure_poller(self):
+        """Start the poller thread if it isn't running (call with the lock held)."""
+        if self.poll is None or self._poller is not None:
+            return
+        self._poller = threading.Thread(
+            target=self._run_poller, name='sheets-change-poller', daemon=True
+        )
+        self._poller.start()
+
+    def _run_poller(self):
+        """Reload the sheet periodically; exit once the last subscriber has left."""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    # The next subscribe starts a new poller
+                    self._poller = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Change feed poll failed, retrying next interval')
+
+    def stats(self):
+        """
+        Get feed counters.
+
+        Returns:
+            dict: Subscriber count and number of events published.
+        """
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self.published}
+
@@ -0,0 +1,455 @@
+"""
+Fake Google Sheets Module
+
+This module provides an in-memory stand-in for the Google Sheets and Drive
+REST endpoints the services use, so they can be tested and load-tested
+without a Google account or network access. Requests are answered in
+process: gspread through a requests transport adapter, the asyncio service
+through an httpx transport. Latency, per-minute quotas and injected errors
+(e.g. 429s) make caching, batching and rate limiting observable.
+
+Enable it for the whole app with the GOOGLE_SHEETS_FAKE setting, or pass
+one to a single service as GoogleSheetsService(api=FakeSheets(...)).
+"""
+
+import asyncio
+import collections
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import gspread
+import httpx
+import requests
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+HEADER = ['id', 'name', 'description', 'email']
+SHEETS_PATH = re.compile(r'^/v4/spreadsheets/(?P<id>[^/:]+)(?P<rest>.*)$')
+DRIVE_PATH = re.compile(r'^/drive/v3/files/(?P<id>[^/]+)$')
+
+
+class FakeCredentials:
+    """Stand-in for OAuth2 credentials that are always valid."""
+
+    token = 'fake-token'
+    valid = True
+
+    def refresh(self, request):
+        """Nothing to refresh."""
+
+
+class FakeSheets:
+    """
+    In-memory spreadsheet with one worksheet, served like the Sheets API.
+
+    Cell values are kept as written and returned as strings, as with the
+    API's default FORMATTED_VALUE rendering; trailing empty cells and rows
+    are trimmed from responses.
+    """
+
+    def __init__(self, spreadsheet_id, rows=None, title='Sheet1', latency=0.0, jitter=0.0,
+                 reads_per_minute=None, writes_per_minute=None, error_rate=0.0, seed=None):
+        """
+        Initialize the spreadsheet.
+
+        Args:
+            spreadsheet_id: Id the fake answers to.
+            rows: Initial rows of cell values, header row first; defaults to
+                  just the sheet-items header.
+            title: Worksheet title.
+            latency: Seconds added to every request.
+            jitter: Extra random seconds (0 to jitter) added to every request.
+            reads_per_minute: Read requests allowed per rolling minute, or None.
+            writes_per_minute: Write requests allowed per rolling minute, or None.
+            error_rate: Probability of answering any request with a 503.
+            seed: Random seed for jitter and injected errors.
+        """
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        self.sheet_id = 0
+        self.rows = [list(row) for row in (rows if rows is not None else [HEADER])]
+        self.latency = latency
+        self.jitter = jitter
+        self.reads_per_minute = reads_per_minute
+        self.writes_per_minute = writes_per_minute
+        self.error_rate = error_rate
+        self.calls = collections.Counter()
+        self.rejected = collections.Counter()
+        self.modified_time = time.time()
+        self._random = random.Random(seed)
+        self._failures = collections.deque()
+        self._requests = {'read': collections.deque(), 'write': collections.deque()}
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1, status=429, retry_after=None):
+        """
+        Answer the next requests with an error.
+
+        Args:
+            count: Number of requests to fail.
+            status: HTTP status to answer with.
+            retry_after: Optional Retry-After header value, in seconds.
+        """
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def stats(self):
+        """
+        Get request counters.
+
+        Returns:
+            dict: Requests per endpoint, requests rejected per status and
+            the number of rows.
+        """
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'total_calls': sum(self.calls.values()),
+                'rejected': dict(self.rejected),
+                'rows': len(self.rows),
+            }
+
+    def reset_stats(self):
+        """Clear the request counters."""
+        with self._lock:
+            self.calls.clear()
+            self.rejected.clear()
+
+    def delay(self):
+        """Get the latency to add to one request."""
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def handle(self, method, url, body=None):
+        """
+        Answer one request, without the latency (see delay).
+
+        Args:
+            method: HTTP method.
+            url: Full request URL.
+            body: Decoded JSON body, or None.
+
+        Returns:
+            tuple: (status, headers, data) - data is the JSON response body.
+        """
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        kind = 'read' if method == 'GET' else 'write'
+        with self._lock:
+            error = self._reject(kind)
+            if error is not None:
+                return error
+            try:
+                endpoint, data = self._route(method, unquote(parts.path), query, body or {})
+            except LookupError as e:
+                return self._error(404, 'NOT_FOUND', str(e))
+            except ValueError as e:
+                return self._error(400, 'INVALID_ARGUMENT', str(e))
+            self.calls[endpoint] += 1
+            return 200, {}, data
+
+    def _error(self, status, reason, message, headers=None):
+        """Build a Google API error response."""
+        self.rejected[status] += 1
+        body = {'error': {'code': status, 'message': message, 'status': reason}}
+        return status, headers or {}, body
+
+    def _reject(self, kind):
+        """Get an injected or quota error for the next request, if any."""
+        if self._failures:
+            status, retry_after = self._failures.popleft()
+            headers = {} if retry_after is None else {'Retry-After': str(retry_after)}
+            return self._error(status, 'INJECTED', 'Injected failure', headers)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self._error(503, 'UNAVAILABLE', 'The service is currently unavailable.')
+        limit = self.reads_per_minute if kind == 'read' else self.writes_per_minute
+        if limit is not None:
+            now = time.monotonic()
+            window = self._requests[kind]
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= limit:
+                return self._error(
+                    429, 'RESOURCE_EXHAUSTED',
+                    f"Quota exceeded for quota metric '{kind.title()} requests'"
+                )
+            window.append(now)
+        return None
+
+    def _route(self, method, path, query, body):
+        """Dispatch a request to its endpoint; returns (endpoint name, data)."""
+        match = DRIVE_PATH.match(path)
+        if match and method == 'GET':
+            self._check_id(match['id'])
+            return 'drive.files.get', self._drive_file()
+        match = SHEETS_PATH.match(path)
+        if match is None:
+            raise LookupError(f'Unknown endpoint {method} {path}')
+        self._check_id(match['id'])
+        rest = match['rest']
+        if rest == '' and method == 'GET':
+            return 'spreadsheets.get', self._metadata()
+        if rest == ':batchUpdate' and method == 'POST':
+            return 'spreadsheets.batchUpdate', self._batch_update(body)
+        if rest == '/values:batchGet' and method == 'GET':
+            return 'values.batchGet', self._values_batch_get(query.get('ranges', []))
+        if rest == '/values:batchUpdate' and method == 'POST':
+            return 'values.batchUpdate', self._values_batch_update(body)
+        if rest.startswith('/values/'):
+            name = rest[len('/values/'):]
+            if name.endswith(':append') and method == 'POST':
+                return 'values.append', self._values_append(name[:-len(':append')], body)
+            if method == 'GET':
+                major_dimension = query.get('majorDimension', ['ROWS'])[0]
+                return 'values.get', self._values_get(name, major_dimension)
+            if method == 'PUT':
+                return 'values.update', self._values_update(name, body)
+        raise LookupError(f'Unknown endpoint {method} {path}')
+
+    def _check_id(self, spreadsheet_id):
+        """Raise LookupError for another spreadsheet's id."""
+        if spreadsheet_id != self.spreadsheet_id:
+            raise LookupError(f'Requested entity was not found: {spreadsheet_id}')
+
+    def _touch(self):
+        """Record a modification, as Drive's modifiedTime does."""
+        self.modified_time = max(time.time(), self.modified_time + 0.001)
+
+    def _metadata(self):
+        """Get the spreadsheet's properties and sheets."""
+        return {
+            'spreadsheetId': self.spreadsheet_id,
+            'properties': {'title': 'Fake spreadsheet', 'locale': 'en_US', 'timeZone': 'Etc/GMT'},
+            'sheets': [{
+                'properties': {
+                    'sheetId': self.sheet_id,
+                    'title': self.title,
+                    'index': 0,
+                    'sheetType': 'GRID',
+                    'gridProperties': {
+                        'rowCount': max(1000, len(self.rows)),
+                        'columnCount': max(26, max((len(row) for row in self.rows), default=0)),
+                    },
+                },
+            }],
+        }
+
+    def _drive_file(self):
+        """Get the spreadsheet's Drive metadata."""
+        modified = datetime.fromtimestamp(self.modified_time, timezone.utc)
+        return {
+            'id': self.spreadsheet_id,
+            'name': 'Fake spreadsheet',
+            'modifiedTime': modified.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        }
+
+    def _grid_range(self, name):
+        """Parse an A1 range such as 'Sheet1'!A2:D2 into 0-based bounds."""
+        sheet, _, cells = name.rpartition('!')
+        if not sheet:
+            # A bare name is either a sheet title or a range of the first sheet
+            sheet, cells = (name, '') if name.strip("'") == self.title else (self.title, name)
+        if sheet.strip("'").replace("''", "'") != self.title:
+            raise ValueError(f'Unable to parse range: {name}')
+        grid = a1_range_to_grid_range(cells) if cells else {}
+        return (
+            grid.get('startRowIndex', 0), grid.get('endRowIndex'),
+            grid.get('startColumnIndex', 0), grid.get('endColumnIndex'),
+        )
+
+    def _read(self, name, major_dimension='ROWS'):
+        """
+        Get a range's values as strings, with trailing blanks trimmed.
+
+        With major_dimension 'COLUMNS' the values are listed column by
+        column, as for gspread's col_values.
+        """
+        row_start, row_end, col_start, col_end = self._grid_range(name)
+        values = [
+            ['' if v is None else str(v) for v in row[col_start:col_end]]
+            for row in self.rows[row_start:row_end]
+        ]
+        if major_dimension == 'COLUMNS':
+            width = max((len(cells) for cells in values), default=0)
+            values = [
+                [cells[idx] if idx < len(cells) else '' for cells in values]
+                for idx in range(width)
+            ]
+        for cells in values:
+            while cells and cells[-1] == '':
+                cells.pop()
+        while values and not values[-1]:
+            values.pop()
+        data = {'range': f"'{self.title}'!{self._a1(name)}", 'majorDimension': major_dimension}
+        if values:
+            data['values'] = values
+        return data
+
+    def _a1(self, name):
+        """Get the A1 notation of a range for responses."""
+        row_start, row_end, col_start, col_end = self._grid_range(name)
+        row_end = row_end or max(len(self.rows), row_start + 1)
+        col_end = col_end or 26
+        return f'{rowcol_to_a1(row_start + 1, col_start + 1)}:{rowcol_to_a1(row_end, col_end)}'
+
+    def _write(self, row_start, col_start, values):
+        """Write values into the grid at a position, growing it as needed."""
+        for offset, row_values in enumerate(values):
+            idx = row_start + offset
+            while len(self.rows) <= idx:
+                self.rows.append([])
+            row = self.rows[idx]
+            if len(row) < col_start + len(row_values):
+                row.extend([''] * (col_start + len(row_values) - len(row)))
+            row[col_start:col_start + len(row_values)] = list(row_values)
+        self._touch()
+        return {
+            'updatedRows': len(values),
+            'updatedColumns': max((len(v) for v in values), default=0),
+            'updatedCells': sum(len(v) for v in values),
+        }
+
+    def _values_get(self, name, major_dimension='ROWS'):
+        """values.get"""
+        return self._read(name, major_dimension)
+
+    def _values_batch_get(self, ranges):
+        """values.batchGet"""
+        return {
+            'spreadsheetId': self.spreadsheet_id,
+            'valueRanges': [self._read(name) for name in ranges],
+        }
+
+    def _values_update(self, name, body):
+        """values.update"""
+        row_start, _, col_start, _ = self._grid_range(name)
+        result = self._write(row_start, col_start, body.get('values', []))
+        return dict(result, spreadsheetId=self.spreadsheet_id, updatedRange=name)
+
+    def _values_batch_update(self, body):
+        """values.batchUpdate"""
+        responses = [self._values_update(data['range'], data) for data in body.get('data', [])]
+        return {
+            'spreadsheetId': self.spreadsheet_id,
+            'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+            'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+            'responses': responses,
+        }
+
+    def _values_append(self, name, body):
+        """values.append: write after the last non-empty row."""
+        _, _, col_start, _ = self._grid_range(name)
+        last = len(self.rows)
+        while last and not any(str(v) for v in self.rows[last - 1]):
+            last -= 1
+        result = self._write(last, col_start, body.get('values', []))
+        return {'spreadsheetId': self.spreadsheet_id, 'updates': result}
+
+    def _batch_update(self, body):
+        """spreadsheets.batchUpdate: deleteDimension requests on rows."""
+        replies = []
+        for request in body.get('requests', []):
+            if 'deleteDimension' not in request:
+                raise ValueError(f'Unsupported request: {sorted(request)}')
+            grid = request['deleteDimension']['range']
+            if grid.get('sheetId', 0) != self.sheet_id or grid.get('dimension') != 'ROWS':
+                raise ValueError('Only row deletes on the first sheet are supported')
+            del self.rows[grid['startIndex']:grid['endIndex']]
+            replies.append({})
+        self._touch()
+        return {'spreadsheetId': self.spreadsheet_id, 'replies': replies}
+
+    def adapter(self):
+        """Get a requests transport adapter answering from this fake."""
+        return FakeSheetsAdapter(self)
+
+    def credentials(self):
+        """Get credentials for clients of this fake."""
+        return FakeCredentials()
+
+    def transport(self):
+        """Get an httpx transport answering from this fake."""
+        return FakeSheetsTransport(self)
+
+    def open_worksheet(self):
+        """
+        Open the worksheet with a gspread client whose requests go to the fake.
+
+        Returns:
+            gspread.Worksheet: The fake's worksheet.
+        """
+        session = requests.Session()
+        session.mount('https://', self.adapter())
+        client = gspread.Client(None, session=session)
+        return client.open_by_key(self.spreadsheet_id).sheet1
+
+
+class FakeSheetsAdapter(requests.adapters.BaseAdapter):
+    """requests transport adapter for FakeSheets."""
+
+    def __init__(self, fake):
+        """
+        Initialize the adapter.
+
+        Args:
+            fake: The FakeSheets answering requests.
+        """
+        super().__init__()
+        self.fake = fake
+
+    def send(self, request, **kwargs):
+        """Answer a prepared request."""
+        delay = self.fake.delay()
+        if delay:
+            time.sleep(delay)
+        body = json.loads(request.body) if request.body else None
+        status, headers, data = self.fake.handle(request.method, request.url, body)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.headers['Content-Type'] = 'application/json; charset=UTF-8'
+        response._content = json.dumps(data).encode()
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        """Nothing to release."""
+
+
+class FakeSheetsTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport (sync and async) for FakeSheets."""
+
+    def __init__(self, fake):
+        """
+        Initialize the transport.
+
+        Args:
+            fake: The FakeSheets answering requests.
+        """
+        self.fake = fake
+
+    def _respond(self, request):
+        """Answer a request."""
+        body = json.loads(request.content) if request.content else None
+        status, headers, data = self.fake.handle(request.method, str(request.url), body)
+        return httpx.Response(status, headers=headers, json=data, request=request)
+
+    def handle_request(self, request):
+        """Answer a request, blocking for the fake's latency."""
+        delay = self.fake.delay()
+        if delay:
+            time.sleep(delay)
+        return self._respond(request)
+
+    async def handle_async_request(self, request):
+        """Answer a request, awaiting the fake's latency."""
+        delay = self.fake.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        await request.aread()
+        return self._respond(request)
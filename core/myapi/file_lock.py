@@ -0,0 +1,44 @@
+"""
+File Lock Module
+
+This module provides an advisory inter-process lock backed by a lock file,
+used where several worker processes share files on local disk.
+"""
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """
+    Hold an exclusive lock on a lock file for the duration of the block.
+
+    Args:
+        path: Path of the lock file (created if missing).
+        blocking: Wait for the lock if True, otherwise give up immediately.
+
+    Yields:
+        bool: True if the lock was acquired, False if blocking is False
+        and another process holds it.
+    """
+    if fcntl is None:
+        # No inter-process locking available on this platform
+        yield True
+        return
+
+    with open(path, 'a') as handle:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(handle.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -6,14 +6,30 @@ as a database backend. It supports CRUD operations on sheet data.
 """
 
 import os
+import re
+import threading
+
 import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from gspread.utils import numericise_all
 from django.conf import settings
 
+from .change_feed import ChangeFeed
+from .id_allocator import SheetIdAllocator
+from .metrics import sheets_call, span
+from .rate_limit import SheetsRateLimiter
+from .sheet_cache import SheetSnapshot, normalize_id
+from .sheet_digest import SnapshotDigest
+from .sheet_mirror import SheetMirror
+from .sheet_query import SHEET_FIELDS, OrderedViewCache, sort_rows
+from .sheet_search import SheetSearchIndex
+from .sheet_sync import SheetSyncWorker
+from .single_flight import SingleFlight
+from .sheets_pool import SheetsClientPool, TokenStore
+from .storage import RowMovedError, StorageBackend
+from .write_behind import WriteBehindQueue
+
 
-class GoogleSheetsService:
+class GoogleSheetsService(StorageBackend):
     """Service class for Google Sheets CRUD operations."""
     
     SCOPES = [
@@ -21,64 +37,321 @@ class GoogleSheetsService:
         'https://www.googleapis.com/auth/drive'
     ]
     
-    def __init__(self):
-        """Initialize the Google Sheets connection."""
-        self._client = None
-        self._sheet = None
-        self._token_file = os.path.join(settings.BASE_DIR, 'token.json')
+    def __init__(self, spreadsheet_id=None, worksheet=None, api=None):
+        """
+        Initialize the Google Sheets connection.
+        
+        Args:
+            spreadsheet_id: Spreadsheet holding the rows (default:
+                            GOOGLE_SHEETS_SPREADSHEET_ID).
+            worksheet: Title of the worksheet holding the rows (default:
+                       the spreadsheet's first worksheet).
+            api: Stand-in answering the Sheets API calls instead of Google,
+                 with credentials(), open_worksheet() and transport()
+                 methods, e.g. a myapi.fake_sheets.FakeSheets (default: the
+                 one configured by GOOGLE_SHEETS_FAKE, if any).
+        """
+        self.spreadsheet_id = spreadsheet_id or settings.GOOGLE_SHEETS_SPREADSHEET_ID
+        self.worksheet = worksheet
+        # Keys the id counter, mirror and journal of this sheet
+        self.name = (
+            self.spreadsheet_id if worksheet is None else f'{self.spreadsheet_id}:{worksheet}'
+        )
+        self._tokens = TokenStore(
+            token_file=os.path.join(settings.BASE_DIR, 'token.json'),
+            client_secrets_file=settings.GOOGLE_SHEETS_CREDENTIALS_FILE,
+            scopes=self.SCOPES
+        )
+        self._api = api if api is not None else self._api_from_settings()
+        self._pool = SheetsClientPool(
+            self._open_worksheet,
+            size=getattr(settings, 'GOOGLE_SHEETS_POOL_SIZE', 4)
+        )
+        self._limiter = SheetsRateLimiter(
+            read_per_minute=getattr(settings, 'GOOGLE_SHEETS_READS_PER_MINUTE', 60),
+            write_per_minute=getattr(settings, 'GOOGLE_SHEETS_WRITES_PER_MINUTE', 60),
+            burst=getattr(settings, 'GOOGLE_SHEETS_RATE_BURST', 5),
+            max_retries=getattr(settings, 'GOOGLE_SHEETS_MAX_RETRIES', 5)
+        )
+        self._has_email_column = False
+        self._cache = SheetSnapshot(
+            ttl=getattr(settings, 'GOOGLE_SHEETS_CACHE_TTL', 30)
+        )
+        self._refills = SingleFlight()
+        self._digest = SnapshotDigest()
+        self._cache.subscribe(self._digest)
+        self._views = OrderedViewCache()
+        self._search = None
+        self._search_lock = threading.Lock()
+        self._feed = None
+        self._mirror = None
+        if getattr(settings, 'GOOGLE_SHEETS_MIRROR', False):
+            self._mirror = SheetMirror(
+                name=self.name,
+                max_staleness=getattr(settings, 'GOOGLE_SHEETS_MIRROR_MAX_STALENESS', 60)
+            )
+            self._cache.subscribe(self._mirror)
+        self._sync_worker = SheetSyncWorker(
+            self, interval=getattr(settings, 'GOOGLE_SHEETS_SYNC_INTERVAL', 0)
+        )
+        self._ids = SheetIdAllocator(
+            name=self.name,
+            seed=self._max_sheet_id
+        )
+        self._write_behind = None
+        if getattr(settings, 'GOOGLE_SHEETS_WRITE_BEHIND', False):
+            journal_file = str(getattr(
+                settings, 'GOOGLE_SHEETS_JOURNAL_FILE',
+                os.path.join(settings.BASE_DIR, 'sheets_journal.jsonl')
+            ))
+            if self.name != settings.GOOGLE_SHEETS_SPREADSHEET_ID:
+                journal_file += '.' + re.sub(r'[^\w.-]', '_', self.name)
+            self._write_behind = WriteBehindQueue(
+                self,
+                journal_file=journal_file,
+                flush_interval=getattr(settings, 'GOOGLE_SHEETS_FLUSH_INTERVAL', 5),
+                max_batch_size=getattr(settings, 'GOOGLE_SHEETS_FLUSH_BATCH_SIZE', 500)
+            )
+    
+    def _api_from_settings(self):
+        """Build the fake Sheets API configured by GOOGLE_SHEETS_FAKE, or None."""
+        fake_options = getattr(settings, 'GOOGLE_SHEETS_FAKE', None)
+        if fake_options is None:
+            return None
+        # Only imported when enabled; production never loads the fake
+        from .fake_sheets import FakeSheets
+        if self.name != settings.GOOGLE_SHEETS_SPREADSHEET_ID:
+            # Initial rows only seed the default sheet
+            fake_options = dict(fake_options, rows=None)
+        return FakeSheets(self.spreadsheet_id, title=self.worksheet or 'Sheet1', **fake_options)
     
     def _get_credentials(self):
-        """Get OAuth2 credentials with token refresh support."""
-        creds = None
-        
-        # Check if token.json exists (from previous authentication)
-        if os.path.exists(self._token_file):
-            creds = Credentials.from_authorized_user_file(self._token_file, self.SCOPES)
-        
-        # If no valid credentials, perform OAuth flow
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                # Refresh expired token
-                creds.refresh(Request())
-            else:
-                # Run OAuth flow (opens browser for first-time auth)
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    settings.GOOGLE_SHEETS_CREDENTIALS_FILE,
-                    self.SCOPES
-                )
-                creds = flow.run_local_server(port=0)
-            
-            # Save credentials for next run
-            with open(self._token_file, 'w') as token:
-                token.write(creds.to_json())
-        
-        return creds
-    
-    @property
-    def client(self):
-        """Lazy-load the gspread client."""
-        if self._client is None:
-            credentials = self._get_credentials()
-            self._client = gspread.authorize(credentials)
-        return self._client
-    
-    @property
-    def sheet(self):
-        """Lazy-load the worksheet."""
-        if self._sheet is None:
-            spreadsheet = self.client.open_by_key(settings.GOOGLE_SHEETS_SPREADSHEET_ID)
-            self._sheet = spreadsheet.sheet1  # Use first sheet
-        return self._sheet
+        """Get the OAuth2 credentials shared by all threads and processes."""
+        if self._api is not None:
+            return self._api.credentials()
+        return self._tokens.credentials()
+    
+    def _open_worksheet(self):
+        """Open the worksheet with a new client (and HTTP session) for the pool."""
+        with sheets_call('open_by_key', 'read'):
+            if self._api is not None:
+                return self._api.open_worksheet()
+            client = gspread.authorize(self._get_credentials())
+            spreadsheet = client.open_by_key(self.spreadsheet_id)
+            if self.worksheet is not None:
+                return spreadsheet.worksheet(self.worksheet)
+            return spreadsheet.sheet1  # Use first sheet
+    
+    def _with_sheet(self, kind, operation, func, idempotent=True):
+        """
+        Run one API request with a pooled worksheet, within quota.
+        
+        The worksheet is only borrowed while the request is in flight, not
+        while waiting for quota or backing off between retries.
+        
+        Args:
+            kind: 'read' or 'write', selecting the quota bucket.
+            operation: Name of the call for request metrics, e.g. 'get_all_records'.
+            func: Callable taking the worksheet and making one request.
+            idempotent: Whether a 5xx response may be retried safely.
+            
+        Returns:
+            The result of func.
+            
+        Raises:
+            SheetsUnavailable: If the API still refuses after all retries.
+        """
+        def attempt():
+            with self._pool.sheet() as sheet, sheets_call(operation, kind):
+                return func(sheet)
+        return self._limiter.call(kind, attempt, idempotent=idempotent)
+    
+    def rate_limit_stats(self):
+        """
+        Get rate limiter queue, wait-time and retry metrics.
+        
+        Returns:
+            dict: Limiter statistics.
+        """
+        return self._limiter.stats()
+    
+    def pool_stats(self):
+        """
+        Get client pool size and wait-time metrics.
+        
+        Returns:
+            dict: Pool statistics, plus the number of token refreshes.
+        """
+        return dict(self._pool.stats(), token_refreshes=self._tokens.refreshes)
+    
+    def _get_records(self):
+        """
+        Get all records, served from the snapshot cache while it is fresh.
+        
+        A stale snapshot is reloaded from the database mirror if that is
+        fresh enough, otherwise from the sheet. Concurrent misses share a
+        single reload instead of each fetching the sheet.
+        
+        Returns:
+            list: List of dictionaries representing rows.
+        """
+        self._sync_worker.ensure_started()
+        records = self._cache.get()
+        if records is None:
+            records = self._refills.do(self._refill)
+        return records
+    
+    def _refill(self):
+        """Reload the stale snapshot, once for all concurrent readers."""
+        if self._cache.is_fresh():
+            # Another reader's reload finished after our cache miss
+            return self._cache.get()
+        if self._mirror_is_fresh():
+            records, _ = self._cache.sync(self._mirror.rows())
+            return records
+        return self.refresh()
+    
+    def _mirror_is_fresh(self):
+        """Whether reads may be served from the database mirror."""
+        return self._mirror is not None and self._mirror.is_fresh()
+    
+    def refresh(self):
+        """
+        Re-read the sheet into the snapshot, even if the snapshot is fresh.
+        
+        Listeners (digests, indexes, the change feed) receive the diff
+        against the previous snapshot.
+        
+        Returns:
+            list: The reloaded records.
+        """
+        records, _ = self._reload()
+        return records
+    
+    def sync(self):
+        """
+        Re-read the sheet and apply the rows that changed to the snapshot.
+        
+        Returns:
+            dict: Counts of 'created', 'updated' and 'deleted' rows.
+        """
+        _, diff = self._reload()
+        return diff
+    
+    def _reload(self):
+        """Fetch all records and sync them into the snapshot."""
+        records = self._with_sheet(
+            'read', 'get_all_records', lambda sheet: sheet.get_all_records()
+        )
+        return self._apply_fetched(records)
+    
+    def _apply_fetched(self, records):
+        """
+        Sync records just read from the sheet into the snapshot and mirror.
+        
+        Args:
+            records: The sheet's records, in sheet order.
+            
+        Returns:
+            tuple: (records, diff) as returned by SheetSnapshot.sync.
+        """
+        if self._write_behind is not None:
+            # Mutations not flushed yet are missing from the sheet
+            records = self._write_behind.apply_pending(records)
+        if self._mirror is not None:
+            self._mirror.sync(records)
+        return self._cache.sync(records)
+    
+    def get_modified_time(self):
+        """
+        Get the spreadsheet's last modification time from the Drive API.
+        
+        Much cheaper than reading the sheet, so it is used to check whether
+        anything changed before re-reading.
+        
+        Returns:
+            str: RFC 3339 timestamp, e.g. '2024-01-01T12:00:00.000Z'.
+        """
+        return self._with_sheet(
+            'read', 'get_lastUpdateTime', lambda sheet: sheet.spreadsheet.get_lastUpdateTime()
+        )
+    
+    def mirror_stats(self):
+        """
+        Get database mirror metrics.
+        
+        Returns:
+            dict: Mirror statistics, or None if the mirror is disabled.
+        """
+        if self._mirror is None:
+            return None
+        return self._mirror.stats()
+    
+    def sync_stats(self):
+        """
+        Get background sync lag and diff metrics.
+        
+        Returns:
+            dict: Sync worker statistics.
+        """
+        return self._sync_worker.stats()
+    
+    def _lookup(self, row_id):
+        """
+        Find a row through the snapshot's primary-key index.
+        
+        Args:
+            row_id: The ID of the row.
+            
+        Returns:
+            tuple: (row_number, record) or None if not found.
+        """
+        self._get_records()  # Refresh the snapshot if it is stale
+        return self._cache.lookup(row_id)
+    
+    def invalidate_cache(self):
+        """Drop the cached snapshot so the next read hits the sheet."""
+        self._cache.invalidate()
+        self._has_email_column = False
+    
+    def cache_stats(self):
+        """
+        Get snapshot cache hit/miss counters.
+        
+        Returns:
+            dict: Cache statistics, plus the number of reloads after a miss
+            and of readers that shared another reader's reload.
+        """
+        refills = self._refills.stats()
+        return dict(
+            self._cache.stats(), refills=refills['calls'], refills_shared=refills['shared']
+        )
+    
+    def flush(self):
+        """
+        Send pending write-behind mutations to the sheet now.
+        
+        Returns:
+            int: Number of coalesced mutations written.
+        """
+        if self._write_behind is None:
+            return 0
+        return self._write_behind.flush()
     
     def ensure_email_column(self):
         """
         Ensure the email column exists in the sheet.
         If not, add it as the 4th column.
         """
-        headers = self.sheet.row_values(1)
+        if self._has_email_column:
+            return
+        headers = self._with_sheet('read', 'row_values', lambda sheet: sheet.row_values(1))
         if 'email' not in headers:
             # Add email header in column D
-            self.sheet.update_cell(1, 4, 'email')
+            self._with_sheet(
+                'write', 'update_cell', lambda sheet: sheet.update_cell(1, 4, 'email')
+            )
+        self._has_email_column = True
     
     def get_all_rows(self, user_email=None):
         """
@@ -90,13 +363,173 @@ class GoogleSheetsService:
         Returns:
             list: List of dictionaries representing rows.
         """
-        records = self.sheet.get_all_records()
+        if not self._cache.is_fresh() and self._mirror_is_fresh():
+            # Indexed query instead of loading the whole snapshot
+            return self._mirror.rows(user_email)
+        return list(self._visible_rows(self._get_records(), user_email))
+    
+    def _visible_rows(self, records, user_email=None):
+        """Get the snapshot rows a user can see, in sheet order."""
+        # Filter by email if provided, via the snapshot's email index
+        if user_email:
+            return self._cache.rows_for_email(user_email)
+        
+        return records.select()
+    
+    def iter_rows(self, user_email=None, chunk_size=5000):
+        """
+        Read rows straight from the sheet, one A{n}:D{m} range at a time.
+        
+        Only chunk_size rows are held at once and the snapshot isn't
+        loaded, so exporting a large sheet from a fresh process stays
+        small. Rows inserted or deleted by others while reading may shift
+        a row into a chunk already read (and be skipped) or a later one.
+        
+        Args:
+            user_email: Optional email to filter by.
+            chunk_size: Rows read per Sheets call.
+            
+        Yields:
+            dict: Rows in sheet order.
+        """
+        # Queued writes must reach the sheet before it is read directly
+        self.flush()
+        start = 2  # Row 1 is the header
+        while True:
+            end = start + chunk_size - 1
+            values = self._with_sheet(
+                'read', 'get', lambda sheet: sheet.get(f'A{start}:D{end}')
+            )
+            # Trailing empty rows are trimmed (an empty range reads as [[]]),
+            # so a range without values is the end
+            if not any(values):
+                return
+            for row_values in values:
+                if not any(row_values):
+                    continue
+                record = self._record(row_values)
+                if not user_email or record['email'] == user_email:
+                    yield record
+            start = end + 1
+    
+    def get_view_version(self, user_email=None):
+        """
+        Get a content version of the rows a user can list.
+        
+        Args:
+            user_email: Optional email to filter by (for regular users).
+            
+        Returns:
+            tuple: (digest, last_modified) - a 64-bit content hash that is the
+            same in every process for the same rows, and a Unix timestamp.
+        """
+        self._get_records()  # Refresh the snapshot if it is stale
+        return self._digest.view(user_email)
+    
+    def get_row_version(self, row_id, user_email=None):
+        """
+        Get the version of a single row, for use as an ETag.
+        
+        Args:
+            row_id: The ID of the row.
+            user_email: Optional email to verify ownership.
+            
+        Returns:
+            tuple: (etag, last_modified) or None if not found.
+        """
+        # The digest follows the snapshot, so read the row from it too
+        found = self._lookup(row_id)
+        if found is None:
+            return None
+        record = found[1]
+        if user_email and record.get('email') != user_email:
+            return None
+        version = self._digest.row(row_id)
+        if version is None:
+            return None
+        return self.row_etag(record), version[1]
+    
+    def _search_index(self):
+        """Get the search index, building it from the snapshot on first use."""
+        with self._search_lock:
+            if self._search is None:
+                index = SheetSearchIndex()
+                self._cache.subscribe(index)
+                self._search = index
+            return self._search
+    
+    def change_feed(self):
+        """
+        Get the change feed, starting it on first use.
+        
+        Once started, the feed publishes an event for every row changed
+        through this service, and for changes found when the sheet is
+        reloaded. While anyone is subscribed, the sheet is checked for
+        changes every GOOGLE_SHEETS_FEED_POLL_INTERVAL seconds to pick up
+        outside edits.
+        
+        Returns:
+            ChangeFeed: The feed.
+        """
+        with self._search_lock:
+            if self._feed is None:
+                feed = ChangeFeed(
+                    poll=self._sync_worker.sync_once,
+                    poll_interval=getattr(settings, 'GOOGLE_SHEETS_FEED_POLL_INTERVAL', 10)
+                )
+                self._cache.subscribe(feed)
+                self._feed = feed
+            return self._feed
+    
+    def search_rows(self, filters, user_email=None):
+        """
+        Get rows matching name/description filters and text search.
         
-        # Filter by email if provided
+        Args:
+            filters: (field, lookup, value) triples from sheet_search.parse_filters.
+            user_email: Optional email to filter by (for regular users).
+            
+        Returns:
+            list: Matching rows in sheet order.
+        """
+        self._get_records()  # Refresh the snapshot if it is stale
+        return list(self._matching_rows(filters, user_email))
+    
+    def _matching_rows(self, filters, user_email=None):
+        """Get the snapshot rows matching filters, in sheet order."""
+        ids = self._search_index().search(filters)
         if user_email:
-            records = [r for r in records if r.get('email') == user_email]
+            ids &= self._cache.ids_for_email(user_email)
+        return self._cache.rows_for_ids(ids)
+    
+    def get_ordered_view(self, user_email=None, ordering=(), filters=()):
+        """
+        Get rows in a given order, sorted once per snapshot version.
         
-        return records
+        Args:
+            user_email: Optional email to filter by (for regular users).
+            ordering: (field, descending) pairs from sheet_query.parse_ordering.
+            filters: Optional filters from sheet_search.parse_filters.
+            
+        Returns:
+            OrderedView: The sorted rows and each id's position among them.
+        """
+        records = self._get_records()  # Refresh the snapshot if it is stale
+        return self._ordered_view(records, user_email, ordering, filters)
+    
+    def _ordered_view(self, records, user_email, ordering, filters):
+        """Get a cached ordered view of the current snapshot."""
+        def build():
+            with span('filter'):
+                if filters:
+                    rows = self._matching_rows(filters, user_email=user_email)
+                else:
+                    rows = self._visible_rows(records, user_email=user_email)
+                return sort_rows(rows, ordering) if ordering else rows
+        
+        return self._views.get(
+            self._cache.version, (ordering, user_email, filters), build
+        )
     
     def get_row(self, row_id, user_email=None):
         """
@@ -109,14 +542,17 @@ class GoogleSheetsService:
         Returns:
             dict: Row data or None if not found.
         """
-        records = self.sheet.get_all_records()
-        for record in records:
-            if record.get('id') == row_id:
-                # Check email ownership if provided
-                if user_email and record.get('email') != user_email:
-                    return None
-                return record
-        return None
+        if not self._cache.is_fresh() and self._mirror_is_fresh():
+            record = self._mirror.row(row_id)
+        else:
+            found = self._lookup(row_id)
+            record = found[1] if found is not None else None
+        if record is None:
+            return None
+        # Check email ownership if provided
+        if user_email and record.get('email') != user_email:
+            return None
+        return record
     
     def get_row_number(self, row_id):
         """
@@ -128,11 +564,187 @@ class GoogleSheetsService:
         Returns:
             int: Row number (1-indexed, accounting for header) or None.
         """
-        records = self.sheet.get_all_records()
-        for idx, record in enumerate(records):
-            if record.get('id') == row_id:
-                return idx + 2  # +2 for header row (1) and 0-indexing
-        return None
+        found = self._lookup(row_id)
+        if found is None:
+            return None
+        return found[0]
+    
+    def _max_sheet_id(self):
+        """
+        Get the highest numeric id in the sheet.
+        
+        Returns:
+            int: The max id, or 0 for an empty sheet.
+        """
+        # Handle empty or non-integer IDs
+        ids = []
+        for r in self._get_records():
+            id_val = r.get('id', 0)
+            if isinstance(id_val, int):
+                ids.append(id_val)
+            elif isinstance(id_val, str) and id_val.isdigit():
+                ids.append(int(id_val))
+        return max(ids, default=0)
+    
+    def _next_ids(self, count):
+        """
+        Allocate row ids from the persistent counter.
+        
+        Args:
+            count: Number of ids needed.
+            
+        Returns:
+            list: Ids not used by any cached row.
+        """
+        ids = list(self._ids.allocate(count))
+        if any(self._cache.lookup(i) is not None for i in ids):
+            # Rows were added outside this service, skip past them
+            self._ids.advance_to(self._max_sheet_id())
+            ids = list(self._ids.allocate(count))
+        return ids
+    
+    def _next_id(self):
+        """
+        Allocate the next row id from the persistent counter.
+        
+        Returns:
+            int: An id not used by any cached row.
+        """
+        return self._next_ids(1)[0]
+    
+    @staticmethod
+    def _row_values(row):
+        """Convert a row dict to the sheet's A:D column order."""
+        return [row['id'], row['name'], row['description'], row['email']]
+    
+    def _read_rows(self, targets):
+        """
+        Re-read rows about to be written, straight from the sheet.
+        
+        Writes address rows by position (A{n}:D{n}). If another worker
+        inserted or deleted rows since the snapshot was taken, row n may now
+        hold a different record, so the id found there is checked first.
+        
+        Args:
+            targets: {row_number: row_id} about to be written.
+            
+        Returns:
+            dict: {row_number: current record}, or None if any row number no
+            longer holds its expected id.
+        """
+        if self._write_behind is not None:
+            # The flusher resolves positions by id itself
+            return {n: self._cache.lookup(row_id)[1] for n, row_id in targets.items()}
+        
+        row_numbers = sorted(targets)
+        value_ranges = self._with_sheet(
+            'read', 'batch_get', lambda sheet: sheet.batch_get([f'A{n}:D{n}' for n in row_numbers])
+        )
+        return self._check_rows(targets, row_numbers, value_ranges)
+    
+    @staticmethod
+    def _record(values):
+        """Build a row dict from a row's A:D cell values."""
+        values = list(values)
+        values += [''] * (len(SHEET_FIELDS) - len(values))
+        # Numericise like get_all_records so versions compare equal
+        return dict(zip(SHEET_FIELDS, numericise_all(values)))
+    
+    @staticmethod
+    def _check_rows(targets, row_numbers, value_ranges):
+        """
+        Parse re-read rows and check each still holds its expected id.
+        
+        Args:
+            targets: {row_number: row_id} about to be written.
+            row_numbers: The row numbers that were read, in order.
+            value_ranges: The values read for each row (lists of rows).
+            
+        Returns:
+            dict: {row_number: current record}, or None on an id mismatch.
+        """
+        rows = {}
+        for row_number, value_range in zip(row_numbers, value_ranges):
+            record = GoogleSheetsService._record(value_range[0] if value_range else [])
+            if normalize_id(record['id']) != normalize_id(targets[row_number]):
+                return None
+            rows[row_number] = record
+        return rows
+    
+    def _write_appends(self, rows):
+        """Append rows to the sheet in one call."""
+        values = [self._row_values(row) for row in rows]
+        # Appending twice would duplicate rows, so 5xx responses aren't retried
+        self._with_sheet(
+            'write', 'append_rows', lambda sheet: sheet.append_rows(values), idempotent=False
+        )
+    
+    def _write_updates(self, updates):
+        """Write a list of (row_number, row) pairs to the sheet in one call."""
+        data = [
+            {'range': f'A{row_number}:D{row_number}', 'values': [self._row_values(row)]}
+            for row_number, row in updates
+        ]
+        self._with_sheet('write', 'batch_update', lambda sheet: sheet.batch_update(data))
+    
+    def _write_deletes(self, row_numbers):
+        """Delete rows by 1-indexed row number in one call."""
+        # Positional deletes aren't idempotent either
+        self._with_sheet('write', 'delete_rows', lambda sheet: sheet.spreadsheet.batch_update(
+            {'requests': self._delete_requests(sheet.id, row_numbers)}
+        ), idempotent=False)
+    
+    @staticmethod
+    def _delete_requests(sheet_id, row_numbers):
+        """Build deleteDimension requests for 1-indexed row numbers."""
+        # Delete bottom-up so earlier deletions don't shift later ones,
+        # merging adjacent rows into one range
+        ranges = []
+        for row_number in sorted(set(row_numbers), reverse=True):
+            if ranges and ranges[-1][0] == row_number + 1:
+                ranges[-1][0] = row_number
+            else:
+                ranges.append([row_number, row_number])
+        return [
+            {
+                'deleteDimension': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'dimension': 'ROWS',
+                        'startIndex': start - 1,
+                        'endIndex': end,
+                    }
+                }
+            }
+            for start, end in ranges
+        ]
+    
+    def _apply_appends(self, rows):
+        """Append rows to the sheet (or the write-behind queue) and the snapshot."""
+        if self._write_behind is not None:
+            self._write_behind.enqueue('create', rows)
+        else:
+            self._write_appends(rows)
+        for row in rows:
+            self._cache.append(row)
+    
+    def _apply_updates(self, updates):
+        """Write (row_number, row) updates to the sheet (or queue) and the snapshot."""
+        if self._write_behind is not None:
+            self._write_behind.enqueue('update', [row for _, row in updates])
+        else:
+            self._write_updates(updates)
+        for _, row in updates:
+            self._cache.replace(row['id'], row)
+    
+    def _apply_deletes(self, targets):
+        """Delete a {row_number: row_id} mapping from the sheet (or queue) and the snapshot."""
+        if self._write_behind is not None:
+            self._write_behind.enqueue('delete', [{'id': row_id} for row_id in targets.values()])
+        else:
+            self._write_deletes(targets)
+        for row_id in targets.values():
+            self._cache.remove(row_id)
     
     def create_row(self, data, user_email=None):
         """
@@ -148,31 +760,15 @@ class GoogleSheetsService:
         # Ensure email column exists
         self.ensure_email_column()
         
-        # Get the next ID - handle empty or non-integer IDs
-        records = self.sheet.get_all_records()
-        ids = []
-        for r in records:
-            id_val = r.get('id', 0)
-            if isinstance(id_val, int):
-                ids.append(id_val)
-            elif isinstance(id_val, str) and id_val.isdigit():
-                ids.append(int(id_val))
-        next_id = max(ids, default=0) + 1
-        
         # Prepare row data
-        new_row = {
-            'id': next_id,
-            'name': data.get('name', ''),
-            'description': data.get('description', ''),
-            'email': user_email or data.get('email', '')
-        }
+        new_row = self._new_row(self._next_id(), data, user_email)
         
         # Append to sheet
-        self.sheet.append_row([new_row['id'], new_row['name'], new_row['description'], new_row['email']])
+        self._apply_appends([new_row])
         
         return new_row
     
-    def update_row(self, row_id, data, user_email=None):
+    def update_row(self, row_id, data, user_email=None, if_match=None):
         """
         Update an existing row.
         
@@ -180,60 +776,211 @@ class GoogleSheetsService:
             row_id: The ID of the row to update.
             data: Dictionary with fields to update.
             user_email: Email to verify ownership.
+            if_match: Optional list of acceptable row ETags.
             
         Returns:
             dict: Updated row data or None if not found.
+            
+        Raises:
+            PreconditionFailed: If the row no longer matches if_match.
+            RowMovedError: If the row kept moving during the write.
         """
-        row_number = self.get_row_number(row_id)
-        if row_number is None:
-            return None
-        
-        # Get current data
-        current = self.get_row(row_id)
-        if current is None:
-            return None
-        
-        # Check ownership if email provided
-        if user_email and current.get('email') != user_email:
-            return None
-        
-        # Merge with updates (don't allow changing email)
-        updated = {
-            'id': row_id,
-            'name': data.get('name', current.get('name', '')),
-            'description': data.get('description', current.get('description', '')),
-            'email': current.get('email', '')  # Keep original email
-        }
-        
-        # Update the row
-        self.sheet.update(f'A{row_number}:D{row_number}', 
-                         [[updated['id'], updated['name'], updated['description'], updated['email']]])
-        
-        return updated
+        for _ in range(2):
+            # Locate the row in the snapshot's index
+            found = self._lookup(row_id)
+            if found is None:
+                return None
+            row_number, current = found
+            
+            # Check ownership if email provided
+            if user_email and current.get('email') != user_email:
+                return None
+            
+            # Confirm the row is still at that position and get its latest data
+            rows = self._read_rows({row_number: row_id})
+            if rows is None:
+                # Rows shifted since the snapshot was taken, reload and retry
+                self.invalidate_cache()
+                continue
+            current = rows[row_number]
+            self._check_if_match(current, if_match)
+            
+            # Merge with updates
+            updated = self._merge_update(row_id, current, data)
+            
+            # Update the row
+            self._apply_updates([(row_number, updated)])
+            
+            return updated
+        raise RowMovedError('Rows moved while updating, please retry')
     
-    def delete_row(self, row_id, user_email=None):
+    def delete_row(self, row_id, user_email=None, if_match=None):
         """
         Delete a row by ID.
         
         Args:
             row_id: The ID of the row to delete.
             user_email: Email to verify ownership.
+            if_match: Optional list of acceptable row ETags.
             
         Returns:
             bool: True if deleted, False if not found or not authorized.
+            
+        Raises:
+            PreconditionFailed: If the row no longer matches if_match.
+            RowMovedError: If the row kept moving during the delete.
         """
-        # Check ownership first
-        if user_email:
-            current = self.get_row(row_id)
-            if current is None or current.get('email') != user_email:
+        for _ in range(2):
+            found = self._lookup(row_id)
+            if found is None:
+                return False
+            row_number, current = found
+            
+            # Check ownership
+            if user_email and current.get('email') != user_email:
                 return False
+            
+            # Confirm the row is still at that position before deleting by position
+            rows = self._read_rows({row_number: row_id})
+            if rows is None:
+                self.invalidate_cache()
+                continue
+            self._check_if_match(rows[row_number], if_match)
+            
+            self._apply_deletes({row_number: row_id})
+            return True
+        raise RowMovedError('Rows moved while deleting, please retry')
+    
+    def create_rows(self, items, user_email=None):
+        """
+        Create several rows with a single append.
+        
+        Args:
+            items: List of dictionaries with 'name' and 'description' keys.
+            user_email: Email of the user creating the rows.
+            
+        Returns:
+            list: The created rows with assigned IDs, in input order.
+        """
+        if not items:
+            return []
         
-        row_number = self.get_row_number(row_id)
-        if row_number is None:
-            return False
+        self.ensure_email_column()
+        
+        new_rows = [
+            self._new_row(row_id, data, user_email)
+            for row_id, data in zip(self._next_ids(len(items)), items)
+        ]
+        
+        self._apply_appends(new_rows)
+        
+        return new_rows
+    
+    def append_rows(self, rows):
+        """
+        Append rows that already have ids, e.g. rows routed to this sheet
+        by a ShardedSheetsBackend or moved here while resharding.
+        
+        Args:
+            rows: Complete row dictionaries.
+        """
+        if not rows:
+            return
+        self.ensure_email_column()
+        self._apply_appends(rows)
+    
+    def update_rows(self, updates, user_email=None):
+        """
+        Update several rows with a single batch write.
+        
+        Args:
+            updates: List of dictionaries, each with an 'id' and the fields to update.
+            user_email: Email to verify ownership.
+            
+        Returns:
+            list: Updated row data, or None for rows not found or not
+            authorized, in input order.
+            
+        Raises:
+            RowMovedError: If rows kept moving during the write.
+        """
+        for _ in range(2):
+            targets = {}
+            for data in updates:
+                found = self._lookup(data.get('id'))
+                if found is None:
+                    continue
+                row_number, current = found
+                if user_email and current.get('email') != user_email:
+                    continue
+                targets[row_number] = current.get('id')
+            
+            # Confirm positions and get the latest data in one read
+            rows = self._read_rows(targets) if targets else {}
+            if rows is None:
+                self.invalidate_cache()
+                continue
+            
+            results = []
+            writes = {}
+            numbers = {normalize_id(row_id): n for n, row_id in targets.items()}
+            for data in updates:
+                row_number = numbers.get(normalize_id(data.get('id')))
+                if row_number is None:
+                    results.append(None)
+                    continue
+                # Repeated ids build on the previous update in this batch
+                current = writes.get(row_number, rows[row_number])
+                updated = self._merge_update(current.get('id'), current, data)
+                writes[row_number] = updated
+                results.append(updated)
+            
+            if writes:
+                self._apply_updates(list(writes.items()))
+            
+            return results
+        raise RowMovedError('Rows moved while updating, please retry')
+    
+    def delete_rows(self, row_ids, user_email=None):
+        """
+        Delete several rows with a single batch request.
         
-        self.sheet.delete_rows(row_number)
-        return True
+        Args:
+            row_ids: IDs of the rows to delete.
+            user_email: Email to verify ownership.
+            
+        Returns:
+            list: True for each deleted row, False if not found or not
+            authorized, in input order.
+            
+        Raises:
+            RowMovedError: If rows kept moving during the delete.
+        """
+        for _ in range(2):
+            results = []
+            targets = {}
+            for row_id in row_ids:
+                found = self._lookup(row_id)
+                if found is None:
+                    results.append(False)
+                    continue
+                row_number, current = found
+                if user_email and current.get('email') != user_email:
+                    results.append(False)
+                    continue
+                targets[row_number] = row_id
+                results.append(True)
+            
+            # Confirm positions before deleting by position
+            if targets and self._read_rows(targets) is None:
+                self.invalidate_cache()
+                continue
+            
+            if targets:
+                self._apply_deletes(targets)
+            
+            return results
+        raise RowMovedError('Rows moved while deleting, please retry')
 
 
 # Singleton instance for easy access
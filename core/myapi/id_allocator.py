@@ -0,0 +1,95 @@
+"""
+Sheet ID Allocator Module
+
+This module hands out monotonically increasing row ids for the Google Sheet.
+The counter lives in the Django database, so ids stay unique across threads
+and worker processes without reading the sheet on every insert.
+"""
+
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import SheetIdSequence
+
+
+class SheetIdAllocator:
+    """Database-backed id counter seeded once from the sheet."""
+
+    def __init__(self, name, seed):
+        """
+        Initialize the allocator.
+
+        Args:
+            name: Counter name, one per spreadsheet.
+            seed: Callable returning the highest id already in the sheet.
+                  It is only called when the counter does not exist yet.
+        """
+        self.name = name
+        self._seed = seed
+        self._seeded = False
+        self._lock = threading.Lock()
+
+    def _ensure_sequence(self):
+        """Create the counter from the sheet's current max id if missing."""
+        if self._seeded:
+            return
+        if not SheetIdSequence.objects.filter(name=self.name).exists():
+            start = self._seed()
+            try:
+                SheetIdSequence.objects.get_or_create(
+                    name=self.name, defaults={'last_id': start}
+                )
+            except IntegrityError:
+                # Another process created it first
+                pass
+        self._seeded = True
+
+    def allocate(self, count=1):
+        """
+        Reserve a block of consecutive ids.
+
+        The increment is a single UPDATE inside a transaction, which the
+        database serializes across processes.
+
+        Args:
+            count: Number of ids to reserve.
+
+        Returns:
+            range: The reserved ids.
+        """
+        with self._lock:
+            self._ensure_sequence()
+            with transaction.atomic():
+                SheetIdSequence.objects.filter(name=self.name).update(
+                    last_id=F('last_id') + count
+                )
+                last = SheetIdSequence.objects.values_list(
+                    'last_id', flat=True
+                ).get(name=self.name)
+        return range(last - count + 1, last + 1)
+
+    def next_id(self):
+        """
+        Reserve a single id.
+
+        Returns:
+            int: The new id.
+        """
+        return self.allocate(1)[0]
+
+    def advance_to(self, value):
+        """
+        Move the counter forward so the next id is greater than value.
+
+        Used when rows with higher ids were added outside this service.
+
+        Args:
+            value: Highest id known to be taken.
+        """
+        with self._lock:
+            self._ensure_sequence()
+            SheetIdSequence.objects.filter(
+                name=self.name, last_id__lt=value
+            ).update(last_id=value)
@@ -0,0 +1,346 @@
+"""
+Benchmark the sheet-items request path against an in-memory fake sheet.
+
+    python manage.py benchmark_sheet_items
+    python manage.py benchmark_sheet_items --sizes 10,1000,100000 --requests 200
+    python manage.py benchmark_sheet_items --latency 0.1 --compare benchmark-1a2b3c4.json
+
+For each sheet size, the list, detail, create, update and delete endpoints
+and the matching GoogleSheetsService methods are timed against a FakeSheets
+(see GOOGLE_SHEETS_FAKE), with the quota limiter out of the way. Reported
+per operation: p50/p95/p99 latency, requests per second, Sheets API calls
+per request and the peak memory allocated by one request. Results are saved
+as JSON, tagged with the git commit, so runs can be compared with --compare.
+
+Database writes (id counters) are rolled back after each size. The
+per-request log lines of myapi.requests are silenced while timing, so they
+neither interleave with the results nor add to the latencies.
+"""
+
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from myapi import async_sheets, backends
+from myapi.async_sheets import AsyncGoogleSheetsService
+from myapi.fake_sheets import HEADER
+from myapi.google_sheets import GoogleSheetsService
+
+UNLIMITED = 10 ** 9
+MIN_SAMPLES = 5
+BENCHMARK_EMAIL = 'user1@example.com'
+
+
+def make_rows(size, users):
+    """Build a sheet of size rows spread over users owners, header first."""
+    return [HEADER] + [
+        [i, f'Item {i}', f'Description of item {i}', f'user{i % users}@example.com']
+        for i in range(1, size + 1)
+    ]
+
+
+def git_commit():
+    """Get the short hash of the checked-out commit, or None outside git."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the sheet-items endpoints and service against a fake sheet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,100,1000,10000,100000',
+            help='Comma-separated sheet sizes in rows (default: 10,100,1000,10000,100000).'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Requests per operation and size (default: 100).'
+        )
+        parser.add_argument(
+            '--max-seconds', type=float, default=10,
+            help='Stop an operation early after this many seconds (default: 10).'
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='Seconds of latency the fake adds to each Sheets call (default: 0).'
+        )
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Number of distinct row owners (default: 100).'
+        )
+        parser.add_argument(
+            '--no-memory', action='store_true',
+            help='Skip the tracemalloc pass measuring peak memory per request.'
+        )
+        parser.add_argument(
+            '--output',
+            help='JSON file to write (default: benchmark-<commit>.json).'
+        )
+        parser.add_argument(
+            '--compare', metavar='BASELINE',
+            help='Earlier results file to compare p95 latency and throughput against.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        commit = git_commit()
+        report = {
+            'meta': {
+                'commit': commit,
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'options': {
+                    key: options[key]
+                    for key in ('sizes', 'requests', 'max_seconds', 'latency', 'users')
+                },
+            },
+            'loads': [],
+            'results': [],
+        }
+        self.stdout.write(
+            f"{'rows':>7} {'target':<7} {'operation':<24} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'req/s':>9} {'calls':>6} {'peak KiB':>9}"
+        )
+        request_log = logging.getLogger('myapi.requests')
+        disabled, request_log.disabled = request_log.disabled, True
+        try:
+            for size in sizes:
+                with transaction.atomic():
+                    load, results = self.run_size(size, options)
+                    transaction.set_rollback(True)
+                report['loads'].append(load)
+                report['results'].extend(results)
+        finally:
+            request_log.disabled = disabled
+
+        output = options['output'] or f"benchmark-{commit or int(time.time())}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def run_size(self, size, options):
+        """Benchmark every operation at one sheet size."""
+        fake_options = {
+            'rows': make_rows(size, options['users']),
+            'latency': options['latency'],
+        }
+        with override_settings(
+            GOOGLE_SHEETS_FAKE=fake_options,
+            GOOGLE_SHEETS_SPREADSHEET_ID=f'benchmark-{size}',
+            GOOGLE_SHEETS_READS_PER_MINUTE=UNLIMITED,
+            GOOGLE_SHEETS_WRITES_PER_MINUTE=UNLIMITED,
+            GOOGLE_SHEETS_RATE_BURST=UNLIMITED,
+            GOOGLE_SHEETS_WRITE_BEHIND=False,
+            GOOGLE_SHEETS_MIRROR=False,
+            GOOGLE_SHEETS_SYNC_INTERVAL=0,
+        ):
+            service = GoogleSheetsService()
+        fake = service._api
+        load = self.measure_load(service, size, options)
+
+        # Route the API views to this service
+        previous = backends._backend, async_sheets.async_sheets_service
+        backends._backend = service
+        async_sheets.async_sheets_service = AsyncGoogleSheetsService(service)
+        try:
+            results = []
+            for target, operation, call, count in self.operations(service, size, options):
+                result = self.measure(fake, call, count, options)
+                result.update(size=size, target=target, operation=operation)
+                results.append(result)
+                self.print_result(result)
+        finally:
+            backends._backend, async_sheets.async_sheets_service = previous
+        return load, results
+
+    def measure_load(self, service, size, options):
+        """Time a cold read of the sheet into the snapshot, and its memory."""
+        started = time.perf_counter()
+        service.refresh()
+        load = {'size': size, 'load_ms': round((time.perf_counter() - started) * 1000, 3)}
+        if not options['no_memory']:
+            service.invalidate_cache()
+            tracemalloc.start()
+            service.refresh()
+            load['snapshot_bytes'], load['load_peak_bytes'] = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return load
+
+    def operations(self, service, size, options):
+        """
+        Yield (target, operation, call, count) for each benchmarked operation.
+
+        Rows are created first and then updated and deleted, so the sheet
+        size stays constant from one operation to the next.
+        """
+        owner = User(username='benchmark', email=BENCHMARK_EMAIL)
+        admin = User(username='benchmark-admin', email='admin@example.com', is_superuser=True)
+        client = self.client(owner)
+        admin_client = self.client(admin)
+        rng = random.Random(size)
+        owned = [
+            i for i in range(1, size + 1) if f"user{i % options['users']}@example.com" == BENCHMARK_EMAIL
+        ] or [1]
+        count = options['requests']
+        created = {'http': [], 'service': []}
+        # One more call than timed for the memory pass, except for deletes
+        extra = 0 if options['no_memory'] else 1
+
+        def check(response, expected):
+            if response.status_code != expected:
+                raise CommandError(
+                    f'{response.request["REQUEST_METHOD"]} {response.request["PATH_INFO"]} '
+                    f'returned {response.status_code}: {response.content[:200]!r}'
+                )
+            return response
+
+        def http_create(i):
+            row = check(client.post(
+                '/api/sheet-items/', {'name': f'Bench {i}', 'description': 'created'},
+                format='json'
+            ), 201).json()
+            created['http'].append(row['id'])
+
+        def service_create(i):
+            created['service'].append(
+                service.create_row({'name': f'Bench {i}'}, user_email=BENCHMARK_EMAIL)['id']
+            )
+
+        yield 'service', 'get_all_rows', lambda i: service.get_all_rows(), count
+        yield 'service', 'get_all_rows(user_email)', (
+            lambda i: service.get_all_rows(user_email=BENCHMARK_EMAIL)
+        ), count
+        yield 'service', 'get_row', lambda i: service.get_row(rng.randint(1, size)), count
+        yield 'service', 'create_row', service_create, count
+        yield 'service', 'update_row', lambda i: service.update_row(
+            created['service'][i % len(created['service'])], {'name': f'Renamed {i}'}
+        ), count
+        yield 'service', 'delete_row', lambda i: service.delete_row(
+            created['service'].pop()
+        ), len(created['service']) - extra
+
+        yield 'http', 'list', lambda i: check(client.get('/api/sheet-items/'), 200), count
+        yield 'http', 'list (superuser)', (
+            lambda i: check(admin_client.get('/api/sheet-items/'), 200)
+        ), count
+        yield 'http', 'detail', lambda i: check(
+            client.get(f'/api/sheet-items/{rng.choice(owned)}/'), 200
+        ), count
+        yield 'http', 'create', http_create, count
+        yield 'http', 'update', lambda i: check(client.put(
+            f"/api/sheet-items/{created['http'][i % len(created['http'])]}/",
+            {'name': f'Renamed {i}'}, format='json'
+        ), 200), count
+        yield 'http', 'delete', lambda i: check(
+            client.delete(f"/api/sheet-items/{created['http'].pop()}/"), 204
+        ), len(created['http']) - extra
+
+    def client(self, user):
+        """Get an API client authenticated as user (not saved to the database)."""
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        return client
+
+    def measure(self, fake, call, count, options):
+        """
+        Time up to count calls, then trace one more call's peak memory.
+
+        Returns:
+            dict: Latency percentiles in milliseconds, requests per second,
+            Sheets calls per request and peak traced bytes.
+        """
+        latencies = []
+        calls_before = fake.stats()['total_calls']
+        started = time.perf_counter()
+        for i in range(count):
+            begin = time.perf_counter()
+            call(i)
+            latencies.append(time.perf_counter() - begin)
+            if len(latencies) >= MIN_SAMPLES and begin - started > options['max_seconds']:
+                break
+        elapsed = time.perf_counter() - started
+        sheets_calls = fake.stats()['total_calls'] - calls_before
+
+        peak = None
+        if not options['no_memory']:
+            tracemalloc.start()
+            call(len(latencies))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return {
+            'requests': len(latencies),
+            'p50_ms': round(p50 * 1000, 3),
+            'p95_ms': round(p95 * 1000, 3),
+            'p99_ms': round(p99 * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'sheets_calls_per_request': round(sheets_calls / max(len(latencies), 1), 3),
+            'peak_memory_bytes': peak,
+        }
+
+    def print_result(self, result):
+        """Print one result row."""
+        peak = '-' if result['peak_memory_bytes'] is None else result['peak_memory_bytes'] // 1024
+        self.stdout.write(
+            f"{result['size']:>7} {result['target']:<7} {result['operation']:<24} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+            f"{result['rps'] or 0:>9.1f} {result['sheets_calls_per_request']:>6.2f} {peak:>9}"
+        )
+
+    def compare(self, path, report):
+        """Print p95 latency and throughput changes against a baseline file."""
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+        before = {
+            (r['size'], r['target'], r['operation']): r for r in baseline.get('results', [])
+        }
+        self.stdout.write(
+            f"\nCompared with {baseline.get('meta', {}).get('commit') or path}:"
+        )
+        for result in report['results']:
+            old = before.get((result['size'], result['target'], result['operation']))
+            if old is None or not old['p95_ms'] or not old['rps']:
+                continue
+            p95 = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            rps = ((result['rps'] or 0) - old['rps']) / old['rps'] * 100
+            line = (
+                f"{result['size']:>7} {result['target']:<7} {result['operation']:<24} "
+                f"p95 {p95:+7.1f}%  req/s {rps:+7.1f}%"
+            )
+            self.stdout.write(self.style.WARNING(line) if p95 > 10 else line)
@@ -0,0 +1,138 @@
+"""
+Compare the memory of the compact sheet snapshot with a list of row dicts.
+
+    python manage.py benchmark_snapshot_memory
+    python manage.py benchmark_snapshot_memory --sizes 1000,100000 --users 50
+    python manage.py benchmark_snapshot_memory --output snapshot-memory.json
+
+For each sheet size, rows are built the way get_all_records returns them and
+held either as the list of dicts the snapshot used to keep or as the
+CompactRows it keeps now. Reported: memory retained by each layout (values
+included), what the snapshot's id and email indexes add on top, and the cost
+of what dicts are still built for - a 100-row page and a sort by name.
+"""
+
+import gc
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapi.async_sheets import to_records
+from myapi.fake_sheets import HEADER
+from myapi.sheet_cache import CompactRows, SheetSnapshot
+from myapi.sheet_query import sort_rows
+
+PAGE_SIZE = 100
+MIB = 1024 * 1024
+
+
+def make_values(size, users):
+    """Build a sheet's cell values, with new string objects like a fresh download."""
+    return [list(HEADER)] + [
+        [str(i), f'Item {i}', f'Description of item {i}', f'user{i % users}@example.com']
+        for i in range(1, size + 1)
+    ]
+
+
+def retained(build):
+    """
+    Measure the memory a structure keeps alive.
+
+    Args:
+        build: Callable returning the structure; its temporaries are freed.
+
+    Returns:
+        tuple: (structure, bytes retained).
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def timed(func, repeat=5):
+    """Get the best of repeat timings of func(), in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class Command(BaseCommand):
+    help = 'Compare snapshot memory: CompactRows versus a list of row dicts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,100000',
+            help='Comma-separated sheet sizes in rows (default: 1000,10000,100000).'
+        )
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Number of distinct row owners (default: 100).'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the results to this JSON file.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        users = max(options['users'], 1)
+        self.stdout.write(
+            f"{'rows':>7} {'dicts MiB':>10} {'compact MiB':>12} {'saved':>6} {'index MiB':>10} "
+            f"{'page us':>15} {'sort ms':>15}"
+        )
+        results = [self.run_size(size, users) for size in sizes]
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'users': users, 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_size(self, size, users):
+        """Measure one sheet size."""
+        dicts, dict_bytes = retained(lambda: to_records(make_values(size, users)))
+        compact, compact_bytes = retained(lambda: CompactRows(to_records(make_values(size, users))))
+
+        def load_snapshot():
+            snapshot = SheetSnapshot()
+            snapshot.load(to_records(make_values(size, users)))
+            return snapshot
+
+        snapshot, snapshot_bytes = retained(load_snapshot)
+        del snapshot
+
+        selection = compact.select()
+        ordering = (('name', True),)
+        result = {
+            'rows': size,
+            'dicts_bytes': dict_bytes,
+            'compact_bytes': compact_bytes,
+            'index_bytes': snapshot_bytes - compact_bytes,
+            'page_us': {
+                'dicts': timed(lambda: dicts[size // 2:size // 2 + PAGE_SIZE]) * 1e6,
+                'compact': timed(lambda: selection[size // 2:size // 2 + PAGE_SIZE]) * 1e6,
+            },
+            'sort_ms': {
+                'dicts': timed(lambda: sort_rows(dicts, ordering), repeat=1) * 1e3,
+                'compact': timed(lambda: sort_rows(selection, ordering), repeat=1) * 1e3,
+            },
+        }
+        saved = 1 - compact_bytes / dict_bytes if dict_bytes else 0
+        self.stdout.write(
+            f"{size:>7} {dict_bytes / MIB:>10.2f} {compact_bytes / MIB:>12.2f} {saved:>6.0%} "
+            f"{result['index_bytes'] / MIB:>10.2f} "
+            f"{result['page_us']['dicts']:>7.0f}/{result['page_us']['compact']:<7.0f} "
+            f"{result['sort_ms']['dicts']:>7.1f}/{result['sort_ms']['compact']:<7.1f}"
+        )
+        return result
@@ -0,0 +1,69 @@
+"""
+Write every sheet item to a CSV, NDJSON or JSON file.
+
+    python manage.py export_sheet_items items.csv
+    python manage.py export_sheet_items items.ndjson --chunk-size 10000
+    python manage.py export_sheet_items - --format ndjson --email u@example.com
+
+Rows are read from the backend in chunks (for Google Sheets, one A:D range
+read per --chunk-size rows, without loading a snapshot) and written as they
+arrive, so memory stays bounded however large the sheet is.
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapi.backends import get_backend
+from myapi.rate_limit import BATCH, set_priority
+from myapi.sheet_stream import STREAM_FORMATS, iter_body
+from myapi.sheet_transfer import format_for_path
+
+
+class Command(BaseCommand):
+    help = 'Export sheet items to a CSV, NDJSON or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or - for standard output.")
+        parser.add_argument(
+            '--format', choices=list(STREAM_FORMATS),
+            help='File format (default: from the file extension).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Rows read per batch (default: 5000).'
+        )
+        parser.add_argument(
+            '--email',
+            help="Only export this owner's rows."
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (None if path == '-' else format_for_path(path))
+        if fmt not in STREAM_FORMATS:
+            raise CommandError(f'Pass --format ({", ".join(STREAM_FORMATS)}) for this file.')
+
+        set_priority(BATCH)
+        count = 0
+
+        def counted(rows):
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+
+        rows = get_backend().iter_rows(
+            user_email=options['email'], chunk_size=max(options['chunk_size'], 1)
+        )
+        chunks = iter_body(counted(rows), None, fmt)
+        if path == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            self.stderr.write(f'Exported {count} rows.')
+            return
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Exported {count} rows to {path}.'))
@@ -0,0 +1,121 @@
+"""
+Load sheet items from a CSV or NDJSON file.
+
+    python manage.py import_sheet_items items.csv
+    python manage.py import_sheet_items items.ndjson --chunk-size 1000
+    python manage.py import_sheet_items items.csv --email owner@example.com
+    python manage.py import_sheet_items items.csv --restart
+
+CSV files need a header line (id, name, description, email); NDJSON files
+hold one object per line. Rows whose id already exists are updated, the
+rest are created, a chunk at a time (see myapi.sheet_transfer).
+
+Progress is saved to a checkpoint file after every chunk, and a rerun with
+the same file resumes after the last saved chunk. A chunk that was being
+written when the run was interrupted may be written again on resume.
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapi.backends import get_backend
+from myapi.rate_limit import BATCH, set_priority
+from myapi.sheet_transfer import DEFAULT_CHUNK_SIZE, SheetImport, format_for_path, read_records
+
+
+def load_checkpoint(path, source):
+    """
+    Read the records an earlier run of the same file processed.
+
+    Args:
+        path: Checkpoint file.
+        source: Identity of the input file, as saved by save_checkpoint.
+
+    Returns:
+        int: Records to skip, 0 if there's no checkpoint for this file.
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get('source') != source:
+        return 0
+    return checkpoint.get('processed', 0)
+
+
+def save_checkpoint(path, source, importer):
+    """Record an import's progress, replacing the checkpoint atomically."""
+    temp = f'{path}.tmp'
+    with open(temp, 'w') as f:
+        json.dump({'source': source, **importer.stats()}, f)
+    os.replace(temp, path)
+
+
+class Command(BaseCommand):
+    help = 'Import sheet items from a CSV or NDJSON file, in resumable chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import.')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'],
+            help='File format (default: from the file extension).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'Records written per batch (default: {DEFAULT_CHUNK_SIZE}).'
+        )
+        parser.add_argument(
+            '--email', default='',
+            help='Owner of imported rows that have no email.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Progress file (default: the input path plus .checkpoint).'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore saved progress and import the whole file.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for_path(path)
+        if fmt not in ('csv', 'ndjson'):
+            raise CommandError('Pass --format csv or --format ndjson for this file.')
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        # A changed file starts over rather than skipping the wrong records
+        source = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        skip = 0 if options['restart'] else load_checkpoint(checkpoint, source)
+        if skip:
+            self.stdout.write(f'Resuming after {skip} records')
+
+        set_priority(BATCH)
+        importer = SheetImport(
+            get_backend(), default_email=options['email'],
+            chunk_size=options['chunk_size'], processed=skip
+        )
+
+        def on_chunk(importer):
+            save_checkpoint(checkpoint, source, importer)
+            self.stdout.write(
+                f'{importer.processed} records: {importer.created} created, '
+                f'{importer.updated} updated, {importer.failed} failed'
+            )
+
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            stats = importer.run(read_records(f, fmt), on_chunk=on_chunk)
+        for error in stats['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['processed']} records: {stats['created']} created, "
+            f"{stats['updated']} updated, {stats['failed']} failed."
+        ))
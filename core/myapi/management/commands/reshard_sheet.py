@@ -0,0 +1,113 @@
+"""
+Move sheet items to the shards the current shard map assigns them to.
+
+    python manage.py reshard_sheet --dry-run      # count the rows to move
+    python manage.py reshard_sheet
+    python manage.py reshard_sheet --batch-size 200 --settle 60
+
+Run it while GOOGLE_SHEETS_PREVIOUS_SHARDS lists the old shards, so the API
+finds rows at either placement during the move (see myapi.sharding). Each
+batch is copied to its new shards first and only removed from its old shard
+--settle seconds later, once every worker process has reloaded its snapshots
+and sends writes to the new copies. Edits and deletes that still reached the
+old copies in the meantime are carried over before they are removed.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapi.backends import get_backend
+from myapi.rate_limit import BATCH, set_priority
+from myapi.sharding import ShardedSheetsBackend
+from myapi.sheet_cache import normalize_id
+from myapi.sheet_digest import row_key
+from myapi.storage import PreconditionFailed
+
+
+class Command(BaseCommand):
+    help = 'Move sheet items to their shards after GOOGLE_SHEETS_SHARDS changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Rows moved per batch (default: 100).'
+        )
+        parser.add_argument(
+            '--settle', type=float,
+            default=getattr(settings, 'GOOGLE_SHEETS_CACHE_TTL', 30),
+            help='Seconds between copying a batch and removing the old copies '
+                 '(default: GOOGLE_SHEETS_CACHE_TTL).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows each shard would move.'
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not isinstance(backend, ShardedSheetsBackend):
+            raise CommandError("SHEET_ITEMS_BACKEND must be 'sharded' to reshard.")
+        set_priority(BATCH)
+        batch_size = max(options['batch_size'], 1)
+        moved = 0
+        for name, source in backend.services.items():
+            source.refresh()
+            misplaced = [row for row in source.get_all_rows() if backend.map.shard_for(row) != name]
+            self.stdout.write(f'{name}: {len(misplaced)} rows to move')
+            if options['dry_run']:
+                continue
+            for start in range(0, len(misplaced), batch_size):
+                batch = misplaced[start:start + batch_size]
+                self.move(backend, source, batch, options['settle'])
+                moved += len(batch)
+                self.stdout.write(f'{name}: moved {moved} rows')
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Moved {moved} rows. Remove GOOGLE_SHEETS_PREVIOUS_SHARDS once deployed.'
+            ))
+
+    def move(self, backend, source, rows, settle):
+        """
+        Copy rows to their shards, then remove them from the source shard.
+
+        Args:
+            backend: The ShardedSheetsBackend.
+            source: GoogleSheetsService the rows are in now.
+            rows: Rows to move.
+            settle: Seconds to wait before removing the old copies.
+        """
+        copies = {}
+        groups = {}
+        for row in rows:
+            groups.setdefault(backend.map.shard_for(row), []).append(row)
+        for name, group in groups.items():
+            target = backend.services[name]
+            target.refresh()
+            # Rows an interrupted run already copied get writes at their new
+            # place, so only the copy's removal is left to do
+            new = [row for row in group if target.get_row(row['id']) is None]
+            target.append_rows(new)
+            copies.update((normalize_id(row['id']), None) for row in group)
+            copies.update((normalize_id(row['id']), (target, row)) for row in new)
+
+        time.sleep(settle)
+        source.refresh()
+        for row_id, copy in copies.items():
+            if copy is None:
+                continue
+            target, copied = copy
+            current = source.get_row(row_id)
+            if current is not None and row_key(current) == row_key(copied):
+                continue
+            # Changed at the old place after the copy; carry the change over
+            # unless the new copy was edited too
+            try:
+                if current is None:
+                    target.delete_row(row_id, if_match=[target.row_etag(copied)])
+                else:
+                    target.update_row(row_id, current, if_match=[target.row_etag(copied)])
+            except PreconditionFailed:
+                pass
+        source.delete_rows(list(copies))
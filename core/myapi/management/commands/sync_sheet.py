@@ -0,0 +1,66 @@
+"""
+Poll the Google Sheet for outside edits and sync them into the snapshot.
+
+    python manage.py sync_sheet              # poll every GOOGLE_SHEETS_SYNC_INTERVAL seconds
+    python manage.py sync_sheet --once       # check once and print the diff
+    python manage.py sync_sheet --interval 5
+
+With GOOGLE_SHEETS_MIRROR enabled, this keeps the database mirror fresh for
+every web process.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapi.google_sheets import sheets_service
+from myapi.rate_limit import BATCH, set_priority
+
+
+class Command(BaseCommand):
+    help = 'Poll the Google Sheet for changes and apply row-level diffs to the snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            default=getattr(settings, 'GOOGLE_SHEETS_SYNC_INTERVAL', 0) or 10,
+            help='Seconds between polls (default: GOOGLE_SHEETS_SYNC_INTERVAL, or 10).'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Check the sheet once and exit.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Re-read the sheet even if its modification time did not move.'
+        )
+
+    def handle(self, *args, **options):
+        set_priority(BATCH)
+        worker = sheets_service._sync_worker
+        force = options['force']
+        while True:
+            try:
+                diff = worker.sync_once(force=force)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Sync failed: {e}'))
+            else:
+                if sheets_service._mirror is not None:
+                    sheets_service._mirror.wait()  # Let the database mirror catch up
+                self.report(diff, worker.stats())
+            if options['once']:
+                return
+            force = False
+            time.sleep(options['interval'])
+
+    def report(self, diff, stats):
+        """Print the outcome of one poll."""
+        if diff is None:
+            self.stdout.write(f"Unchanged since {stats['modified_time']}")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {stats['modified_time']}: {diff['created']} created, "
+            f"{diff['updated']} updated, {diff['deleted']} deleted "
+            f"(lag {stats['lag_seconds']}s)"
+        ))
@@ -0,0 +1,419 @@
+"""
+Request Metrics Module
+
+This module times what each API request spends its time on - authentication,
+Google Sheets calls, filtering and rendering - and exports it three ways:
+
+- a Server-Timing response header (RequestMetricsMiddleware), readable in the
+  browser's network panel;
+- one structured (JSON) log line per request on the 'myapi.requests' logger;
+- Prometheus counters and histograms at /metrics (metrics_view).
+
+Code being timed wraps itself in span() or sheets_call(). The middleware
+collects the spans of the current request through a context variable, so
+the same hooks work in threads, sync_to_async calls and asyncio tasks.
+
+Metrics are kept per process; with several worker processes, scrape each
+one or aggregate in Prometheus. /metrics only answers clients listed in
+METRICS_ALLOWED_IPS or sending the METRICS_TOKEN bearer token.
+"""
+
+import contextvars
+import hmac
+import json
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger('myapi.requests')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def _format_labels(names, values, extra=()):
+    """Format a Prometheus label set such as {kind="read"}."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    """Format a sample value in the exposition format."""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric with labeled children, registered for /metrics."""
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        """
+        Initialize and register the metric.
+
+        Args:
+            name: Metric name, e.g. 'sheets_api_calls_total'.
+            help: One-line description.
+            labels: Label names.
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def render(self):
+        """Get the metric's lines in the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        """Add amount to the count of a label set."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _render_samples(self, items):
+        """Yield one sample line per label set."""
+        for label_values, value in items:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}'
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize and register the histogram.
+
+        Args:
+            name: Metric name, e.g. 'http_request_duration_seconds'.
+            help: One-line description.
+            labels: Label names.
+            buckets: Upper bounds of the buckets, in seconds.
+        """
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, *label_values):
+        """Record one observation for a label set."""
+        with self._lock:
+            counts, total = self._values.get(label_values, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[label_values] = (counts, total + value)
+
+    def _render_samples(self, items):
+        """Yield bucket, sum and count lines per label set."""
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labels, label_values, [('le', _format_value(bound))]
+                )
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests handled.', ['method', 'route', 'status']
+)
+HTTP_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to produce the response.', ['method', 'route']
+)
+SPAN_DURATION = Histogram(
+    'request_span_duration_seconds',
+    'Time spent in a stage of request handling (auth, filter, render).', ['span']
+)
+SHEETS_CALLS = Counter(
+    'sheets_api_calls_total', 'Google Sheets API calls, by outcome (ok or HTTP status).',
+    ['operation', 'kind', 'outcome']
+)
+SHEETS_DURATION = Histogram(
+    'sheets_api_call_duration_seconds', 'Google Sheets API call latency.', ['operation']
+)
+
+
+class RequestTimings:
+    """Spans recorded while handling one request."""
+
+    def __init__(self):
+        """Start timing a request."""
+        self.started = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        """Add one occurrence of a span."""
+        with self._lock:
+            count, total = self.spans.get(name, (0, 0.0))
+            self.spans[name] = (count + 1, total + seconds)
+
+    def elapsed(self):
+        """Get seconds since the request started."""
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """
+        Format the spans as a Server-Timing header value.
+
+        Args:
+            total: Seconds the whole request took.
+
+        Returns:
+            str: e.g. 'auth;dur=1.2, sheets.get_all_records;dur=310.5;desc="2 calls", total;dur=320.1'
+        """
+        with self._lock:
+            spans = list(self.spans.items())
+        entries = []
+        for name, (count, seconds) in spans:
+            entry = f'{name};dur={seconds * 1000:.1f}'
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+    def as_dict(self):
+        """Get the spans as {name: {'count', 'ms'}}."""
+        with self._lock:
+            return {
+                name: {'count': count, 'ms': round(seconds * 1000, 3)}
+                for name, (count, seconds) in self.spans.items()
+            }
+
+
+@contextmanager
+def span(name):
+    """
+    Time a stage of request handling.
+
+    Args:
+        name: Span name, e.g. 'auth' or 'render'.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        SPAN_DURATION.observe(seconds, name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, seconds)
+
+
+@contextmanager
+def sheets_call(operation, kind):
+    """
+    Count and time one Google Sheets API call.
+
+    Args:
+        operation: The call, e.g. 'get_all_records' or 'values.batchGet'.
+        kind: 'read' or 'write'.
+    """
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception as e:
+        response = getattr(e, 'response', None)
+        outcome = str(getattr(response, 'status_code', None) or 'error')
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        SHEETS_CALLS.inc(operation, kind, outcome)
+        SHEETS_DURATION.observe(seconds, operation)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(f'sheets.{operation}', seconds)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record per-request timings, add a Server-Timing header and log them.
+
+    Place it first in MIDDLEWARE so the total covers the other middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Wrap the next handler, staying async under ASGI."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        """Time rendering of DRF (template) responses."""
+        timings = _current.get()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                seconds = time.perf_counter() - started
+                SPAN_DURATION.observe(seconds, 'render')
+                timings.add('render', seconds)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _finish(self, request, response, timings):
+        """Export a finished request's timings."""
+        total = timings.elapsed()
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        HTTP_REQUESTS.inc(request.method, route, response.status_code)
+        HTTP_DURATION.observe(total, request.method, route)
+
+        header = timings.server_timing(total)
+        if response.has_header('Server-Timing'):
+            header = f"{response['Server-Timing']}, {header}"
+        response['Server-Timing'] = header
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 3),
+                'spans': timings.as_dict(),
+            }))
+        return response
+
+
+def _backend_gauges():
+    """Get lines for the sheet-items backend's stats methods, as gauges."""
+    from .backends import get_backend
+
+    backend = get_backend()
+    lines = []
+    for method in ('cache_stats', 'pool_stats', 'rate_limit_stats', 'sync_stats', 'mirror_stats'):
+        stats = getattr(backend, method, None)
+        if stats is None:
+            continue
+        try:
+            values = stats()
+        except Exception:
+            logger.exception('Failed to collect %s', method)
+            continue
+        prefix = f"sheet_items_{method[:-len('_stats')]}"
+        for name, value in _flatten(values):
+            metric = f'{prefix}_{name}'
+            lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{metric} {_format_value(value)}')
+    return lines
+
+
+def _flatten(values, prefix=''):
+    """Yield (name, number) pairs from nested stats dictionaries."""
+    for key, value in (values or {}).items():
+        # Keys such as shard names may hold characters metric names can't
+        name = prefix + re.sub(r'[^a-zA-Z0-9_]', '_', str(key))
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{name}_')
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def render_metrics():
+    """
+    Get all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics page.
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    if getattr(settings, 'METRICS_INCLUDE_BACKEND_STATS', False):
+        lines.extend(_backend_gauges())
+    return '\n'.join(lines) + '\n'
+
+
+def may_scrape(request):
+    """
+    Check whether a request may read the metrics page.
+
+    Allowed are clients whose address is in METRICS_ALLOWED_IPS (by default
+    only the local host) and, when METRICS_TOKEN is set, requests sending
+    it as a bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(
+            credentials.strip().encode(), token.encode()
+        ):
+            return True
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    return request.META.get('REMOTE_ADDR') in allowed
+
+
+def metrics_view(request):
+    """Serve the metrics page for Prometheus to scrape."""
+    if not may_scrape(request):
+        return HttpResponseForbidden('Forbidden\n', content_type='text/plain')
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -11,4 +11,39 @@ class Item(models.Model):
     description = models.TextField()
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class SheetIdSequence(models.Model):
+    """Persistent counter used to hand out ids for Google Sheets rows."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.last_id}'
+
+class SheetRow(models.Model):
+    """Local mirror of one Google Sheets row, so reads can skip the API."""
+    sheet = models.CharField(max_length=100)
+    row_id = models.CharField(max_length=64)
+    email = models.CharField(max_length=254, blank=True)
+    position = models.IntegerField()
+    data = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sheet', 'row_id'], name='unique_sheet_row_id'),
+        ]
+        indexes = [
+            models.Index(fields=['sheet', 'email', 'position'], name='sheet_row_email_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.sheet}: {self.row_id}'
+
+class SheetMirrorState(models.Model):
+    """When a sheet's mirror was last brought up to date with the sheet."""
+    name = models.CharField(max_length=100, unique=True)
+    synced_at = models.FloatField(null=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.synced_at}'
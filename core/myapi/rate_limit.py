@@ -0,0 +1,365 @@
+"""
+Rate Limit Module
+
+This module keeps Google Sheets traffic under the API's per-minute quotas.
+Read and write requests draw from separate token buckets, waiting requests
+are served in priority order (interactive API requests ahead of batch jobs
+such as seed scripts and the write-behind flusher), and 429/5xx responses
+are retried with jittered exponential backoff.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Request priorities, lower is served first. Background work (seed scripts,
+# imports, resharding, sync polling, write-behind flushes) runs at BATCH, so
+# when quota runs short it waits and interactive API requests go first.
+INTERACTIVE = 0
+BATCH = 10
+
+_priority = ContextVar('sheets_priority', default=INTERACTIVE)
+
+# Status codes worth retrying: timeouts, quota exhaustion and server errors
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class SheetsUnavailable(Exception):
+    """The Sheets API kept rejecting a request after all retries."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Run the block's Sheets calls at a given priority.
+
+    Applies to the current thread or asyncio task only.
+
+    Args:
+        priority: INTERACTIVE, BATCH or any int (lower is served first).
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_priority(priority):
+    """
+    Set the Sheets call priority for the rest of the current thread.
+
+    Background jobs call set_priority(BATCH) once at the start to yield
+    quota to interactive API requests.
+    """
+    _priority.set(priority)
+
+
+def _status_code(error):
+    """Get the HTTP status of a gspread APIError or httpx.HTTPStatusError."""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _retry_after(error):
+    """Get the Retry-After seconds of an error response, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose waiters are served by priority.
+
+    A request takes a token immediately when one is available and nobody
+    is queued. Otherwise it queues, and a scheduler thread hands out tokens
+    as they refill, highest priority (then oldest) first. Both threads and
+    asyncio tasks can wait.
+    """
+
+    def __init__(self, per_minute, burst=1):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute: Tokens added per minute.
+            burst: Maximum tokens that can accumulate.
+
+        Raises:
+            ValueError: If per_minute is not positive; such a bucket would
+                never refill.
+        """
+        if per_minute <= 0:
+            raise ValueError(f'Requests per minute must be positive, got {per_minute}')
+        self.rate = per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self.granted = 0
+        self.queued = 0
+        self.wait_seconds_total = 0.0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._scheduler = None
+
+    def _refill(self):
+        """Add the tokens accrued since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take_now(self):
+        """Take a token if one is free and nobody is queued (call with the lock held)."""
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            self.granted += 1
+            return True
+        return False
+
+    def _enqueue(self, priority, grant):
+        """Queue a waiter and make sure the scheduler is running; returns its entry."""
+        entry = (priority, next(self._sequence), grant)
+        heapq.heappush(self._waiters, entry)
+        self.queued += 1
+        if self._scheduler is None:
+            self._start_scheduler()
+        self._condition.notify()
+        return entry
+
+    def _cancel(self, entry):
+        """Drop a waiter that gave up, or put back the token it was granted."""
+        with self._condition:
+            try:
+                self._waiters.remove(entry)
+            except ValueError:
+                # The scheduler got to it first
+                self._tokens = min(self.capacity, self._tokens + 1)
+                self.granted -= 1
+            else:
+                heapq.heapify(self._waiters)
+            self._condition.notify()
+
+    def _start_scheduler(self):
+        """Start the thread serving queued waiters (call with the lock held)."""
+        self._scheduler = threading.Thread(
+            target=self._schedule, name='sheets-rate-limit', daemon=True
+        )
+        self._scheduler.start()
+
+    def _schedule(self):
+        """Hand out tokens to queued waiters as they refill."""
+        try:
+            with self._condition:
+                while True:
+                    while not self._waiters:
+                        self._condition.wait()
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.granted += 1
+                        _, _, grant = heapq.heappop(self._waiters)
+                        try:
+                            grant()
+                        except Exception:
+                            # E.g. the waiter's event loop was closed; serve the rest
+                            logger.exception('Failed to wake a Sheets rate limit waiter')
+                    else:
+                        self._condition.wait((1 - self._tokens) / self.rate)
+        finally:
+            # Never leave waiters parked without a scheduler
+            with self._condition:
+                self._scheduler = None
+                if self._waiters:
+                    self._start_scheduler()
+
+    def acquire(self, priority=INTERACTIVE):
+        """
+        Take a token, blocking until one is available.
+
+        Args:
+            priority: Queue priority, lower is served first.
+        """
+        started = time.monotonic()
+        with self._condition:
+            if self._take_now():
+                return
+            granted = threading.Event()
+            self._enqueue(priority, granted.set)
+        granted.wait()
+        with self._condition:
+            self.wait_seconds_total += time.monotonic() - started
+
+    async def acquire_async(self, priority=INTERACTIVE):
+        """
+        Take a token, awaiting one without blocking the event loop.
+
+        Args:
+            priority: Queue priority, lower is served first.
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(
+                lambda: granted.done() or granted.set_result(None)
+            )
+
+        with self._condition:
+            if self._take_now():
+                return
+            entry = self._enqueue(priority, grant)
+        try:
+            await granted
+        except asyncio.CancelledError:
+            self._cancel(entry)
+            raise
+        with self._condition:
+            self.wait_seconds_total += time.monotonic() - started
+
+    def stats(self):
+        """
+        Get bucket counters.
+
+        Returns:
+            dict: Tokens granted, requests that had to queue, queue length
+            and total seconds spent waiting.
+        """
+        with self._condition:
+            return {
+                'granted': self.granted,
+                'queued': self.queued,
+                'waiting': len(self._waiters),
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+            }
+
+
+class SheetsRateLimiter:
+    """Read/write token buckets plus retries with jittered exponential backoff."""
+
+    def __init__(self, read_per_minute=60, write_per_minute=60, burst=5,
+                 max_retries=5, base_delay=1.0, max_delay=32.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            read_per_minute: Read requests allowed per minute.
+            write_per_minute: Write requests allowed per minute.
+            burst: Requests of each kind that may be sent back to back.
+            max_retries: Retries of a 429/5xx response before giving up.
+            base_delay: Backoff ceiling of the first retry, in seconds.
+            max_delay: Maximum backoff ceiling, in seconds.
+        """
+        self.buckets = {
+            'read': TokenBucket(read_per_minute, burst),
+            'write': TokenBucket(write_per_minute, burst),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt, error, idempotent):
+        """
+        Get the delay before retrying, or None if the error is final.
+
+        Non-idempotent requests (appends, positional deletes) are only retried
+        on 429 and 408, which Google rejects before applying anything.
+        """
+        code = _status_code(error)
+        if code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+            return None
+        if not idempotent and code not in (408, 429):
+            return None
+        with self._lock:
+            self.retries += 1
+        # Full jitter spreads the retries of concurrent requests apart
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _give_up(self, error):
+        """Turn a final quota or server error into SheetsUnavailable."""
+        if _status_code(error) in RETRY_STATUS_CODES:
+            retry_after = _retry_after(error)
+            raise SheetsUnavailable(
+                'Google Sheets is busy, please retry shortly',
+                retry_after=self.max_delay if retry_after is None else retry_after
+            ) from error
+        raise error
+
+    def call(self, kind, func, idempotent=True):
+        """
+        Call func() within the kind's quota, retrying 429/5xx responses.
+
+        Args:
+            kind: 'read' or 'write'.
+            func: The callable making one API request.
+            idempotent: Whether a 5xx response may be retried safely.
+
+        Returns:
+            The result of func().
+
+        Raises:
+            SheetsUnavailable: If the API still refuses after all retries.
+        """
+        bucket = self.buckets[kind]
+        for attempt in itertools.count():
+            bucket.acquire(_priority.get())
+            try:
+                return func()
+            except Exception as e:
+                delay = self._backoff(attempt, e, idempotent)
+                if delay is None:
+                    self._give_up(e)
+            time.sleep(delay)
+
+    async def acall(self, kind, func, idempotent=True):
+        """
+        Async variant of call(); func() returns an awaitable.
+
+        Raises:
+            SheetsUnavailable: If the API still refuses after all retries.
+        """
+        bucket = self.buckets[kind]
+        for attempt in itertools.count():
+            await bucket.acquire_async(_priority.get())
+            try:
+                return await func()
+            except Exception as e:
+                delay = self._backoff(attempt, e, idempotent)
+                if delay is None:
+                    self._give_up(e)
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        """
+        Get limiter metrics.
+
+        Returns:
+            dict: Per-bucket statistics and the number of retries.
+        """
+        return {
+            'read': self.buckets['read'].stats(),
+            'write': self.buckets['write'].stats(),
+            'retries': self.retries,
+        }
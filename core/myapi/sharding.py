@@ -0,0 +1,550 @@
+"""
+Sheet Sharding Module
+
+This module spreads sheet items over several worksheets or spreadsheets
+(shards), so no single tab grows into the Sheets cell limits or slows down
+every read. Select it with SHEET_ITEMS_BACKEND = 'sharded' and list the
+shards in GOOGLE_SHEETS_SHARDS.
+
+Each row lives in the shard its key hashes to: the row id, or the owner
+email (GOOGLE_SHEETS_SHARD_KEY), so that a user's rows stay together and
+their listings read a single shard. Placement uses rendezvous hashing, so
+adding a shard only moves the rows that now belong to it.
+
+Lookups, updates and deletes are routed to the row's shard. Listings that
+span shards (superusers, or any listing when sharding by id) read the
+shards in parallel and merge the results.
+
+Resharding without downtime:
+
+1. Copy GOOGLE_SHEETS_SHARDS to GOOGLE_SHEETS_PREVIOUS_SHARDS, change
+   GOOGLE_SHEETS_SHARDS and deploy. Rows are now looked up at their new
+   placement first and their old one second, so both places serve reads.
+2. Run `manage.py reshard_sheet` to move the rows to their new shards.
+3. Remove GOOGLE_SHEETS_PREVIOUS_SHARDS and deploy.
+"""
+
+import contextvars
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .change_feed import ChangeFeed
+from .google_sheets import GoogleSheetsService
+from .id_allocator import SheetIdAllocator
+from .sheet_cache import normalize_id
+from .sheet_query import OrderedViewCache, sort_rows
+from .storage import StorageBackend
+
+SHARD_KEYS = ('id', 'email')
+ID_ORDER = (('id', False),)
+
+
+def _weight(shard, key):
+    """Rendezvous weight of a key on a shard, the same in every process."""
+    data = f'{shard}\x1f{key}'.encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+class ShardMap:
+    """Assignment of rows to shards by rendezvous (highest random weight) hashing."""
+
+    def __init__(self, shards, key='id'):
+        """
+        Initialize the map.
+
+        Args:
+            shards: Shard specs, dicts with a 'name' and optionally a
+                    'spreadsheet_id' and a 'worksheet' title.
+            key: Row field shards are chosen by, 'id' or 'email'.
+
+        Raises:
+            ImproperlyConfigured: If there are no shards, names repeat or
+            the key is unknown.
+        """
+        if key not in SHARD_KEYS:
+            raise ImproperlyConfigured(f'Shard key must be one of {SHARD_KEYS}, not {key!r}')
+        names = [shard['name'] for shard in shards]
+        if not names:
+            raise ImproperlyConfigured('At least one shard is required')
+        if len(set(names)) != len(names):
+            raise ImproperlyConfigured('Shard names must be unique')
+        self.shards = {shard['name']: shard for shard in shards}
+        self.names = names
+        self.key = key
+
+    def shard_for_key(self, value):
+        """
+        Get the shard a key value belongs to.
+
+        Args:
+            value: A row id or owner email.
+
+        Returns:
+            str: The shard name.
+        """
+        key = str(normalize_id(value) if self.key == 'id' else value or '')
+        return max(self.names, key=lambda name: _weight(name, key))
+
+    def shard_for(self, row):
+        """Get the shard a row belongs to."""
+        return self.shard_for_key(row.get(self.key))
+
+
+class ShardedSheetsBackend(StorageBackend):
+    """
+    Rows spread over several GoogleSheetsService shards.
+
+    Every shard keeps its own snapshot, digest and indexes; this backend
+    routes single-row operations to one shard and fans listings out to the
+    shards that may hold matching rows. Row ids are allocated from one
+    counter, so they stay unique across shards.
+    """
+
+    def __init__(self, shards=None, previous_shards=None, key=None):
+        """
+        Initialize a service per shard.
+
+        Args:
+            shards: Shard specs (default: GOOGLE_SHEETS_SHARDS).
+            previous_shards: Shard specs before a resharding still in
+                             progress, or None (default:
+                             GOOGLE_SHEETS_PREVIOUS_SHARDS).
+            key: 'id' or 'email' (default: GOOGLE_SHEETS_SHARD_KEY).
+        """
+        key = key or getattr(settings, 'GOOGLE_SHEETS_SHARD_KEY', 'id')
+        if shards is None:
+            shards = getattr(settings, 'GOOGLE_SHEETS_SHARDS', [])
+        if previous_shards is None:
+            previous_shards = getattr(settings, 'GOOGLE_SHEETS_PREVIOUS_SHARDS', None)
+        self.map = ShardMap(shards, key)
+        self.previous = ShardMap(previous_shards, key) if previous_shards else None
+
+        specs = dict(self.map.shards)
+        for name, spec in (self.previous.shards if self.previous else {}).items():
+            if specs.setdefault(name, spec) != spec:
+                raise ImproperlyConfigured(f'Shard {name!r} changed location while resharding')
+        self.services = {
+            name: GoogleSheetsService(
+                spreadsheet_id=spec.get('spreadsheet_id'), worksheet=spec.get('worksheet')
+            )
+            for name, spec in specs.items()
+        }
+        # Shards share the Google account's quota
+        limiter = self.services[self.map.names[0]]._limiter
+        for service in self.services.values():
+            service._limiter = limiter
+
+        # One counter for all shards, kept across changes of the shard map
+        self._ids = SheetIdAllocator(
+            name=f'shards:{settings.GOOGLE_SHEETS_SPREADSHEET_ID}', seed=self._max_id
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.services) * getattr(settings, 'GOOGLE_SHEETS_POOL_SIZE', 4),
+            thread_name_prefix='sheets-shard'
+        )
+        self._views = OrderedViewCache()
+        self._feed = None
+        self._lock = threading.Lock()
+
+    def _fan_out(self, names, func):
+        """
+        Call func(service) for several shards in parallel.
+
+        Args:
+            names: Shard names.
+            func: Callable taking a GoogleSheetsService.
+
+        Returns:
+            list: The results, in the order of names.
+        """
+        services = [self.services[name] for name in names]
+        if len(services) == 1:
+            return [func(services[0])]
+        # Run in copies of this context, so request timings and the Sheets
+        # call priority follow the calls into the worker threads
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, func, service)
+            for service in services
+        ]
+        return [future.result() for future in futures]
+
+    def _fan_out_groups(self, groups, func):
+        """
+        Call func(service, items) for each shard's items in parallel.
+
+        Args:
+            groups: {service: items}.
+            func: Callable taking a GoogleSheetsService and its items.
+
+        Returns:
+            list: The results, in the order of groups.
+        """
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, func, service, items)
+            for service, items in groups.items()
+        ]
+        return [future.result() for future in futures]
+
+    def _placements(self, value):
+        """Get the shards a key value may be in: its shard, then its previous one."""
+        names = [self.map.shard_for_key(value)]
+        if self.previous is not None:
+            previous = self.previous.shard_for_key(value)
+            if previous not in names:
+                names.append(previous)
+        return names
+
+    def _listed_shards(self, user_email=None):
+        """Get the shards holding rows a user can list."""
+        if user_email and self.map.key == 'email':
+            return self._placements(user_email)
+        return list(self.services)
+
+    def _merge(self, names, results):
+        """
+        Merge the rows of several shards, sorted by id.
+
+        A row copied but not yet removed by resharding is listed once, from
+        the shard it now belongs to.
+        """
+        rows = {}
+        for name, shard_rows in zip(names, results):
+            for row in shard_rows:
+                row_id = normalize_id(row.get('id'))
+                if row_id not in rows or self.map.shard_for(row) == name:
+                    rows[row_id] = row
+        return sort_rows(rows.values(), ID_ORDER)
+
+    def _max_id(self):
+        """Get the highest numeric row id in any shard."""
+        return max(self._fan_out(list(self.services), lambda service: service._max_sheet_id()))
+
+    def _next_ids(self, count):
+        """Allocate row ids unique across shards."""
+        ids = list(self._ids.allocate(count))
+        services = self.services.values()
+        if any(service._cache.lookup(i) is not None for i in ids for service in services):
+            # Rows were added outside this backend, skip past them
+            self._ids.advance_to(self._max_id())
+            ids = list(self._ids.allocate(count))
+        return ids
+
+    def _locate(self, row_id, user_email=None):
+        """
+        Find the shard holding a row.
+
+        Returns:
+            tuple: (shard name, record), or (None, None) if no shard has the
+            row or the user may not access it.
+        """
+        if self.map.key == 'id':
+            candidates = self._placements(row_id)
+        elif user_email:
+            candidates = self._placements(user_email)
+        else:
+            candidates = []
+        for name in candidates:
+            record = self.services[name].get_row(row_id, user_email=user_email)
+            if record is not None:
+                return name, record
+        if self.map.key == 'email' and user_email:
+            return None, None  # A user's rows are all at their email's placement
+        # Superuser lookups when sharding by email, or rows placed by hand
+        rest = [name for name in self.services if name not in candidates]
+        records = self._fan_out(rest, lambda service: service.get_row(row_id, user_email))
+        for name, record in zip(rest, records):
+            if record is not None:
+                return name, record
+        return None, None
+
+    def ensure_email_column(self):
+        """Add the email column to every shard that lacks it."""
+        self._fan_out(list(self.services), lambda service: service.ensure_email_column())
+
+    def get_all_rows(self, user_email=None):
+        """
+        Get all rows a user can see, from every shard that may hold them.
+
+        Returns:
+            list: Row dictionaries sorted by id.
+        """
+        names = self._listed_shards(user_email)
+        results = self._fan_out(names, lambda service: service.get_all_rows(user_email))
+        return self._merge(names, results)
+
+    def iter_rows(self, user_email=None, chunk_size=5000):
+        """
+        Iterate over the rows of every shard that may hold them, shard by shard.
+
+        Unlike get_all_rows the shards aren't merged in memory: a row found
+        away from its current placement is only yielded if its current
+        shard doesn't have a copy.
+        """
+        for name in self._listed_shards(user_email):
+            for row in self.services[name].iter_rows(user_email, chunk_size):
+                current = self.map.shard_for(row)
+                if current == name or self.services[current].get_row(row.get('id')) is None:
+                    yield row
+
+    def get_view_version(self, user_email=None):
+        """Combine the shards' view digests into one, newest modification wins."""
+        names = self._listed_shards(user_email)
+        versions = self._fan_out(names, lambda service: service.get_view_version(user_email))
+        data = b''.join(digest.to_bytes(8, 'big') for digest, _ in versions)
+        digest = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+        return digest, max(modified for _, modified in versions)
+
+    def get_ordered_view(self, user_email=None, ordering=(), filters=()):
+        """
+        Get rows in a given order, merged from the shards' filtered rows.
+
+        The merged view is cached until any of the shards' snapshots changes.
+        """
+        names = self._listed_shards(user_email)
+        # Read versions first: a view built from newer rows is merely rebuilt
+        version = tuple(self.services[name]._cache.version for name in names)
+        views = self._fan_out(
+            names, lambda service: service.get_ordered_view(user_email, (), filters)
+        )
+
+        def build():
+            rows = self._merge(names, [view.rows for view in views])
+            return sort_rows(rows, ordering) if ordering else rows
+
+        return self._views.get(version, (tuple(names), ordering, user_email, filters), build)
+
+    def get_row(self, row_id, user_email=None):
+        """Get a specific row by ID from its shard."""
+        return self._locate(row_id, user_email)[1]
+
+    def get_row_version(self, row_id, user_email=None):
+        """Get the ETag and modification time of a row from its shard."""
+        name, _ = self._locate(row_id, user_email)
+        if name is None:
+            return None
+        return self.services[name].get_row_version(row_id, user_email=user_email)
+
+    def create_rows(self, items, user_email=None):
+        """Create several rows, appending each shard's rows in one call."""
+        if not items:
+            return []
+        new_rows = [
+            self._new_row(row_id, data, user_email)
+            for row_id, data in zip(self._next_ids(len(items)), items)
+        ]
+        groups = {}
+        for row in new_rows:
+            groups.setdefault(self.services[self.map.shard_for(row)], []).append(row)
+        self._fan_out_groups(groups, lambda service, rows: service.append_rows(rows))
+        return new_rows
+
+    def update_row(self, row_id, data, user_email=None, if_match=None):
+        """Update a row in its shard."""
+        name, _ = self._locate(row_id, user_email)
+        if name is None:
+            return None
+        return self.services[name].update_row(row_id, data, user_email=user_email, if_match=if_match)
+
+    def delete_row(self, row_id, user_email=None, if_match=None):
+        """Delete a row from its shard."""
+        name, _ = self._locate(row_id, user_email)
+        if name is None:
+            return False
+        return self.services[name].delete_row(row_id, user_email=user_email, if_match=if_match)
+
+    def _batch(self, row_ids, user_email, call, missing):
+        """
+        Run a batch operation per shard and put the results back in input order.
+
+        Args:
+            row_ids: Ids of the rows the batch touches, in input order.
+            user_email: Email to verify ownership.
+            call: Callable (service, indexes) returning one result per index.
+            missing: Result for rows no shard has.
+        """
+        results = [missing] * len(row_ids)
+        groups = {}
+        for idx, row_id in enumerate(row_ids):
+            name, _ = self._locate(row_id, user_email)
+            if name is not None:
+                groups.setdefault(self.services[name], []).append(idx)
+        outcomes = self._fan_out_groups(groups, call)
+        for indexes, outcome in zip(groups.values(), outcomes):
+            for idx, result in zip(indexes, outcome):
+                results[idx] = result
+        return results
+
+    def update_rows(self, updates, user_email=None):
+        """Update several rows, one batch write per shard."""
+        return self._batch(
+            [data.get('id') for data in updates], user_email,
+            lambda service, indexes: service.update_rows(
+                [updates[idx] for idx in indexes], user_email=user_email
+            ),
+            missing=None
+        )
+
+    def delete_rows(self, row_ids, user_email=None):
+        """Delete several rows, one batch request per shard."""
+        return self._batch(
+            list(row_ids), user_email,
+            lambda service, indexes: service.delete_rows(
+                [row_ids[idx] for idx in indexes], user_email=user_email
+            ),
+            missing=False
+        )
+
+    def change_feed(self):
+        """Get a change feed merging every shard's changes, starting it on first use."""
+        with self._lock:
+            if self._feed is None:
+                feed = ShardedChangeFeed(
+                    self.map,
+                    poll=lambda: self._fan_out(
+                        list(self.services), lambda service: service._sync_worker.sync_once()
+                    ),
+                    poll_interval=getattr(settings, 'GOOGLE_SHEETS_FEED_POLL_INTERVAL', 10)
+                )
+                for name, service in self.services.items():
+                    service._cache.subscribe(feed.listener(name))
+                self._feed = feed
+            return self._feed
+
+    def refresh(self):
+        """Re-read every shard into its snapshot."""
+        self._fan_out(list(self.services), lambda service: service.refresh())
+
+    def invalidate_cache(self):
+        """Drop every shard's snapshot."""
+        for service in self.services.values():
+            service.invalidate_cache()
+
+    def flush(self):
+        """Send every shard's pending write-behind mutations."""
+        for service in self.services.values():
+            service.flush()
+
+    def _shard_stats(self, method):
+        """Get a stats method's result for each shard."""
+        return {name: getattr(service, method)() for name, service in self.services.items()}
+
+    def cache_stats(self):
+        """Get snapshot cache counters per shard."""
+        return self._shard_stats('cache_stats')
+
+    def pool_stats(self):
+        """Get client pool counters per shard."""
+        return self._shard_stats('pool_stats')
+
+    def rate_limit_stats(self):
+        """Get the shared rate limiter's counters."""
+        return self.services[self.map.names[0]].rate_limit_stats()
+
+    def sync_stats(self):
+        """Get background sync metrics per shard."""
+        return self._shard_stats('sync_stats')
+
+
+class _ShardListener:
+    """Snapshot listener passing one shard's changes to a ShardedChangeFeed."""
+
+    def __init__(self, feed, name):
+        self.feed = feed
+        self.name = name
+
+    def on_load(self, records):
+        self.feed._shard_load(self.name, records)
+
+    def on_add(self, record):
+        self.feed._shard_change(self.name, record.get('id'), record)
+
+    def on_replace(self, old, new):
+        self.feed._shard_change(self.name, new.get('id'), new)
+
+    def on_remove(self, record):
+        self.feed._shard_change(self.name, record.get('id'), None)
+
+
+class ShardedChangeFeed(ChangeFeed):
+    """
+    ChangeFeed over the merged rows of several shards.
+
+    A row moving between shards is copied before it is removed, so it shows
+    up as at most an update instead of a delete and a create.
+    """
+
+    def __init__(self, shard_map, poll=None, poll_interval=10, history=1000):
+        """
+        Initialize the feed.
+
+        Args:
+            shard_map: ShardMap deciding which copy of a moving row wins.
+            poll: Callable reloading the shards.
+            poll_interval: Seconds between polls.
+            history: Recent events kept for resuming clients.
+        """
+        super().__init__(poll=poll, poll_interval=poll_interval, history=history)
+        self.shard_map = shard_map
+        self._shard_rows = {}
+        self._listeners = []
+        self._shard_lock = threading.Lock()
+
+    def listener(self, name):
+        """Get the snapshot listener of a shard."""
+        listener = _ShardListener(self, name)
+        self._listeners.append(listener)
+        return listener
+
+    def _merged(self, row_id):
+        """Get the winning copy of a row, or None (call with the shard lock held)."""
+        found = None
+        for name, rows in self._shard_rows.items():
+            record = rows.get(row_id)
+            if record is not None:
+                if self.shard_map.shard_for(record) == name:
+                    return record
+                found = found or record
+        return found
+
+    def _shard_load(self, name, records):
+        """Replace a shard's rows and publish the merged diff once all shards loaded."""
+        with self._shard_lock:
+            rows = {}
+            for record in records:
+                rows.setdefault(normalize_id(record.get('id')), record)
+            self._shard_rows[name] = rows
+            if len(self._shard_rows) < len(self._listeners):
+                return
+            merged = [self._merged(row_id) for row_id in self._all_ids()]
+            self.on_load(merged)
+
+    def _all_ids(self):
+        """Get the ids held by any shard (call with the shard lock held)."""
+        ids = {}
+        for rows in self._shard_rows.values():
+            ids.update(dict.fromkeys(rows))
+        return ids
+
+    def _shard_change(self, name, row_id, record):
+        """Apply one shard's row change and publish its effect on the merged rows."""
+        with self._shard_lock:
+            rows = self._shard_rows.get(name)
+            if rows is None:
+                return  # The shard's first load will include it
+            row_id = normalize_id(row_id)
+            before = self._merged(row_id)
+            if record is None:
+                rows.pop(row_id, None)
+            else:
+                rows[row_id] = record
+            after = self._merged(row_id)
+            if before is None and after is not None:
+                self.on_add(after)
+            elif before is not None and after is None:
+                self.on_remove(before)
+            elif before is not None:
+                self.on_replace(before, after)
@@ -0,0 +1,595 @@
+"""
+Sheet Snapshot Cache Module
+
+This module provides an in-process snapshot of the sheet's records so that
+repeated reads can be served without downloading the whole sheet again.
+
+Every worker process holds its own snapshot, so it is stored column by
+column (CompactRows) rather than as a dict per row, and row dicts are only
+built for the rows a caller reads.
+"""
+
+import threading
+import time
+from array import array
+
+# Marks a column that a row doesn't have
+_MISSING = object()
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+def normalize_id(value):
+    """
+    Normalize a row id so that 7 and '7' address the same row.
+
+    Args:
+        value: The id as read from the sheet or a URL.
+
+    Returns:
+        The id as an int when it is numeric, otherwise unchanged.
+    """
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return value
+
+
+class CompactRows:
+    """
+    Sheet records stored as one sequence per column.
+
+    Ids are kept in a typed array while they are all integers, and owner
+    emails as indexes into a table of the distinct emails, so a row costs a
+    few machine words plus its name and description strings instead of a
+    dict. Indexing and iterating build row dicts on demand; callers get a
+    new dict each time, which they may modify freely.
+    """
+
+    def __init__(self, records=()):
+        """
+        Store records.
+
+        Args:
+            records: Row dictionaries, in sheet order.
+        """
+        self._columns = {}
+        self._length = 0
+        self._emails = []
+        self._email_codes = {}
+        records = list(records)
+        names = {}
+        for keys in dict.fromkeys(map(tuple, records)):
+            names.update(dict.fromkeys(keys))
+        # Build column by column; much faster than appending row by row
+        for name in names:
+            values = [record.get(name, _MISSING) for record in records]
+            if name == 'email':
+                for email in dict.fromkeys(values):
+                    self._intern(email)
+                self._columns[name] = array('I', map(self._email_codes.__getitem__, values))
+            elif name == 'id' and set(map(type, values)) <= {int}:
+                try:
+                    self._columns[name] = array('q', values)
+                except OverflowError:
+                    self._columns[name] = values
+            else:
+                self._columns[name] = values
+        self._length = len(records)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._row(pos) for pos in range(*idx.indices(self._length))]
+        return self._row(self._position(idx))
+
+    def __iter__(self):
+        for pos in range(self._length):
+            yield self._row(pos)
+
+    def _position(self, idx):
+        """Resolve a (possibly negative) index."""
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError('row index out of range')
+        return idx
+
+    def _row(self, pos):
+        """Build the dict of the row at a position."""
+        row = {}
+        for name, column in self._columns.items():
+            value = column[pos]
+            if name == 'email':
+                value = self._emails[value]
+            if value is not _MISSING:
+                row[name] = value
+        return row
+
+    def value(self, idx, field, default=''):
+        """
+        Get one field of a row without building its dict.
+
+        Args:
+            idx: Row index.
+            field: Column name.
+            default: Returned if the row has no such field.
+        """
+        return self.getter(field, default)(self._position(idx))
+
+    def getter(self, field, default=''):
+        """
+        Get a fast function reading one field of the row at a position.
+
+        Args:
+            field: Column name.
+            default: Returned for rows without the field.
+
+        Returns:
+            Callable taking a row position (not checked against the length).
+        """
+        column = self._columns.get(field)
+        if column is None:
+            return lambda pos: default
+        if field == 'email':
+            emails = self._emails
+            return lambda pos: default if (value := emails[column[pos]]) is _MISSING else value
+        return lambda pos: default if (value := column[pos]) is _MISSING else value
+
+    def values(self, field, default=''):
+        """Iterate over one field of every row, in sheet order."""
+        column = self._columns.get(field)
+        if column is None:
+            yield from (default for _ in range(self._length))
+            return
+        if field == 'email':
+            emails = self._emails
+            column = (emails[code] for code in column)
+        for value in column:
+            yield default if value is _MISSING else value
+
+    def ids(self):
+        """Get every row's id, normalized (see normalize_id), in sheet order."""
+        column = self._columns.get('id')
+        if isinstance(column, array):
+            return column.tolist()
+        return [normalize_id(value) for value in self.values('id', None)]
+
+    def matches(self, idx, record):
+        """Whether the row at idx equals a record, without building its dict."""
+        pos = self._position(idx)
+        if any(name not in self._columns for name in record):
+            return False
+        for name, column in self._columns.items():
+            value = column[pos]
+            if name == 'email':
+                value = self._emails[value]
+            if value != record.get(name, _MISSING):
+                return False
+        return True
+
+    def _add_column(self, name):
+        """Add a column that every existing row lacks."""
+        if name == 'email':
+            self._columns[name] = array('I', [self._intern(_MISSING)] * self._length)
+        elif name == 'id' and not self._length:
+            self._columns[name] = array('q')
+        else:
+            self._columns[name] = [_MISSING] * self._length
+
+    def _intern(self, email):
+        """Get the code of an email in the table of distinct emails."""
+        code = self._email_codes.get(email)
+        if code is None:
+            code = self._email_codes[email] = len(self._emails)
+            self._emails.append(email)
+        return code
+
+    def _store(self, pos, record):
+        """Write a record's fields at a position (the end to append)."""
+        for name in record:
+            if name not in self._columns:
+                self._add_column(name)
+        for name, column in self._columns.items():
+            value = record.get(name, _MISSING)
+            if name == 'email':
+                value = self._intern(value)
+            elif isinstance(column, array) and not (
+                type(value) is int and _INT64[0] <= value <= _INT64[1]
+            ):
+                # A text, blank or huge id: fall back to a plain list
+                column = self._columns[name] = list(column)
+            if pos == self._length:
+                column.append(value)
+            else:
+                column[pos] = value
+
+    def append(self, record):
+        """Add a record at the end."""
+        self._store(self._length, record)
+        self._length += 1
+
+    def __setitem__(self, idx, record):
+        self._store(self._position(idx), record)
+
+    def pop(self, idx):
+        """
+        Remove a row.
+
+        Returns:
+            dict: The removed row.
+        """
+        pos = self._position(idx)
+        row = self._row(pos)
+        for column in self._columns.values():
+            del column[pos]
+        self._length -= 1
+        return row
+
+    def copy(self):
+        """Get an independent copy (the email table is shared; it only grows)."""
+        other = CompactRows()
+        other._columns = {name: column[:] for name, column in self._columns.items()}
+        other._length = self._length
+        other._emails = self._emails
+        other._email_codes = self._email_codes
+        return other
+
+    def select(self, positions=None):
+        """
+        Get a lazy sequence of some rows.
+
+        Args:
+            positions: Row indexes, in the order wanted (default: all rows).
+
+        Returns:
+            RowSelection: The rows.
+        """
+        if positions is None:
+            positions = range(self._length)
+        return RowSelection(self, positions)
+
+
+class RowSelection:
+    """
+    Rows of a CompactRows picked by position, built into dicts on access.
+
+    The CompactRows must not change while the selection is in use; the
+    snapshot copies its rows before writing to rows it has handed out.
+    """
+
+    def __init__(self, source, positions):
+        """
+        Initialize the selection.
+
+        Args:
+            source: The CompactRows.
+            positions: Row indexes into source.
+        """
+        self.source = source
+        self.positions = positions if isinstance(positions, range) else array('q', positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.source._row(pos) for pos in self.positions[idx]]
+        return self.source._row(self.positions[idx])
+
+    def __iter__(self):
+        for pos in self.positions:
+            yield self.source._row(pos)
+
+    def value(self, idx, field, default=''):
+        """Get one field of the idx-th selected row without building its dict."""
+        return self.source.value(self.positions[idx], field, default)
+
+    def sorted(self, key, reverse=False):
+        """
+        Get the selection re-ordered (stably) by a key of each row's position.
+
+        Args:
+            key: Callable taking a position in source.
+            reverse: Sort descending.
+        """
+        return RowSelection(self.source, sorted(self.positions, key=key, reverse=reverse))
+
+
+class SheetSnapshot:
+    """In-memory copy of the sheet's records with a time-to-live."""
+
+    def __init__(self, ttl=30):
+        """
+        Initialize an empty snapshot.
+
+        Args:
+            ttl: Seconds a loaded snapshot stays fresh. 0 disables caching.
+        """
+        self.ttl = ttl
+        # Bumped on every change so derived views know when to rebuild
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._records = None
+        # Whether _records was handed out, so writes must copy it first
+        self._shared = False
+        self._positions = {}
+        self._by_email = {}
+        self._loaded_at = None
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def subscribe(self, listener):
+        """
+        Register an object to be told about snapshot changes.
+
+        The listener's on_load(records), on_add(record) and on_remove(record)
+        methods are called under the snapshot lock after each change. An
+        update is reported as on_replace(old, new) if the listener has it,
+        otherwise as a remove of the old record and an add of the new one.
+        If the snapshot is already loaded, on_load is called now.
+
+        Args:
+            listener: Object implementing the callbacks.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._records is not None:
+                listener.on_load(self._hand_out())
+
+    def _hand_out(self):
+        """Get the records for a caller; later writes go to a copy."""
+        self._shared = True
+        return self._records
+
+    def _writable(self):
+        """Get the records to modify in place (call with the lock held)."""
+        if self._shared:
+            # Readers may still be iterating the rows they were given
+            self._records = self._records.copy()
+            self._shared = False
+        return self._records
+
+    @property
+    def is_loaded(self):
+        """Whether the snapshot currently holds records."""
+        return self._records is not None
+
+    def is_fresh(self):
+        """Check whether the snapshot is loaded and within its TTL."""
+        if self._records is None or self.ttl <= 0:
+            return False
+        return time.monotonic() - self._loaded_at < self.ttl
+
+    def get(self):
+        """
+        Return the cached records if they are still fresh.
+
+        Returns:
+            CompactRows: The cached records, or None on a cache miss. They
+            don't change after being returned.
+        """
+        with self._lock:
+            if self.is_fresh():
+                self.hits += 1
+                return self._hand_out()
+            self.misses += 1
+            return None
+
+    def load(self, records):
+        """
+        Replace the snapshot with freshly fetched records.
+
+        Returns:
+            CompactRows: The snapshot's records.
+        """
+        with self._lock:
+            self.version += 1
+            self._records = CompactRows(records)
+            self._shared = False
+            self._by_email = {}
+            ids = self._records.ids()
+            # Filled back to front so the first row with a repeated id wins
+            self._positions = dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+            for email, row_id in zip(self._records.values('email'), ids):
+                self._index_email(email, row_id)
+            self._loaded_at = time.monotonic()
+            records = self._hand_out()
+            for listener in self._listeners:
+                listener.on_load(records)
+            return records
+
+    def sync(self, records):
+        """
+        Bring the snapshot up to date with freshly fetched records.
+
+        Rows are compared by id. If nothing changed, the snapshot is only
+        marked fresh again, so its version (and every view derived from
+        it) survives; otherwise the records are loaded and listeners diff
+        them against what they had.
+
+        Args:
+            records: The sheet's records, in sheet order.
+
+        Returns:
+            tuple: (records, diff) - the snapshot's records and a dict
+            counting 'created', 'updated' and 'deleted' rows.
+        """
+        with self._lock:
+            if self._records is None:
+                return self.load(records), {'created': len(records), 'updated': 0, 'deleted': 0}
+            records = list(records)
+            diff = {'created': 0, 'updated': 0, 'deleted': 0}
+            seen = set()
+            for record in records:
+                row_id = normalize_id(record.get('id'))
+                idx = self._positions.get(row_id)
+                if idx is None or row_id in seen:
+                    diff['created'] += 1
+                elif not self._records.matches(idx, record):
+                    diff['updated'] += 1
+                seen.add(row_id)
+            diff['deleted'] = sum(1 for row_id in self._positions if row_id not in seen)
+            unchanged = not any(diff.values()) and [
+                normalize_id(record.get('id')) for record in records
+            ] == self._records.ids()
+            if not unchanged:
+                return self.load(records), diff
+            self._loaded_at = time.monotonic()
+            return self._hand_out(), diff
+
+    def invalidate(self):
+        """Drop the snapshot so the next read goes to the sheet."""
+        with self._lock:
+            self.version += 1
+            self._records = None
+            self._positions = {}
+            self._by_email = {}
+            self._loaded_at = None
+
+    def _index_email(self, email, row_id):
+        """Add a row to the email -> ids secondary index."""
+        self._by_email.setdefault(email, {})[row_id] = None
+
+    def _unindex_email(self, email, row_id):
+        """Remove a row from the email -> ids secondary index."""
+        ids = self._by_email.get(email)
+        if ids is None:
+            return
+        ids.pop(row_id, None)
+        if not ids:
+            del self._by_email[email]
+
+    def lookup(self, row_id):
+        """
+        Find a row by id using the primary-key index.
+
+        Args:
+            row_id: The ID of the row.
+
+        Returns:
+            tuple: (row_number, record) with the 1-indexed sheet row number,
+            or None if the id is not in the snapshot.
+        """
+        with self._lock:
+            idx = self._positions.get(normalize_id(row_id))
+            if idx is None:
+                return None
+            return idx + 2, self._records[idx]  # +2 for header row and 0-indexing
+
+    def rows_for_email(self, email):
+        """
+        Get the rows owned by an email using the secondary index.
+
+        Args:
+            email: The owner's email.
+
+        Returns:
+            RowSelection: The owner's records in sheet order.
+        """
+        with self._lock:
+            ids = self._by_email.get(email, {})
+            return self._hand_out().select([self._positions[row_id] for row_id in ids])
+
+    def ids_for_email(self, email):
+        """
+        Get the ids of the rows owned by an email.
+
+        Args:
+            email: The owner's email.
+
+        Returns:
+            set: The owner's row ids.
+        """
+        with self._lock:
+            return set(self._by_email.get(email, ()))
+
+    def rows_for_ids(self, ids):
+        """
+        Get rows by id in sheet order.
+
+        Args:
+            ids: Iterable of row ids; unknown ids are skipped.
+
+        Returns:
+            RowSelection: The matching records.
+        """
+        with self._lock:
+            positions = sorted(
+                self._positions[row_id] for row_id in ids if row_id in self._positions
+            )
+            return self._hand_out().select(positions)
+
+    def append(self, record):
+        """Write-through for a row appended to the sheet."""
+        with self._lock:
+            if self._records is None:
+                return
+            self.version += 1
+            row_id = normalize_id(record.get('id'))
+            records = self._writable()
+            self._positions.setdefault(row_id, len(records))
+            records.append(record)
+            self._index_email(record.get('email', ''), row_id)
+            for listener in self._listeners:
+                listener.on_add(record)
+
+    def replace(self, row_id, record):
+        """Write-through for a row updated in the sheet."""
+        with self._lock:
+            row_id = normalize_id(row_id)
+            idx = self._positions.get(row_id)
+            if idx is None:
+                return
+            self.version += 1
+            records = self._writable()
+            current = records[idx]
+            if current.get('email') != record.get('email'):
+                self._unindex_email(current.get('email', ''), row_id)
+                self._index_email(record.get('email', ''), row_id)
+            records[idx] = record
+            for listener in self._listeners:
+                if hasattr(listener, 'on_replace'):
+                    listener.on_replace(current, record)
+                else:
+                    listener.on_remove(current)
+                    listener.on_add(record)
+
+    def remove(self, row_id):
+        """
+        Write-through for a row deleted from the sheet.
+
+        Deleting a row shifts every following row up by one, so their
+        indexed positions are moved down to match.
+        """
+        with self._lock:
+            row_id = normalize_id(row_id)
+            idx = self._positions.pop(row_id, None)
+            if idx is None:
+                return
+            self.version += 1
+            records = self._writable()
+            removed = records.pop(idx)
+            self._unindex_email(removed.get('email', ''), row_id)
+            for pos, key in enumerate(records.ids()[idx:], idx):
+                if self._positions.get(key) == pos + 1:
+                    self._positions[key] = pos
+            for listener in self._listeners:
+                listener.on_remove(removed)
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hit/miss counts, the TTL and the number of cached rows.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'ttl': self.ttl,
+                'rows': len(self._records) if self._records is not None else 0,
+                'fresh': self.is_fresh(),
+            }
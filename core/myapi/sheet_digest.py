@@ -0,0 +1,154 @@
+"""
+Sheet Digest Module
+
+This module tracks content hashes and modification times of the cached
+sheet snapshot, overall, per owner email and per row. They are used as
+HTTP validators (ETag / Last-Modified) so unchanged data can be answered
+with 304 Not Modified without serializing rows.
+
+Hashes are computed with blake2b rather than hash(), so every worker
+process derives the same ETag for the same sheet content.
+"""
+
+import hashlib
+import threading
+import time
+
+from .sheet_cache import normalize_id
+from .sheet_query import SHEET_FIELDS
+
+
+def row_key(record):
+    """Get the sheet columns of a record as a comparable tuple."""
+    return tuple(record.get(field, '') for field in SHEET_FIELDS)
+
+
+def row_digest(record):
+    """
+    Hash the sheet columns of a record.
+
+    Args:
+        record: Row dictionary.
+
+    Returns:
+        int: 64-bit content hash.
+    """
+    data = '\x1f'.join(str(value) for value in row_key(record))
+    return int.from_bytes(hashlib.blake2b(data.encode(), digest_size=8).digest(), 'big')
+
+
+class SnapshotDigest:
+    """
+    Order-insensitive content digest of a SheetSnapshot.
+
+    Row hashes are combined with XOR so that adding, updating or removing a
+    row adjusts the digest in constant time. Subscribe it to a snapshot with
+    SheetSnapshot.subscribe.
+    """
+
+    def __init__(self):
+        """Initialize an empty digest."""
+        self._rows = {}
+        self._total = 0
+        self._by_email = {}
+        self._modified = time.time()
+        self._email_modified = {}
+        self._lock = threading.Lock()
+
+    def _touch(self, email, now):
+        """Record a change to the rows of an email."""
+        self._modified = now
+        self._email_modified[email] = now
+
+    def _add(self, row_id, record, now):
+        """Fold a row into the digests."""
+        digest = row_digest(record)
+        email = record.get('email', '')
+        self._rows[row_id] = (digest, email, now, row_key(record))
+        self._total ^= digest
+        self._by_email[email] = self._by_email.get(email, 0) ^ digest
+
+    def _remove(self, row_id):
+        """Take a row out of the digests."""
+        entry = self._rows.pop(row_id, None)
+        if entry is None:
+            return None
+        digest, email = entry[0], entry[1]
+        self._total ^= digest
+        self._by_email[email] ^= digest
+        return email
+
+    def on_load(self, records):
+        """Diff a freshly loaded snapshot against the current digests."""
+        now = time.time()
+        with self._lock:
+            seen = set()
+            for record in records:
+                row_id = normalize_id(record.get('id'))
+                if row_id in seen:
+                    continue
+                seen.add(row_id)
+                entry = self._rows.get(row_id)
+                # Compare columns first; only changed rows get re-hashed
+                if entry is not None and entry[3] == row_key(record):
+                    continue
+                if entry is not None:
+                    self._touch(self._remove(row_id), now)
+                self._add(row_id, record, now)
+                self._touch(record.get('email', ''), now)
+            for row_id in [r for r in self._rows if r not in seen]:
+                self._touch(self._remove(row_id), now)
+
+    def on_add(self, record):
+        """Fold in a row added to the snapshot."""
+        now = time.time()
+        with self._lock:
+            row_id = normalize_id(record.get('id'))
+            old_email = self._remove(row_id)
+            if old_email is not None:
+                self._touch(old_email, now)
+            self._add(row_id, record, now)
+            self._touch(record.get('email', ''), now)
+
+    def on_remove(self, record):
+        """Take out a row removed from the snapshot."""
+        now = time.time()
+        with self._lock:
+            email = self._remove(normalize_id(record.get('id')))
+            if email is not None:
+                self._touch(email, now)
+
+    def view(self, user_email=None):
+        """
+        Get the digest and modification time of a user's view.
+
+        Args:
+            user_email: Owner email, or None for all rows.
+
+        Returns:
+            tuple: (digest, last_modified) with last_modified as a Unix
+            timestamp.
+        """
+        with self._lock:
+            if user_email is None:
+                return self._total, self._modified
+            return (
+                self._by_email.get(user_email, 0),
+                self._email_modified.get(user_email, self._modified),
+            )
+
+    def row(self, row_id):
+        """
+        Get the digest and modification time of one row.
+
+        Args:
+            row_id: The ID of the row.
+
+        Returns:
+            tuple: (digest, last_modified), or None if the row is unknown.
+        """
+        with self._lock:
+            entry = self._rows.get(normalize_id(row_id))
+            if entry is None:
+                return None
+            return entry[0], entry[2]
@@ -0,0 +1,240 @@
+"""
+Sheet Mirror Module
+
+This module keeps a copy of the sheet's rows in the Django database, indexed
+by id and by owner email. Every worker process can serve reads from it with
+an indexed query instead of a Google Sheets round trip, as long as some
+process (the sync worker or the sync_sheet command) has brought it up to
+date within the configured staleness bound.
+
+Database writes happen on a background thread, so the snapshot listener
+callbacks stay cheap and are safe to call from the asyncio service.
+"""
+
+import logging
+import threading
+import time
+
+from django.db import transaction
+
+from .models import SheetMirrorState, SheetRow
+from .sheet_cache import normalize_id
+
+logger = logging.getLogger(__name__)
+
+
+class SheetMirror:
+    """
+    Snapshot listener writing the sheet's rows through to a database table.
+
+    Single-row changes (on_add, on_replace, on_remove) are written through
+    as they happen. Full snapshots are written with sync(), only for records
+    actually read from the sheet, which also stamps the mirror as fresh.
+    """
+
+    def __init__(self, name, max_staleness=60):
+        """
+        Initialize the mirror.
+
+        Args:
+            name: Mirror name, one per spreadsheet.
+            max_staleness: Seconds after the last sync that reads may still
+                           be served from the mirror.
+        """
+        self.name = name
+        self.max_staleness = max_staleness
+        self.reads = 0
+        self.writes = 0
+        self.errors = 0
+        self._ops = []
+        self._queued = 0
+        self._applied = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def on_load(self, records):
+        """Ignore snapshot loads; they may come from the mirror itself."""
+
+    def on_add(self, record):
+        """Write through a row added to the snapshot."""
+        self._enqueue('upsert', record)
+
+    def on_replace(self, old, new):
+        """Write through a row updated in the snapshot."""
+        self._enqueue('upsert', new)
+
+    def on_remove(self, record):
+        """Write through a row removed from the snapshot."""
+        self._enqueue('delete', record)
+
+    def sync(self, records):
+        """
+        Replace the mirror's rows with records read from the sheet.
+
+        Args:
+            records: The sheet's records, in sheet order.
+        """
+        self._enqueue('sync', (list(records), time.time()))
+
+    def _enqueue(self, op, arg):
+        """Queue a database write for the writer thread."""
+        with self._condition:
+            self._ops.append((op, arg))
+            self._queued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='sheets-mirror', daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _run(self):
+        """Apply queued writes, each batch in one transaction."""
+        while True:
+            with self._condition:
+                while not self._ops:
+                    self._condition.wait()
+                ops, self._ops = self._ops, []
+            try:
+                with transaction.atomic():
+                    for op, arg in ops:
+                        getattr(self, f'_apply_{op}')(arg)
+                self.writes += len(ops)
+            except Exception:
+                # The next sync rewrites the whole mirror
+                self.errors += 1
+                logger.exception('Failed to update the sheet mirror')
+            with self._condition:
+                self._applied += len(ops)
+                self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Block until the writes queued so far have been applied.
+
+        Returns:
+            bool: False if the timeout passed first.
+        """
+        with self._condition:
+            target = self._queued
+            return self._condition.wait_for(lambda: self._applied >= target, timeout)
+
+    def _rows(self):
+        """Get this sheet's mirrored rows."""
+        return SheetRow.objects.filter(sheet=self.name)
+
+    def _apply_upsert(self, record):
+        """Insert or update one row, appending new rows at the end."""
+        row_id = str(normalize_id(record.get('id')))
+        updated = self._rows().filter(row_id=row_id).update(
+            email=record.get('email', ''), data=record
+        )
+        if not updated:
+            last = self._rows().order_by('-position').values_list('position', flat=True).first()
+            SheetRow.objects.create(
+                sheet=self.name, row_id=row_id, email=record.get('email', ''),
+                position=0 if last is None else last + 1, data=record
+            )
+
+    def _apply_delete(self, record):
+        """Delete one row."""
+        self._rows().filter(row_id=str(normalize_id(record.get('id')))).delete()
+
+    def _apply_sync(self, arg):
+        """Bring the table in line with a full read of the sheet."""
+        records, synced_at = arg
+        current = {
+            row.row_id: row for row in self._rows().only('row_id', 'email', 'position', 'data')
+        }
+        seen = set()
+        created, updated = [], []
+        for position, record in enumerate(records):
+            row_id = str(normalize_id(record.get('id')))
+            if row_id in seen:
+                continue  # Duplicate ids: the first row wins, as in the snapshot
+            seen.add(row_id)
+            email = record.get('email', '')
+            row = current.get(row_id)
+            if row is None:
+                created.append(SheetRow(
+                    sheet=self.name, row_id=row_id, email=email,
+                    position=position, data=record
+                ))
+            elif (row.position, row.email, row.data) != (position, email, record):
+                row.position, row.email, row.data = position, email, record
+                updated.append(row)
+        removed = [row.pk for row_id, row in current.items() if row_id not in seen]
+        if removed:
+            SheetRow.objects.filter(pk__in=removed).delete()
+        SheetRow.objects.bulk_update(updated, ['position', 'email', 'data'], batch_size=500)
+        SheetRow.objects.bulk_create(created, batch_size=500)
+        SheetMirrorState.objects.update_or_create(
+            name=self.name, defaults={'synced_at': synced_at}
+        )
+
+    def synced_at(self):
+        """Get the Unix time of the last sync, or None if never synced."""
+        return SheetMirrorState.objects.filter(name=self.name).values_list(
+            'synced_at', flat=True
+        ).first()
+
+    def is_fresh(self):
+        """Check whether the mirror was synced within max_staleness."""
+        synced_at = self.synced_at()
+        return synced_at is not None and time.time() - synced_at <= self.max_staleness
+
+    def rows(self, user_email=None):
+        """
+        Get mirrored rows in sheet order.
+
+        Args:
+            user_email: Optional email to filter by (uses the email index).
+
+        Returns:
+            list: Row dictionaries.
+        """
+        self.wait()  # Include this process's own recent writes
+        rows = self._rows()
+        if user_email:
+            rows = rows.filter(email=user_email)
+        self.reads += 1
+        return list(rows.order_by('position').values_list('data', flat=True))
+
+    def row(self, row_id):
+        """
+        Get one mirrored row by id.
+
+        Args:
+            row_id: The ID of the row.
+
+        Returns:
+            dict: Row data or None if not found.
+        """
+        self.wait()
+        self.reads += 1
+        return self._rows().filter(row_id=str(normalize_id(row_id))).values_list(
+            'data', flat=True
+        ).first()
+
+    def stats(self):
+        """
+        Get mirror metrics.
+
+        Returns:
+            dict: Rows mirrored, reads served, writes applied or pending,
+            and seconds since the last sync.
+        """
+        synced_at = self.synced_at()
+        with self._condition:
+            pending = self._queued - self._applied
+        return {
+            'rows': self._rows().count(),
+            'reads': self.reads,
+            'writes': self.writes,
+            'pending': pending,
+            'errors': self.errors,
+            'max_staleness': self.max_staleness,
+            'staleness_seconds': (
+                None if synced_at is None else round(time.time() - synced_at, 3)
+            ),
+        }
@@ -0,0 +1,281 @@
+"""
+Sheet Query Module
+
+This module provides ordering, field projection and pagination helpers for
+listing sheet rows. Sorted views are cached per snapshot version so that
+paging through a large sheet sorts it once rather than on every request.
+"""
+
+import base64
+import binascii
+import json
+import threading
+
+from .sheet_cache import RowSelection, normalize_id
+
+# Columns of the sheet, in A:D order
+SHEET_FIELDS = ('id', 'name', 'description', 'email')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def parse_ordering(value):
+    """
+    Parse an ``ordering`` query parameter such as ``-name,id``.
+
+    Args:
+        value: Comma-separated field names, '-' prefix for descending.
+
+    Returns:
+        tuple: (field, descending) pairs, empty for sheet order.
+
+    Raises:
+        ValueError: If a field is not a sheet column.
+    """
+    ordering = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith('-')
+        field = part.lstrip('-')
+        if field not in SHEET_FIELDS:
+            raise ValueError(f'Cannot order by "{field}"')
+        ordering.append((field, descending))
+    return tuple(ordering)
+
+
+def format_ordering(ordering):
+    """Format parsed ordering back into its query parameter form."""
+    return ','.join(('-' if descending else '') + field for field, descending in ordering)
+
+
+def parse_fields(value):
+    """
+    Parse a ``fields`` projection parameter such as ``id,name``.
+
+    Args:
+        value: Comma-separated field names.
+
+    Returns:
+        tuple: Field names, or None to return every field.
+
+    Raises:
+        ValueError: If a field is not a sheet column.
+    """
+    if not value:
+        return None
+    fields = tuple(f.strip() for f in value.split(',') if f.strip())
+    for field in fields:
+        if field not in SHEET_FIELDS:
+            raise ValueError(f'Unknown field "{field}"')
+    return fields
+
+
+def project(rows, fields):
+    """
+    Keep only the requested fields of each row.
+
+    Args:
+        rows: Row dictionaries.
+        fields: Field names from parse_fields, or None.
+
+    Returns:
+        list: Projected rows.
+    """
+    if fields is None:
+        return list(rows)
+    return [{field: row.get(field, '') for field in fields} for row in rows]
+
+
+def _sort_value(value):
+    """Sort key that orders numbers before text and ignores text case."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, '')
+    return (1, 0, str(value).casefold())
+
+
+def sort_rows(rows, ordering):
+    """
+    Sort rows by a parsed ordering (stable, mixed directions allowed).
+
+    Args:
+        rows: Row dictionaries, or a RowSelection of snapshot rows.
+
+    Returns:
+        list: A new sorted list, or a RowSelection for a RowSelection (sorted
+        by column values, without building row dicts).
+    """
+    if isinstance(rows, RowSelection):
+        for field, descending in reversed(ordering):
+            value = rows.source.getter(field)
+            rows = rows.sorted(key=lambda pos: _sort_value(value(pos)), reverse=descending)
+        return rows
+    rows = list(rows)
+    # Sort by the least significant field first; sorts are stable
+    for field, descending in reversed(ordering):
+        rows.sort(key=lambda row: _sort_value(row.get(field, '')), reverse=descending)
+    return rows
+
+
+class OrderedView:
+    """A sorted sequence of rows plus each row id's position in it."""
+
+    def __init__(self, rows):
+        """
+        Wrap sorted rows.
+
+        Args:
+            rows: Row dictionaries, or a RowSelection, already in view order.
+        """
+        self.rows = rows
+        self._positions = None
+
+    def __len__(self):
+        """Number of rows in the view."""
+        return len(self.rows)
+
+    @property
+    def positions(self):
+        """The id -> position map, built on first use."""
+        if self._positions is None:
+            positions = {}
+            if isinstance(self.rows, RowSelection):
+                value = self.rows.source.getter('id', None)
+                ids = (value(pos) for pos in self.rows.positions)
+            else:
+                ids = (row.get('id') for row in self.rows)
+            for idx, row_id in enumerate(ids):
+                positions.setdefault(normalize_id(row_id), idx)
+            self._positions = positions
+        return self._positions
+
+    def _id_at(self, idx):
+        """Get the id of the row at a position."""
+        if isinstance(self.rows, RowSelection):
+            return self.rows.value(idx, 'id', None)
+        return self.rows[idx].get('id')
+
+    def index_after(self, row_id, hint=0):
+        """
+        Find where a page that follows row_id starts.
+
+        Args:
+            row_id: Id of the last row of the previous page.
+            hint: Position to resume from if that row no longer exists.
+
+        Returns:
+            int: Index of the first row of the next page.
+        """
+        row_id = normalize_id(row_id)
+        # Cursors carry the position after their row, which is usually unchanged
+        if 0 < hint <= len(self.rows) and normalize_id(self._id_at(hint - 1)) == row_id:
+            return hint
+        idx = self.positions.get(row_id)
+        if idx is None:
+            return min(max(hint, 0), len(self.rows))
+        return idx + 1
+
+
+class OrderedViewCache:
+    """Cache of OrderedViews that is discarded whenever the snapshot changes."""
+
+    def __init__(self, max_views=64):
+        """
+        Initialize the cache.
+
+        Args:
+            max_views: Maximum number of (ordering, owner) views kept.
+        """
+        self.max_views = max_views
+        self._version = None
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def get(self, version, key, build):
+        """
+        Get a cached view, building it if missing or out of date.
+
+        Args:
+            version: The snapshot version the view must match.
+            key: Hashable view key, e.g. (ordering, email).
+            build: Callable returning the view's rows.
+
+        Returns:
+            OrderedView: The view.
+        """
+        with self._lock:
+            if version != self._version:
+                self._views = {}
+                self._version = version
+            view = self._views.get(key)
+        if view is not None:
+            return view
+
+        view = OrderedView(build())
+        with self._lock:
+            if version == self._version:
+                if len(self._views) >= self.max_views:
+                    self._views.pop(next(iter(self._views)))
+                self._views[key] = view
+        return view
+
+
+def encode_cursor(ordering, row_id, position):
+    """Encode an opaque cursor pointing just after row_id."""
+    payload = json.dumps({'o': format_ordering(ordering), 'id': row_id, 'p': position})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor, ordering):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string.
+        ordering: The ordering of the current request.
+
+    Returns:
+        tuple: (row_id, position).
+
+    Raises:
+        ValueError: If the cursor is malformed or was made for another ordering.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if payload['o'] != format_ordering(ordering):
+            raise ValueError
+        return payload['id'], int(payload['p'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+
+
+def parse_page(params):
+    """
+    Read pagination parameters.
+
+    Args:
+        params: The request's query parameters.
+
+    Returns:
+        dict: 'limit', 'offset' and 'cursor', or None when the request
+        does not ask for pagination.
+
+    Raises:
+        ValueError: If limit or offset is not a non-negative integer.
+    """
+    if not any(name in params for name in ('limit', 'offset', 'cursor')):
+        return None
+    try:
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        offset = int(params.get('offset', 0))
+    except ValueError:
+        raise ValueError('limit and offset must be integers')
+    if limit < 1 or offset < 0:
+        raise ValueError('limit must be positive and offset non-negative')
+    return {
+        'limit': min(limit, MAX_PAGE_SIZE),
+        'offset': offset,
+        'cursor': params.get('cursor'),
+    }
@@ -0,0 +1,226 @@
+"""
+Sheet Search Module
+
+This module keeps in-memory indexes over the text columns of the cached
+sheet snapshot: a value map for exact filters, a sorted list for prefix
+filters and an inverted word index for ``q`` searches. Substring filters
+scan the case-folded values held by the index. The indexes are updated
+incrementally as the snapshot changes.
+"""
+
+import bisect
+import re
+import threading
+
+from .sheet_cache import normalize_id
+
+# Columns that can be filtered and searched
+SEARCH_FIELDS = ('name', 'description')
+
+# Supported lookups, as used in query parameters (``name__startswith=``)
+LOOKUPS = ('exact', 'startswith', 'contains')
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into case-folded word tokens."""
+    return TOKEN_RE.findall(str(text).casefold())
+
+
+def parse_filters(params):
+    """
+    Read filter and search parameters from a query string.
+
+    ``name=`` matches exactly, ``name__startswith=`` and ``name__contains=``
+    match case-insensitively, and likewise for ``description``. ``q=`` matches
+    rows containing every word of the query in either column.
+
+    Args:
+        params: The request's query parameters.
+
+    Returns:
+        tuple: Sorted (field, lookup, value) triples, empty if none given.
+
+    Raises:
+        ValueError: If a parameter names an unsupported lookup, e.g.
+                    ``name__endswith=``.
+    """
+    filters = []
+    for name in params:
+        field, _, lookup = name.partition('__')
+        if field in SEARCH_FIELDS and lookup and lookup not in LOOKUPS[1:]:
+            raise ValueError(
+                f'Unknown filter {name}; use {field}, '
+                + ' or '.join(f'{field}__{other}' for other in LOOKUPS[1:])
+            )
+    for field in SEARCH_FIELDS:
+        for lookup in LOOKUPS:
+            name = field if lookup == 'exact' else f'{field}__{lookup}'
+            if name in params:
+                filters.append((field, lookup, params.get(name)))
+    if params.get('q'):
+        filters.append(('q', 'search', params.get('q')))
+    return tuple(sorted(filters))
+
+
+class _FieldIndex:
+    """Exact-value and prefix indexes over one text column."""
+
+    def __init__(self):
+        """Initialize empty indexes."""
+        self.exact = {}
+        self.sorted_values = []
+        self.values = {}
+
+    def add(self, row_id, value, bulk=False):
+        """
+        Index a row's value.
+
+        Args:
+            row_id: The row's id.
+            value: The column value.
+            bulk: Append without keeping the prefix list sorted; the caller
+                  must call sort() after a series of bulk adds.
+        """
+        value = str(value)
+        folded = value.casefold()
+        self.values[row_id] = folded
+        self.exact.setdefault(value, set()).add(row_id)
+        if bulk:
+            self.sorted_values.append((folded, row_id))
+        else:
+            bisect.insort(self.sorted_values, (folded, row_id))
+
+    def sort(self):
+        """Restore prefix-list order after bulk adds."""
+        self.sorted_values.sort()
+
+    def remove(self, row_id, value):
+        """Remove a row's value from the indexes."""
+        value = str(value)
+        folded = self.values.pop(row_id, value.casefold())
+        ids = self.exact.get(value)
+        if ids is not None:
+            ids.discard(row_id)
+            if not ids:
+                del self.exact[value]
+        idx = bisect.bisect_left(self.sorted_values, (folded, row_id))
+        if idx < len(self.sorted_values) and self.sorted_values[idx] == (folded, row_id):
+            del self.sorted_values[idx]
+
+    def match(self, lookup, value):
+        """Get the ids matching one lookup on this column."""
+        value = str(value)
+        if lookup == 'exact':
+            return set(self.exact.get(value, ()))
+
+        needle = value.casefold()
+        if lookup == 'startswith':
+            ids = set()
+            start = bisect.bisect_left(self.sorted_values, (needle,))
+            for folded, row_id in self.sorted_values[start:]:
+                if not folded.startswith(needle):
+                    break
+                ids.add(row_id)
+            return ids
+
+        # Substring: a linear scan of pre-folded values; each test runs in C
+        return {row_id for row_id, folded in self.values.items() if needle in folded}
+
+
+class SheetSearchIndex:
+    """Inverted index over a SheetSnapshot, kept current via its listener hooks."""
+
+    def __init__(self):
+        """Initialize an empty index; it fills when subscribed to a snapshot."""
+        self._fields = {field: _FieldIndex() for field in SEARCH_FIELDS}
+        self._tokens = {}
+        self._rows = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(record):
+        """Get the indexed column values of a record."""
+        return tuple(str(record.get(field, '')) for field in SEARCH_FIELDS)
+
+    def _add(self, row_id, key, bulk=False):
+        """Index a row under all fields and tokens."""
+        self._rows[row_id] = key
+        for field, value in zip(SEARCH_FIELDS, key):
+            self._fields[field].add(row_id, value, bulk=bulk)
+        for token in set(tokenize(' '.join(key))):
+            self._tokens.setdefault(token, set()).add(row_id)
+
+    def _remove(self, row_id):
+        """Remove a row from all fields and tokens."""
+        key = self._rows.pop(row_id, None)
+        if key is None:
+            return
+        for field, value in zip(SEARCH_FIELDS, key):
+            self._fields[field].remove(row_id, value)
+        for token in set(tokenize(' '.join(key))):
+            ids = self._tokens.get(token)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del self._tokens[token]
+
+    def on_load(self, records):
+        """Re-index only the rows that differ from the previous snapshot."""
+        with self._lock:
+            current = {}
+            for record in records:
+                current.setdefault(normalize_id(record.get('id')), self._key(record))
+            for row_id in [r for r in self._rows if current.get(r) != self._rows[r]]:
+                self._remove(row_id)
+            for row_id, key in current.items():
+                if row_id not in self._rows:
+                    self._add(row_id, key, bulk=True)
+            for index in self._fields.values():
+                index.sort()
+
+    def on_add(self, record):
+        """Index a row added to the snapshot."""
+        with self._lock:
+            row_id = normalize_id(record.get('id'))
+            self._remove(row_id)
+            self._add(row_id, self._key(record))
+
+    def on_remove(self, record):
+        """Drop a row removed from the snapshot."""
+        with self._lock:
+            self._remove(normalize_id(record.get('id')))
+
+    def search(self, filters):
+        """
+        Get the ids of rows matching every filter.
+
+        Args:
+            filters: (field, lookup, value) triples from parse_filters.
+
+        Returns:
+            set: Matching row ids.
+        """
+        with self._lock:
+            result = None
+            for field, lookup, value in filters:
+                if field == 'q':
+                    ids = self._search_tokens(value)
+                else:
+                    ids = self._fields[field].match(lookup, value)
+                result = ids if result is None else result & ids
+                if not result:
+                    return set()
+            return result if result is not None else set(self._rows)
+
+    def _search_tokens(self, query):
+        """Get the ids of rows containing every token of the query."""
+        tokens = tokenize(query)
+        if not tokens:
+            return set(self._rows)
+        postings = sorted((self._tokens.get(t, set()) for t in set(tokens)), key=len)
+        result = set(postings[0])
+        for ids in postings[1:]:
+            result &= ids
+        return result
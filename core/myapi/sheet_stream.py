@@ -0,0 +1,196 @@
+"""
+Sheet Stream Module
+
+Streams list responses instead of building them in memory: rows are taken
+one at a time from the (lazy) ordered view, projected and encoded on the way
+out, so a full-sheet listing never holds every row dict or the whole JSON
+body at once. Asked for with ?stream=json (a JSON array, the same body as
+the buffered response), ?stream=ndjson / Accept: application/x-ndjson
+(one JSON object per line) or ?stream=csv (a header, then a line per row).
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import span
+from .sheet_query import SHEET_FIELDS
+
+NDJSON = 'application/x-ndjson'
+
+# Content type of each streaming format
+STREAM_FORMATS = {'json': 'application/json', 'ndjson': NDJSON, 'csv': 'text/csv'}
+
+# Characters of encoded rows gathered before a chunk is sent
+CHUNK_SIZE = 64 * 1024
+
+# Same output as DRF's JSONRenderer with its default compact settings
+_encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def parse_stream(params, accept=''):
+    """
+    Read the streaming mode of a list request.
+
+    Args:
+        params: The request's query parameters.
+        accept: The request's Accept header.
+
+    Returns:
+        str: 'json', 'ndjson' or 'csv', or None for a buffered response.
+
+    Raises:
+        ValueError: If the mode is unknown or combined with pagination.
+    """
+    stream = params.get('stream')
+    if stream is None and NDJSON in accept:
+        stream = 'ndjson'
+    if stream is None:
+        return None
+    if stream not in STREAM_FORMATS:
+        raise ValueError(f'stream must be one of: {", ".join(STREAM_FORMATS)}')
+    if any(name in params for name in ('limit', 'offset', 'cursor')):
+        raise ValueError('stream cannot be combined with limit, offset or cursor')
+    return stream
+
+
+def iter_projected(rows, fields):
+    """Lazily keep only the requested fields of each row (see project)."""
+    if fields is None:
+        return iter(rows)
+    return ({field: row.get(field, '') for field in fields} for row in rows)
+
+
+class _Echo:
+    """File-like object whose write returns the text, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _pieces(rows, fields, stream):
+    """Yield the body's text piece by piece, encoding one row at a time."""
+    if stream == 'csv':
+        columns = fields or SHEET_FIELDS
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([row.get(column, '') for column in columns])
+        return
+    if stream == 'ndjson':
+        for row in iter_projected(rows, fields):
+            yield _encoder.encode(row)
+            yield '\n'
+        return
+    yield '['
+    separator = ''
+    for row in iter_projected(rows, fields):
+        yield separator
+        yield _encoder.encode(row)
+        separator = ','
+    yield ']'
+
+
+def iter_body(rows, fields, stream, chunk_size=CHUNK_SIZE):
+    """
+    Encode rows into the chunks of a streamed body.
+
+    Args:
+        rows: Rows to send; iterated once, as the client reads.
+        fields: Field names from parse_fields, or None.
+        stream: 'json', 'ndjson' or 'csv'.
+        chunk_size: Characters gathered per chunk.
+
+    Yields:
+        bytes: UTF-8 encoded chunks of about chunk_size characters.
+    """
+    buffer = []
+    size = 0
+    # Runs after the view returned, so this only feeds the span histogram
+    with span('stream'):
+        for piece in _pieces(rows, fields, stream):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield ''.join(buffer).encode()
+                buffer = []
+                size = 0
+        if buffer:
+            yield ''.join(buffer).encode()
+
+
+async def aiter_body(rows, fields, stream, chunk_size=CHUNK_SIZE):
+    """
+    Async iterator over iter_body, for responses served through ASGI.
+
+    Django would read a synchronous iterator to the end before sending
+    anything under ASGI; this hands each chunk over as soon as it is built.
+    """
+    for chunk in iter_body(rows, fields, stream, chunk_size):
+        yield chunk
+
+
+def stream_response(rows, fields, stream, asynchronous=False):
+    """
+    Build a streaming list response.
+
+    Args:
+        rows: Rows to send, e.g. an OrderedView's rows.
+        fields: Field names from parse_fields, or None.
+        stream: 'json', 'ndjson' or 'csv'.
+        asynchronous: Stream through an async iterator (for async views).
+
+    Returns:
+        StreamingHttpResponse: The response.
+    """
+    body = aiter_body if asynchronous else iter_body
+    return StreamingHttpResponse(
+        body(rows, fields, stream), content_type=STREAM_FORMATS[stream]
+    )
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders NDJSON, so DRF's content negotiation accepts the media type.
+
+    Successful list responses are streamed by the view; this renders the
+    rest (errors), one JSON value per line.
+    """
+    media_type = NDJSON
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render a list as one line per item, anything else as one line."""
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(_encoder.encode(item) + '\n' for item in items).encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders CSV, so DRF's content negotiation accepts the media type.
+
+    Like NDJSONRenderer, it renders what the view doesn't stream: a list of
+    rows, or any other value (errors) as a one-row table of its keys.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render rows with a header line, anything else as a single row."""
+        if data is None:
+            return b''
+        if isinstance(data, list):
+            rows = data
+        else:
+            rows = [data if isinstance(data, dict) else {'detail': data}]
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        writer = csv.writer(_Echo())
+        lines = [writer.writerow(columns)]
+        lines += [writer.writerow([row.get(column, '') for column in columns]) for row in rows]
+        return ''.join(lines).encode()
@@ -0,0 +1,165 @@
+"""
+Sheet Sync Module
+
+This module keeps the service's snapshot in step with edits made directly
+in the Google Sheet (or by other worker processes). A worker polls the
+spreadsheet's Drive modifiedTime, which costs one small metadata request,
+and only re-reads the sheet when it moved; the fetched rows are then
+diffed against the snapshot so unchanged data keeps its cached views.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from .rate_limit import BATCH, set_priority
+
+logger = logging.getLogger(__name__)
+
+
+def parse_modified_time(value):
+    """
+    Parse a Drive API RFC 3339 timestamp.
+
+    Args:
+        value: Timestamp such as '2024-01-01T12:00:00.000Z'.
+
+    Returns:
+        float: Unix time, or None if the value can't be parsed.
+    """
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class SheetSyncWorker:
+    """
+    Polls the sheet for outside changes and applies them to the snapshot.
+
+    Run it as a background thread (ensure_started, enabled by setting
+    GOOGLE_SHEETS_SYNC_INTERVAL), call sync_once from another poller, or
+    run the sync_sheet management command.
+    """
+
+    def __init__(self, service, interval=10):
+        """
+        Initialize the worker.
+
+        Args:
+            service: The GoogleSheetsService whose snapshot is kept in sync.
+            interval: Seconds between polls; 0 disables the background thread.
+        """
+        self.service = service
+        self.interval = interval
+        self.polls = 0
+        self.skipped = 0
+        self.syncs = 0
+        self.errors = 0
+        self.rows_created = 0
+        self.rows_updated = 0
+        self.rows_deleted = 0
+        self.last_diff = None
+        self.last_lag = None
+        self._modified = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync_once(self, force=False):
+        """
+        Re-read the sheet if it was modified since the last poll.
+
+        Args:
+            force: Re-read even if the modification time didn't move.
+
+        Returns:
+            dict: Counts of 'created', 'updated' and 'deleted' rows, or None
+            if the sheet was unchanged and not re-read.
+        """
+        with self._sync_lock:
+            try:
+                modified = self.service.get_modified_time()
+                changed = force or modified != self._modified
+                diff = self.service.sync() if changed else None
+            except Exception:
+                with self._lock:
+                    self.polls += 1
+                    self.errors += 1
+                raise
+            now = time.time()
+            with self._lock:
+                self.polls += 1
+                self._checked_at = now
+                if diff is None:
+                    self.skipped += 1
+                    return None
+                self._modified = modified
+                self.syncs += 1
+                self.rows_created += diff['created']
+                self.rows_updated += diff['updated']
+                self.rows_deleted += diff['deleted']
+                self.last_diff = diff
+                modified_at = parse_modified_time(modified)
+                if modified_at is not None:
+                    # How long the edit took to reach the snapshot
+                    self.last_lag = max(now - modified_at, 0.0)
+            return diff
+
+    def ensure_started(self):
+        """Start the background thread, if enabled and not running yet."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self.run, name='sheets-sync', daemon=True
+            )
+            self._thread.start()
+
+    def run(self):
+        """Poll every interval seconds until stopped."""
+        set_priority(BATCH)
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception:
+                logger.exception('Sheet sync failed, retrying next interval')
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 30)
+
+    def stats(self):
+        """
+        Get sync lag and diff metrics.
+
+        Returns:
+            dict: Poll counts, changed-row totals, the last diff, the lag
+            of the last applied change and the seconds since the last poll.
+        """
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'polls': self.polls,
+                'skipped': self.skipped,
+                'syncs': self.syncs,
+                'errors': self.errors,
+                'rows_created': self.rows_created,
+                'rows_updated': self.rows_updated,
+                'rows_deleted': self.rows_deleted,
+                'last_diff': self.last_diff,
+                'lag_seconds': None if self.last_lag is None else round(self.last_lag, 3),
+                'seconds_since_poll': (
+                    None if self._checked_at is None
+                    else round(time.time() - self._checked_at, 3)
+                ),
+                'modified_time': self._modified,
+            }
@@ -0,0 +1,188 @@
+"""
+Sheet Transfer Module
+
+Bulk import of sheet items from CSV or NDJSON files. Records are parsed
+lazily from the input and written a chunk at a time: rows that already
+exist get one update_rows batch write per chunk and the rest one
+create_rows append, so a large file costs a few Sheets calls per thousand
+rows (instead of a read and an append per row) and is never held in memory.
+
+Exports stream rows through myapi.sheet_stream in the same formats.
+"""
+
+import csv
+import json
+import os
+
+from .sheet_cache import normalize_id
+
+# Formats accepted for imports, by media type
+IMPORT_FORMATS = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
+
+# File extensions of the import/export formats
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json'}
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Invalid records reported in detail; the rest are only counted
+MAX_ERRORS = 100
+
+
+def format_for_path(path):
+    """Get the format of a file from its extension, or None if unknown."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def read_records(lines, fmt):
+    """
+    Parse an import file lazily.
+
+    CSV files need a header line naming their columns (id, name,
+    description, email); NDJSON files hold one JSON object per line.
+
+    Args:
+        lines: Iterable of text lines.
+        fmt: 'csv' or 'ndjson'.
+
+    Yields:
+        tuple: (line number, record dict), or (line number, error message)
+        for a line that isn't a valid record.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield number, 'Expected a JSON object'
+            continue
+        yield number, record
+
+
+class SheetImport:
+    """
+    Writes parsed records to a backend in chunks and counts the outcome.
+
+    Records with the id of an existing row update its name and description
+    (the owner is kept); other records become new rows with new ids. Only
+    whole chunks count as processed, so after a failure ``processed`` tells
+    how many records to skip when the import is retried.
+    """
+
+    def __init__(self, backend, user_email=None, default_email='',
+                 chunk_size=DEFAULT_CHUNK_SIZE, processed=0):
+        """
+        Initialize the import.
+
+        Args:
+            backend: StorageBackend to write to.
+            user_email: Owner of every created row, and the only owner whose
+                        rows may be updated (regular users); None for all.
+            default_email: Owner of created rows that don't name one.
+            chunk_size: Records written per batch.
+            processed: Records already imported by an earlier attempt.
+        """
+        self.backend = backend
+        self.user_email = user_email
+        self.default_email = default_email
+        self.chunk_size = max(chunk_size, 1)
+        self.processed = processed
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, records, on_chunk=None):
+        """
+        Import records, skipping those an earlier attempt already processed.
+
+        Args:
+            records: (line number, record or error) pairs from read_records.
+            on_chunk: Optional callable run after each chunk is written,
+                      e.g. to save a checkpoint.
+
+        Returns:
+            dict: The import's stats().
+        """
+        skip = self.processed
+        chunk = []
+        for number, record in records:
+            if skip:
+                skip -= 1
+                continue
+            chunk.append((number, record))
+            if len(chunk) >= self.chunk_size:
+                self._write(chunk)
+                chunk = []
+                if on_chunk is not None:
+                    on_chunk(self)
+        if chunk:
+            self._write(chunk)
+            if on_chunk is not None:
+                on_chunk(self)
+        return self.stats()
+
+    def _fail(self, number, error):
+        """Count an invalid record, keeping the first few for the report."""
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': number, 'error': error})
+
+    def _write(self, chunk):
+        """Write one chunk: a batch update, then an append of the new rows."""
+        updates = []
+        creates = []
+        for number, record in chunk:
+            if isinstance(record, str):
+                self._fail(number, record)
+            elif not record.get('name'):
+                self._fail(number, 'Name is required')
+            elif record.get('id') not in (None, ''):
+                updates.append(dict(record, id=normalize_id(record['id'])))
+            else:
+                creates.append(record)
+
+        if updates:
+            results = self.backend.update_rows(updates, user_email=self.user_email)
+            for data, updated in zip(updates, results):
+                if updated is None:
+                    # Unknown (or someone else's) id: import as a new row
+                    creates.append(data)
+                else:
+                    self.updated += 1
+        if creates:
+            items = [
+                {
+                    'name': data['name'],
+                    'description': data.get('description', ''),
+                    'email': data.get('email') or self.default_email,
+                }
+                for data in creates
+            ]
+            self.backend.create_rows(items, user_email=self.user_email)
+            self.created += len(items)
+        self.processed += len(chunk)
+
+    def stats(self):
+        """
+        Get the import's outcome so far.
+
+        Returns:
+            dict: Records processed, rows created and updated, records that
+            failed, and the first MAX_ERRORS failures.
+        """
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
@@ -0,0 +1,203 @@
+"""
+Sheets Client Pool Module
+
+This module provides OAuth2 credentials shared through token.json by every
+thread and worker process, and a bounded pool of authorized gspread
+worksheets, each with its own keep-alive HTTP session, so concurrent
+requests don't share one client.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+
+from .file_lock import file_lock
+
+
+class SharedCredentials(Credentials):
+    """Credentials whose refreshes go through a TokenStore."""
+
+    _store = None
+
+    def refresh(self, request):
+        """Refresh the token once for all threads and processes."""
+        self._store.refresh(self, request)
+
+
+class TokenStore:
+    """
+    OAuth2 token kept in token.json and shared by threads and processes.
+
+    The token is refreshed at most once per expiry: the refreshing thread
+    holds a lock file while it refreshes and rewrites token.json, and other
+    threads or processes pick up the refreshed token instead of refreshing
+    themselves.
+    """
+
+    def __init__(self, token_file, client_secrets_file, scopes):
+        """
+        Initialize the store.
+
+        Args:
+            token_file: Path of the authorized-user token file.
+            client_secrets_file: OAuth client secrets, used when there is no token yet.
+            scopes: OAuth scopes to request.
+        """
+        self.token_file = str(token_file)
+        self.client_secrets_file = client_secrets_file
+        self.scopes = scopes
+        self.refreshes = 0
+        self._lock_file = self.token_file + '.lock'
+        self._credentials = None
+        self._lock = threading.Lock()
+
+    def _read(self, cls=Credentials):
+        """Read the token file, or return None if there is none."""
+        if not os.path.exists(self.token_file):
+            return None
+        return cls.from_authorized_user_file(self.token_file, self.scopes)
+
+    def _write(self, credentials):
+        """Save credentials atomically, so other processes never read a partial file."""
+        tmp_file = f'{self.token_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as token:
+            token.write(credentials.to_json())
+        os.replace(tmp_file, self.token_file)
+
+    def credentials(self):
+        """
+        Get the process-wide credentials, authorizing on first use.
+
+        Returns:
+            SharedCredentials: Credentials that refresh through this store.
+        """
+        with self._lock:
+            if self._credentials is None:
+                with file_lock(self._lock_file):
+                    credentials = self._read(SharedCredentials)
+                    if credentials is None or not credentials.refresh_token:
+                        # Run OAuth flow (opens browser for first-time auth)
+                        flow = InstalledAppFlow.from_client_secrets_file(
+                            self.client_secrets_file, self.scopes
+                        )
+                        self._write(flow.run_local_server(port=0))
+                        credentials = self._read(SharedCredentials)
+                credentials._store = self
+                self._credentials = credentials
+            return self._credentials
+
+    def refresh(self, credentials, request):
+        """
+        Refresh credentials unless another thread or process already did.
+
+        Args:
+            credentials: The SharedCredentials to update in place.
+            request: A google.auth transport request.
+        """
+        stale_token = credentials.token
+        with self._lock:
+            if credentials.valid and credentials.token != stale_token:
+                return  # Another thread refreshed while we waited
+            with file_lock(self._lock_file):
+                stored = self._read()
+                if stored is not None and stored.valid and stored.token != stale_token:
+                    # Another process refreshed and saved a new token
+                    credentials.token = stored.token
+                    credentials.expiry = stored.expiry
+                    return
+                Credentials.refresh(credentials, request)
+                self.refreshes += 1
+                self._write(credentials)
+
+
+class SheetsClientPool:
+    """Bounded pool of worksheets, each opened by its own authorized client."""
+
+    def __init__(self, open_worksheet, size=4):
+        """
+        Initialize an empty pool; worksheets are opened on demand.
+
+        Args:
+            open_worksheet: Callable returning a new worksheet with its own client.
+            size: Maximum number of worksheets (and HTTP sessions) open at once.
+        """
+        self.size = size
+        self._open_worksheet = open_worksheet
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _acquire(self):
+        """Take an idle worksheet, open a new one, or wait for one to be released."""
+        started = time.monotonic()
+        waited = False
+        with self._condition:
+            while not self._idle and self._open >= self.size:
+                waited = True
+                self._condition.wait()
+            worksheet = self._idle.pop() if self._idle else None
+            if worksheet is None:
+                self._open += 1
+            wait = time.monotonic() - started
+            self.acquisitions += 1
+            if waited:
+                self.waits += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+        if worksheet is None:
+            try:
+                worksheet = self._open_worksheet()
+            except Exception:
+                with self._condition:
+                    self._open -= 1
+                    self._condition.notify()
+                raise
+        return worksheet
+
+    def _release(self, worksheet):
+        """Return a worksheet to the pool."""
+        with self._condition:
+            self._idle.append(worksheet)
+            self._condition.notify()
+
+    @contextmanager
+    def sheet(self):
+        """
+        Borrow a worksheet for the duration of the block.
+
+        Yields:
+            gspread.Worksheet: A worksheet no other thread is using.
+        """
+        worksheet = self._acquire()
+        try:
+            yield worksheet
+        finally:
+            self._release(worksheet)
+
+    def stats(self):
+        """
+        Get pool size and wait-time metrics.
+
+        Returns:
+            dict: Pool statistics.
+        """
+        with self._condition:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'acquisitions': self.acquisitions,
+                'waits': self.waits,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_max': round(self.wait_seconds_max, 6),
+            }
@@ -2,15 +2,177 @@
 Google Sheets API Views
 
 REST API views for performing CRUD operations on Google Sheets data.
-With user-based data isolation using email.
+With user-based data isolation using email. The rows live in the store
+selected by SHEET_ITEMS_BACKEND (see myapi.backends), Google Sheets by default.
 """
 
+import codecs
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_header_parameters
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .backends import get_backend
+from .rate_limit import SheetsUnavailable
+from .sheet_query import (
+    decode_cursor, encode_cursor, parse_fields, parse_ordering, parse_page, project
+)
+from .sheet_search import parse_filters
+from .sheet_stream import CSVRenderer, NDJSONRenderer, parse_stream, stream_response
+from .sheet_transfer import IMPORT_FORMATS, SheetImport, read_records
+from .storage import PreconditionFailed, RowMovedError
+
+
+def unavailable(e):
+    """Tell the client to retry later when Google Sheets quota is exhausted."""
+    response = Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(int(e.retry_after))
+    return response
+
+
+def list_etag(request, digest, user_email, stream=None):
+    """
+    Build the ETag of a list response.
+    
+    The response is fully determined by the rows the user can see, the
+    query parameters and the streaming format, so all go into the tag.
+    
+    Args:
+        request: The current request.
+        digest: Content digest of the user's rows.
+        user_email: The user's email, or None for superusers.
+        stream: Streaming format from parse_stream, or None.
+        
+    Returns:
+        str: A quoted strong ETag.
+    """
+    query = sorted((k, v) for k, values in request.GET.lists() for v in values)
+    key = f'{digest:016x}|{user_email or "*"}|{query!r}'
+    if stream:
+        # NDJSON asked for through Accept leaves the query unchanged
+        key += f'|{stream}'
+    return '"%s"' % hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def set_validators(response, etag, last_modified):
+    """Attach ETag/Last-Modified and make clients revalidate each time."""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization', 'Accept'))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def if_match(request):
+    """Get the ETags of the request's If-Match header, or None if absent."""
+    header = request.META.get('HTTP_IF_MATCH')
+    if not header:
+        return None
+    return parse_etags(header)
+
+
+def check_preconditions(request, etag, last_modified):
+    """
+    Evaluate If-None-Match/If-Modified-Since (and If-Match for writes).
+    
+    Returns:
+        HttpResponse: A 304 or 412 response if the request's validators
+        decide it, otherwise None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
 
-from .google_sheets import sheets_service
+
+def parse_list_query(params):
+    """
+    Read the ordering, projection, pagination and filter parameters of a list request.
+    
+    Args:
+        params: The request's query parameters.
+        
+    Returns:
+        tuple: (ordering, fields, page, filters).
+        
+    Raises:
+        ValueError: If any parameter is invalid.
+    """
+    ordering = parse_ordering(params.get('ordering'))
+    fields = parse_fields(params.get('fields'))
+    page = parse_page(params)
+    filters = parse_filters(params)
+    if page and page['cursor']:
+        page['after'] = decode_cursor(page['cursor'], ordering)
+    return ordering, fields, page, filters
+
+
+def list_data(request, view, page, ordering, fields):
+    """Build the body of a list response: all rows, or one page of them."""
+    if page is None:
+        return project(view.rows, fields)
+    return paginate(request, view, page, ordering, fields)
+
+
+def paginate(request, view, page, ordering, fields):
+    """
+    Build a page of results from an ordered view.
+    
+    With ?cursor (empty for the first page) each page starts after the
+    previous page's last row, so rows added or removed elsewhere don't
+    shift it; otherwise limit/offset is used.
+    
+    Args:
+        request: The current request (used to build next/previous links).
+        view: OrderedView of the rows visible to the user.
+        page: Pagination parameters from parse_page, plus the decoded
+              cursor as 'after' when one was given.
+        ordering: Parsed ordering of the view.
+        fields: Parsed field projection, or None.
+        
+    Returns:
+        dict: 'count', 'next', 'previous' and 'results'.
+    """
+    url = request.build_absolute_uri()
+    limit = page['limit']
+    previous_url = None
+    if page['cursor'] is not None:
+        start = 0
+        if 'after' in page:
+            row_id, position = page['after']
+            start = view.index_after(row_id, hint=position)
+    else:
+        start = min(page['offset'], len(view))
+        if start - limit > 0:
+            previous_url = replace_query_param(url, 'offset', start - limit)
+        elif start > 0:
+            previous_url = remove_query_param(url, 'offset')
+    
+    rows = view.rows[start:start + limit]
+    end = start + len(rows)
+    next_url = None
+    if end < len(view):
+        if page['cursor'] is not None:
+            next_url = replace_query_param(
+                remove_query_param(url, 'offset'), 'cursor',
+                encode_cursor(ordering, rows[-1].get('id'), end)
+            )
+        else:
+            next_url = replace_query_param(url, 'offset', end)
+    
+    return {
+        'count': len(view),
+        'next': next_url,
+        'previous': previous_url,
+        'results': project(rows, fields),
+    }
 
 
 class SheetItemListCreateAPIView(APIView):
@@ -18,20 +180,47 @@ class SheetItemListCreateAPIView(APIView):
     API view for listing all items and creating new items in Google Sheets.
     
     GET: Returns all rows from the sheet (filtered by user email for non-superusers).
+         Supports ?ordering=, ?fields=, and ?limit=/?offset= or ?cursor= pagination.
+         Filters: ?name=, ?name__startswith=, ?name__contains= (same for
+         description) and ?q= word search. ?stream=json or ?stream=ndjson
+         (or Accept: application/x-ndjson) streams all rows instead.
     POST: Creates a new row with user's email automatically assigned.
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
     
     def get(self, request):
         """Get all items from Google Sheets."""
         try:
+            try:
+                ordering, fields, page, filters = parse_list_query(request.query_params)
+                stream = parse_stream(request.query_params, request.META.get('HTTP_ACCEPT', ''))
+            except ValueError as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             user = request.user
             # Superusers see all, regular users see only their items
-            if user.is_superuser:
-                items = sheets_service.get_all_rows()
-            else:
-                items = sheets_service.get_all_rows(user_email=user.email)
-            return Response(items, status=status.HTTP_200_OK)
+            user_email = None if user.is_superuser else user.email
+            
+            # Answer revalidation from the snapshot digest, before building rows
+            digest, last_modified = get_backend().get_view_version(user_email=user_email)
+            etag = list_etag(request, digest, user_email, stream)
+            not_modified = check_preconditions(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            
+            view = get_backend().get_ordered_view(
+                user_email=user_email, ordering=ordering, filters=filters
+            )
+            if stream:
+                return set_validators(stream_response(view.rows, fields, stream), etag, last_modified)
+            data = list_data(request, view, page, ordering, fields)
+            return set_validators(Response(data, status=status.HTTP_200_OK), etag, last_modified)
+        except SheetsUnavailable as e:
+            return unavailable(e)
         except Exception as e:
             error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
             return Response(
@@ -51,8 +240,10 @@ class SheetItemListCreateAPIView(APIView):
             
             # Auto-assign user's email
             user = request.user
-            item = sheets_service.create_row(data, user_email=user.email)
+            item = get_backend().create_row(data, user_email=user.email)
             return Response(item, status=status.HTTP_201_CREATED)
+        except SheetsUnavailable as e:
+            return unavailable(e)
         except Exception as e:
             error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
             return Response(
@@ -77,13 +268,26 @@ class SheetItemDetailAPIView(APIView):
             user = request.user
             user_email = None if user.is_superuser else user.email
             
-            item = sheets_service.get_row(row_id, user_email=user_email)
+            version = get_backend().get_row_version(row_id, user_email=user_email)
+            if version is None:
+                return Response(
+                    {'error': 'Item not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            etag, last_modified = version
+            not_modified = check_preconditions(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            
+            item = get_backend().get_row(row_id, user_email=user_email)
             if item is None:
                 return Response(
                     {'error': 'Item not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            return Response(item, status=status.HTTP_200_OK)
+            return set_validators(Response(item, status=status.HTTP_200_OK), etag, last_modified)
+        except SheetsUnavailable as e:
+            return unavailable(e)
         except Exception as e:
             error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
             return Response(
@@ -97,13 +301,29 @@ class SheetItemDetailAPIView(APIView):
             user = request.user
             user_email = None if user.is_superuser else user.email
             
-            item = sheets_service.update_row(row_id, request.data, user_email=user_email)
+            item = get_backend().update_row(
+                row_id, request.data, user_email=user_email, if_match=if_match(request)
+            )
             if item is None:
                 return Response(
                     {'error': 'Item not found or not authorized'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            return Response(item, status=status.HTTP_200_OK)
+            response = Response(item, status=status.HTTP_200_OK)
+            response['ETag'] = get_backend().row_etag(item)
+            return response
+        except PreconditionFailed as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_412_PRECONDITION_FAILED
+            )
+        except RowMovedError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        except SheetsUnavailable as e:
+            return unavailable(e)
         except Exception as e:
             error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
             return Response(
@@ -117,16 +337,251 @@ class SheetItemDetailAPIView(APIView):
             user = request.user
             user_email = None if user.is_superuser else user.email
             
-            deleted = sheets_service.delete_row(row_id, user_email=user_email)
+            deleted = get_backend().delete_row(
+                row_id, user_email=user_email, if_match=if_match(request)
+            )
             if not deleted:
                 return Response(
                     {'error': 'Item not found or not authorized'},
                     status=status.HTTP_404_NOT_FOUND
                 )
             return Response(status=status.HTTP_204_NO_CONTENT)
+        except PreconditionFailed as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_412_PRECONDITION_FAILED
+            )
+        except RowMovedError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_409_CONFLICT
+            )
+        except SheetsUnavailable as e:
+            return unavailable(e)
+        except Exception as e:
+            error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SheetItemBulkAPIView(APIView):
+    """
+    API view for creating, updating, and deleting many items in one request.
+    
+    POST: Creates rows from a list of items with a single append.
+    PUT: Updates rows from a list of items (each with an 'id') with a single batch write.
+    DELETE: Deletes rows from a list of IDs with a single batch request.
+    
+    Responses contain a per-item result for every input, in input order.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Create several items in Google Sheets."""
+        try:
+            items = request.data
+            if not isinstance(items, list):
+                return Response(
+                    {'error': 'Expected a list of items'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            results = [None] * len(items)
+            valid = []
+            for idx, data in enumerate(items):
+                if not isinstance(data, dict) or not data.get('name'):
+                    results[idx] = {'status': status.HTTP_400_BAD_REQUEST, 'error': 'Name is required'}
+                else:
+                    valid.append(idx)
+            
+            # Auto-assign user's email
+            user = request.user
+            created = get_backend().create_rows([items[idx] for idx in valid], user_email=user.email)
+            for idx, item in zip(valid, created):
+                results[idx] = {'status': status.HTTP_201_CREATED, 'item': item}
+            return Response({'results': results}, status=status.HTTP_200_OK)
+        except SheetsUnavailable as e:
+            return unavailable(e)
+        except Exception as e:
+            error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def put(self, request):
+        """Update several items by ID."""
+        try:
+            items = request.data
+            if not isinstance(items, list):
+                return Response(
+                    {'error': 'Expected a list of items'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            results = [None] * len(items)
+            valid = []
+            for idx, data in enumerate(items):
+                if not isinstance(data, dict) or data.get('id') in (None, ''):
+                    results[idx] = {'status': status.HTTP_400_BAD_REQUEST, 'error': 'ID is required'}
+                else:
+                    valid.append(idx)
+            
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+            try:
+                updated = get_backend().update_rows([items[idx] for idx in valid], user_email=user_email)
+            except RowMovedError as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            for idx, item in zip(valid, updated):
+                if item is None:
+                    results[idx] = {'status': status.HTTP_404_NOT_FOUND, 'error': 'Item not found or not authorized'}
+                else:
+                    results[idx] = {'status': status.HTTP_200_OK, 'item': item}
+            return Response({'results': results}, status=status.HTTP_200_OK)
+        except SheetsUnavailable as e:
+            return unavailable(e)
         except Exception as e:
             error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
             return Response(
                 {'error': error_msg},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    def delete(self, request):
+        """Delete several items by ID."""
+        try:
+            row_ids = request.data
+            if not isinstance(row_ids, list):
+                return Response(
+                    {'error': 'Expected a list of IDs'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            results = [None] * len(row_ids)
+            valid = []
+            for idx, row_id in enumerate(row_ids):
+                if isinstance(row_id, bool) or not isinstance(row_id, (int, str)) or row_id == '':
+                    results[idx] = {'id': row_id, 'status': status.HTTP_400_BAD_REQUEST, 'error': 'Invalid ID'}
+                else:
+                    valid.append(idx)
+            
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+            try:
+                deleted = get_backend().delete_rows([row_ids[idx] for idx in valid], user_email=user_email)
+            except RowMovedError as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            for idx, ok in zip(valid, deleted):
+                if ok:
+                    results[idx] = {'id': row_ids[idx], 'status': status.HTTP_204_NO_CONTENT}
+                else:
+                    results[idx] = {'id': row_ids[idx], 'status': status.HTTP_404_NOT_FOUND, 'error': 'Item not found or not authorized'}
+            return Response({'results': results}, status=status.HTTP_200_OK)
+        except SheetsUnavailable as e:
+            return unavailable(e)
+        except Exception as e:
+            error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SheetItemExportAPIView(APIView):
+    """
+    API view for downloading every item the user can see as a file.
+    
+    GET: Streams the rows as CSV, or as NDJSON or JSON with ?format=ndjson
+         or ?format=json (or the matching Accept header). Rows come from the
+         snapshot the list view serves, so exporting costs no Sheets calls.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer, JSONRenderer]
+    
+    def get(self, request):
+        """Export all items as a CSV, NDJSON or JSON download."""
+        try:
+            user = request.user
+            user_email = None if user.is_superuser else user.email
+            view = get_backend().get_ordered_view(user_email=user_email)
+            fmt = request.accepted_renderer.format
+            response = stream_response(view.rows, None, fmt)
+            response['Content-Disposition'] = f'attachment; filename="sheet-items.{fmt}"'
+            return response
+        except SheetsUnavailable as e:
+            return unavailable(e)
+        except Exception as e:
+            error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SheetItemImportAPIView(APIView):
+    """
+    API view for loading items from a CSV or NDJSON file.
+    
+    POST: Reads a text/csv or application/x-ndjson body as it arrives and
+          writes it in chunks (see myapi.sheet_transfer). Rows with an
+          existing id are updated, the rest created with the user's email
+          (superusers keep each row's email). ?skip=N resumes an import that
+          failed after its first N records, the 'processed' count it returned.
+    
+    Responses report records processed, rows created and updated, and the
+    records that were invalid.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Import items from the request body."""
+        media_type, params = parse_header_parameters(request.content_type or '')
+        fmt = IMPORT_FORMATS.get(media_type.lower())
+        if fmt is None:
+            return Response(
+                {'error': f'Content-Type must be one of: {", ".join(IMPORT_FORMATS)}'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        try:
+            # A UTF-8 body may still start with a byte order mark
+            encoding = codecs.lookup(params.get('charset', 'utf-8-sig')).name
+        except LookupError:
+            return Response(
+                {'error': f'Unknown charset "{params["charset"]}"'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        if encoding == 'utf-8':
+            encoding = 'utf-8-sig'
+        try:
+            skip = int(request.query_params.get('skip', 0))
+        except ValueError:
+            skip = -1
+        if skip < 0:
+            return Response(
+                {'error': 'skip must be a non-negative integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user = request.user
+        importer = SheetImport(
+            get_backend(), user_email=None if user.is_superuser else user.email,
+            default_email=user.email, processed=skip
+        )
+        try:
+            # Decoded line by line; the body is never read whole
+            lines = codecs.iterdecode(request.stream or (), encoding)
+            stats = importer.run(read_records(lines, fmt))
+            return Response(stats, status=status.HTTP_200_OK)
+        except SheetsUnavailable as e:
+            response = unavailable(e)
+            response.data.update(importer.stats())
+            return response
+        except Exception as e:
+            error_msg = str(e) if str(e) else f"{type(e).__name__}: {repr(e)}"
+            return Response(
+                dict(importer.stats(), error=error_msg),
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,127 @@
+"""
+Single-Flight Module
+
+This module coalesces concurrent cache refills: when many requests miss the
+snapshot at once, one of them (the leader) fetches the sheet while the rest
+wait for and share its result, so a burst of N readers costs one upstream
+call instead of N. Threads and asyncio tasks can share the same flight.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# Result handed to waiters when the leader was cancelled: they retry instead
+_RETRY = object()
+
+
+class SingleFlight:
+    """At most one call in flight; concurrent callers share its outcome."""
+
+    def __init__(self):
+        """Initialize with no call in flight."""
+        self.calls = 0
+        self.shared = 0
+        self._future = None
+        self._lock = threading.Lock()
+
+    def _join(self):
+        """
+        Join the call in flight, or start one.
+
+        Returns:
+            tuple: (future, leader) - leader is True if the caller must run
+            the call and resolve the future.
+        """
+        with self._lock:
+            if self._future is not None:
+                self.shared += 1
+                return self._future, False
+            future = Future()
+            # A running future can't be cancelled by one impatient waiter
+            future.set_running_or_notify_cancel()
+            self._future = future
+            self.calls += 1
+            return future, True
+
+    def _resolve(self, future, result=None, error=None):
+        """Hand the leader's outcome to the waiters and end the flight."""
+        with self._lock:
+            self._future = None
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, func):
+        """
+        Call func(), or wait for the identical call already in flight.
+
+        Args:
+            func: Callable fetching the shared result.
+
+        Returns:
+            The result of func, possibly from another caller's call.
+
+        Raises:
+            Whatever func raised, in the leader and in every waiter.
+        """
+        while True:
+            future, leader = self._join()
+            if not leader:
+                result = future.result()
+                if result is _RETRY:
+                    continue
+                return result
+            try:
+                result = func()
+            except Exception as e:
+                self._resolve(future, error=e)
+                raise
+            except BaseException:
+                self._resolve(future, _RETRY)
+                raise
+            self._resolve(future, result)
+            return result
+
+    async def ado(self, func):
+        """
+        Await func(), or wait for the identical call already in flight.
+
+        Args:
+            func: Coroutine function fetching the shared result.
+
+        Returns:
+            The result of func, possibly from another caller's call.
+
+        Raises:
+            Whatever func raised, in the leader and in every waiter.
+        """
+        while True:
+            future, leader = self._join()
+            if not leader:
+                result = await asyncio.wrap_future(future)
+                if result is _RETRY:
+                    continue
+                return result
+            try:
+                result = await func()
+            except Exception as e:
+                self._resolve(future, error=e)
+                raise
+            except BaseException:
+                # Cancelled leader: let a waiter take over the fetch
+                self._resolve(future, _RETRY)
+                raise
+            self._resolve(future, result)
+            return result
+
+    def stats(self):
+        """
+        Get coalescing counters.
+
+        Returns:
+            dict: Calls made and callers that shared another's call.
+        """
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,210 @@
+"""
+Sheet Items Storage Module
+
+This module defines the contract every sheet-items store implements, so the
+sheet-item API views can run against Google Sheets, the database or memory
+alike (see myapi.backends), and the errors stores raise.
+"""
+
+from .sheet_digest import row_digest
+
+
+class PreconditionFailed(Exception):
+    """The row no longer matches the version the client expected (If-Match)."""
+
+
+class RowMovedError(Exception):
+    """Rows kept shifting under a positional write, even after a reload."""
+
+
+class StorageBackend:
+    """
+    CRUD contract of a sheet-items store.
+
+    Rows are dictionaries with 'id', 'name', 'description' and 'email' keys.
+    Passing user_email restricts an operation to that owner's rows, as for
+    regular (non-superuser) API users.
+    """
+
+    def ensure_email_column(self):
+        """Prepare the store to hold owner emails (a no-op unless overridden)."""
+
+    def get_all_rows(self, user_email=None):
+        """
+        Get all rows in store order.
+
+        Returns:
+            list: Row dictionaries.
+        """
+        raise NotImplementedError
+
+    def iter_rows(self, user_email=None, chunk_size=5000):
+        """
+        Iterate over all rows, for exports.
+
+        Stores override this to read in chunks of about chunk_size rows
+        rather than building the whole list first.
+
+        Returns:
+            iterator: Row dictionaries in store order.
+        """
+        return iter(self.get_all_rows(user_email))
+
+    def get_view_version(self, user_email=None):
+        """
+        Get a content version of the rows a user can list.
+
+        Returns:
+            tuple: (digest, last_modified) - a 64-bit content hash that is the
+            same in every process for the same rows, and a Unix timestamp.
+        """
+        raise NotImplementedError
+
+    def get_ordered_view(self, user_email=None, ordering=(), filters=()):
+        """
+        Get rows in a given order.
+
+        Args:
+            user_email: Optional email to filter by.
+            ordering: (field, descending) pairs from sheet_query.parse_ordering.
+            filters: Optional filters from sheet_search.parse_filters.
+
+        Returns:
+            OrderedView: The sorted rows and each id's position among them.
+        """
+        raise NotImplementedError
+
+    def get_row(self, row_id, user_email=None):
+        """
+        Get a specific row by ID.
+
+        Returns:
+            dict: Row data or None if not found.
+        """
+        raise NotImplementedError
+
+    def get_row_version(self, row_id, user_email=None):
+        """
+        Get the version of a single row, for use as an ETag.
+
+        Returns:
+            tuple: (etag, last_modified) or None if not found.
+        """
+        raise NotImplementedError
+
+    def create_row(self, data, user_email=None):
+        """
+        Create a row.
+
+        Returns:
+            dict: The created row data with assigned ID.
+        """
+        return self.create_rows([data], user_email=user_email)[0]
+
+    def update_row(self, row_id, data, user_email=None, if_match=None):
+        """
+        Update a row (its email can't be changed).
+
+        Returns:
+            dict: Updated row data or None if not found.
+
+        Raises:
+            PreconditionFailed: If the row no longer matches if_match.
+        """
+        raise NotImplementedError
+
+    def delete_row(self, row_id, user_email=None, if_match=None):
+        """
+        Delete a row.
+
+        Returns:
+            bool: True if deleted, False if not found or not authorized.
+
+        Raises:
+            PreconditionFailed: If the row no longer matches if_match.
+        """
+        raise NotImplementedError
+
+    def create_rows(self, items, user_email=None):
+        """
+        Create several rows.
+
+        Returns:
+            list: The created rows with assigned IDs, in input order.
+        """
+        raise NotImplementedError
+
+    def update_rows(self, updates, user_email=None):
+        """
+        Update several rows; each update needs an 'id'.
+
+        Returns:
+            list: Updated row data, or None for rows not found or not
+            authorized, in input order.
+        """
+        raise NotImplementedError
+
+    def delete_rows(self, row_ids, user_email=None):
+        """
+        Delete several rows by ID.
+
+        Returns:
+            list: True for each deleted row, False if not found or not
+            authorized, in input order.
+        """
+        raise NotImplementedError
+
+    def change_feed(self):
+        """
+        Get the feed of row changes.
+
+        Returns:
+            ChangeFeed: The feed.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def row_etag(record):
+        """
+        Get the ETag of a row's current content.
+
+        Args:
+            record: Row dictionary.
+
+        Returns:
+            str: A quoted strong ETag.
+        """
+        return f'"{row_digest(record):016x}"'
+
+    def _check_if_match(self, record, if_match):
+        """
+        Raise PreconditionFailed unless the row matches one of the ETags.
+
+        Args:
+            record: The row's current data.
+            if_match: List of ETags from If-Match ('*' matches any), or None.
+        """
+        if if_match is None:
+            return
+        if '*' not in if_match and self.row_etag(record) not in if_match:
+            raise PreconditionFailed('Item was modified, reload it and try again')
+
+    @staticmethod
+    def _new_row(row_id, data, user_email=None):
+        """Build a new row from request data."""
+        return {
+            'id': row_id,
+            'name': data.get('name', ''),
+            'description': data.get('description', ''),
+            'email': user_email or data.get('email', '')
+        }
+
+    @staticmethod
+    def _merge_update(row_id, current, data):
+        """Merge updates into the current row (don't allow changing email)."""
+        return {
+            'id': row_id,
+            'name': data.get('name', current.get('name', '')),
+            'description': data.get('description', current.get('description', '')),
+            'email': current.get('email', '')  # Keep original email
+        }
@@ -1,3 +1,1249 @@
-from django.test import TestCase
+import asyncio
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from google.oauth2.credentials import Credentials
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import backends, google_sheets
+from .async_sheets import AsyncGoogleSheetsService
+from .async_sheets_views import SheetItemEventsView, sse_messages
+from .change_feed import ChangeFeed
+from .fake_sheets import HEADER, FakeSheets
+from .file_lock import file_lock
+from .google_sheets import GoogleSheetsService
+from .metrics import RequestMetricsMiddleware, metrics_view, render_metrics, sheets_call, span
+from .models import SheetRow
+from .rate_limit import SheetsRateLimiter, SheetsUnavailable, TokenBucket
+from .sharding import ShardedSheetsBackend, ShardMap
+from .sheet_cache import CompactRows, SheetSnapshot
+from .sheet_query import OrderedView, sort_rows
+from .sheet_search import parse_filters
+from .sheet_stream import aiter_body, iter_body
+from .sheet_transfer import SheetImport, read_records
+from .sheets_pool import TokenStore
+from .sheets_views import (
+    SheetItemBulkAPIView, SheetItemDetailAPIView, SheetItemImportAPIView, SheetItemListCreateAPIView
+)
+from .storage import PreconditionFailed
+from .write_behind import coalesce
+
+ROWS = [
+    HEADER,
+    [1, 'first', 'one', 'u@example.com'],
+    [2, 'second', 'two', 'v@example.com'],
+    [3, 'third', 'three', 'u@example.com'],
+]
+
+
+def make_service(max_retries=2, **fake_options):
+    """Build a service backed by a new fake sheet, with fast retries."""
+    fake_options.setdefault('rows', ROWS)
+    fake = FakeSheets(settings.GOOGLE_SHEETS_SPREADSHEET_ID, **fake_options)
+    with override_settings(GOOGLE_SHEETS_CACHE_TTL=60):
+        service = GoogleSheetsService(api=fake)
+    service._limiter = fast_limiter(max_retries)
+    return service
+
+
+def fast_limiter(max_retries=2):
+    """Build a rate limiter that doesn't slow tests down."""
+    return SheetsRateLimiter(
+        read_per_minute=6000, write_per_minute=6000, burst=100,
+        max_retries=max_retries, base_delay=0.01, max_delay=0.05
+    )
+
+
+def make_sharded(names, previous=None, key='id', fakes=None):
+    """
+    Build a sharded backend with a fake worksheet per shard.
+
+    Args:
+        names: Shard names; shard 'x' lives in worksheet 'Items x'.
+        previous: Shard names before resharding, or None.
+        key: Shard key.
+        fakes: {name: FakeSheets} to reuse, e.g. from another backend.
+    """
+    def specs(shard_names):
+        return [{'name': name, 'worksheet': f'Items {name}'} for name in shard_names]
+
+    with override_settings(GOOGLE_SHEETS_FAKE={}, GOOGLE_SHEETS_CACHE_TTL=60):
+        backend = ShardedSheetsBackend(
+            specs(names), previous_shards=specs(previous) if previous else None, key=key
+        )
+    limiter = fast_limiter()
+    for name, service in backend.services.items():
+        service._limiter = limiter
+        if fakes and name in fakes:
+            service._api = fakes[name]
+    return backend
+
+
+class FakeSheetsTests(TestCase):
+    """The fake answers the Sheets API calls gspread makes."""
+
+    def test_values_are_strings_with_trailing_blanks_trimmed(self):
+        fake = FakeSheets('sheet', rows=[['a', 1, ''], ['', None], []])
+        status, _, data = fake.handle(
+            'GET', 'https://sheets.googleapis.com/v4/spreadsheets/sheet/values/Sheet1'
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(data['values'], [['a', '1']])
+
+    def test_values_by_column(self):
+        fake = FakeSheets('sheet', rows=[['id', 'name'], [1], [2, 'b']])
+        status, _, data = fake.handle(
+            'GET', 'https://sheets.googleapis.com/v4/spreadsheets/sheet/values/Sheet1!A:B'
+            '?majorDimension=COLUMNS'
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(data['values'], [['id', '1', '2'], ['name', '', 'b']])
+
+    def test_unknown_spreadsheet_is_not_found(self):
+        fake = FakeSheets('sheet')
+        status, _, data = fake.handle(
+            'GET', 'https://sheets.googleapis.com/v4/spreadsheets/other'
+        )
+        self.assertEqual(status, 404)
+        self.assertEqual(data['error']['code'], 404)
+
+    def test_quota_rejects_with_resource_exhausted(self):
+        fake = FakeSheets('sheet', reads_per_minute=1)
+        url = 'https://sheets.googleapis.com/v4/spreadsheets/sheet'
+        self.assertEqual(fake.handle('GET', url)[0], 200)
+        status, _, data = fake.handle('GET', url)
+        self.assertEqual(status, 429)
+        self.assertEqual(data['error']['status'], 'RESOURCE_EXHAUSTED')
+        self.assertEqual(fake.stats()['rejected'], {429: 1})
+
+
+class CompactRowsTests(TestCase):
+    """The snapshot stores rows by column and builds dicts on access."""
+
+    def test_rows_round_trip(self):
+        records = [
+            {'id': 1, 'name': 'a', 'description': '', 'email': 'u@example.com'},
+            {'id': 'x', 'name': 2, 'description': 'd', 'email': 'u@example.com', 'extra': 'z'},
+            {'id': '', 'name': 'blank id'},
+        ]
+        rows = CompactRows(records)
+        self.assertEqual(list(rows), records)
+        self.assertEqual(rows[-1], records[-1])
+        self.assertTrue(rows.matches(1, records[1]))
+        self.assertFalse(rows.matches(2, dict(records[2], email='')))
+        rows[0] = dict(records[0], name='renamed')
+        self.assertEqual(rows.pop(1), records[1])
+        self.assertEqual([row['name'] for row in rows], ['renamed', 'blank id'])
+
+    def test_rows_handed_out_are_not_changed_by_writes(self):
+        snapshot = SheetSnapshot(ttl=60)
+        snapshot.load([{'id': i, 'name': str(i), 'email': 'u@example.com'} for i in range(1, 6)])
+        selection = snapshot.rows_for_email('u@example.com')
+        snapshot.remove(2)
+        snapshot.append({'id': 6, 'name': '6', 'email': 'u@example.com'})
+        self.assertEqual([row['id'] for row in selection], [1, 2, 3, 4, 5])
+        self.assertEqual(snapshot.lookup(4), (4, {'id': 4, 'name': '4', 'email': 'u@example.com'}))
+        self.assertEqual([row['id'] for row in snapshot.get()], [1, 3, 4, 5, 6])
+
+    def test_selections_sort_and_page_like_lists(self):
+        records = [{'id': i, 'name': f'item {i % 7}'} for i in range(1, 50)]
+        ordering = (('name', True), ('id', False))
+        view = OrderedView(sort_rows(CompactRows(records).select(), ordering))
+        self.assertEqual(view.rows[10:20], sort_rows(records, ordering)[10:20])
+        self.assertEqual(view.index_after(view.rows[29]['id'], hint=7), 30)
+
+    def test_uses_less_memory_than_row_dicts(self):
+        def retained(build):
+            tracemalloc.start()
+            try:
+                result = build()
+                return result, tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        def records():
+            return [
+                {'id': i, 'name': f'Item {i}', 'description': '', 'email': f'user{i % 10}@example.com'}
+                for i in range(5000)
+            ]
+
+        _, dicts = retained(records)
+        _, compact = retained(lambda: CompactRows(records()))
+        self.assertLess(compact, dicts / 2)
+
+
+class SheetsServiceTests(TestCase):
+    """GoogleSheetsService against the fake sheet."""
+
+    def setUp(self):
+        self.service = make_service()
+        self.fake = self.service._api
+
+    def test_crud_round_trip(self):
+        created = self.service.create_row({'name': 'new'}, user_email='u@example.com')
+        self.assertEqual(created['id'], 4)
+        updated = self.service.update_row(created['id'], {'name': 'renamed'})
+        self.assertEqual(updated['name'], 'renamed')
+        self.assertTrue(self.service.delete_row(1, user_email='u@example.com'))
+        self.assertFalse(self.service.delete_row(2, user_email='u@example.com'))
+        self.assertEqual(
+            self.fake.rows[1:],
+            [[2, 'second', 'two', 'v@example.com'],
+             [3, 'third', 'three', 'u@example.com'],
+             [4, 'renamed', '', 'u@example.com']]
+        )
+
+    def test_reads_are_served_from_the_snapshot(self):
+        self.service.get_all_rows()
+        self.fake.reset_stats()
+        self.service.get_all_rows()
+        self.service.get_all_rows(user_email='u@example.com')
+        self.service.get_row(2)
+        self.assertEqual(self.fake.stats()['total_calls'], 0)
+
+    def test_bulk_operations_are_batched(self):
+        self.service.get_all_rows()
+        self.fake.reset_stats()
+        self.service.create_rows([{'name': str(i)} for i in range(20)])
+        self.service.update_rows([{'id': i, 'name': 'x'} for i in (1, 2, 3)])
+        calls = self.fake.stats()['calls']
+        self.assertEqual(calls['values.append'], 1)
+        self.assertEqual(calls['values.batchUpdate'], 1)
+        self.assertEqual(len(self.fake.rows), 24)
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.service.row_etag(self.service.get_row(1))
+        self.fake.rows[1][1] = 'edited elsewhere'
+        self.service.invalidate_cache()
+        with self.assertRaises(PreconditionFailed):
+            self.service.update_row(1, {'name': 'mine'}, if_match=[etag])
+
+    def test_write_follows_a_row_moved_by_another_client(self):
+        self.service.get_all_rows()
+        del self.fake.rows[1]  # Rows shift up behind the snapshot's back
+        updated = self.service.update_row(3, {'name': 'moved'})
+        self.assertEqual(updated['name'], 'moved')
+        self.assertEqual(self.fake.rows[2], [3, 'moved', 'three', 'u@example.com'])
+
+    def test_sync_applies_outside_edits(self):
+        self.service.get_all_rows()
+        worker = self.service._sync_worker
+        worker.sync_once()
+        self.assertIsNone(worker.sync_once())
+        self.fake.rows.append([5, 'added', '', 'v@example.com'])
+        self.fake.rows[1][1] = 'changed'
+        self.fake.modified_time += 1
+        self.assertEqual(worker.sync_once(), {'created': 1, 'updated': 1, 'deleted': 0})
+        self.assertEqual(self.service.get_row(1)['name'], 'changed')
+
+
+class WriteBehindTests(TestCase):
+    """Mutations journaled and flushed in coalesced batches."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(
+            GOOGLE_SHEETS_WRITE_BEHIND=True, GOOGLE_SHEETS_FLUSH_INTERVAL=3600,
+            GOOGLE_SHEETS_JOURNAL_FILE=os.path.join(directory.name, 'journal.jsonl')
+        ):
+            self.service = make_service()
+        self.fake = self.service._api
+        self.queue = self.service._write_behind
+        # Stop the flusher before its journal directory is removed
+        self.addCleanup(atexit.unregister, self.queue.stop)
+        self.addCleanup(self.queue.stop)
+
+    def sheet_ids(self):
+        return [row[0] for row in self.fake.rows[1:]]
+
+    def test_coalesce(self):
+        self.assertEqual(
+            coalesce([
+                {'op': 'create', 'row': {'id': 4, 'name': 'a'}},
+                {'op': 'update', 'row': {'id': 4, 'name': 'b'}},
+                {'op': 'update', 'row': {'id': 2, 'name': 'c'}},
+                {'op': 'delete', 'row': {'id': 2}},
+                {'op': 'create', 'row': {'id': 5, 'name': 'd'}},
+                {'op': 'delete', 'row': {'id': '5'}},
+            ]),
+            [('create', {'id': 4, 'name': 'b'}), ('delete', {'id': 2}), ('delete', {'id': '5'})]
+        )
+
+    def test_writes_wait_for_the_flush(self):
+        created = self.service.create_row({'name': 'new'}, user_email='u@example.com')
+        self.service.update_row(created['id'], {'name': 'renamed'})
+        self.service.delete_row(2)
+        self.assertEqual(self.sheet_ids(), [1, 2, 3])
+        self.assertEqual(self.service.get_row(4)['name'], 'renamed')
+
+        self.fake.reset_stats()
+        self.assertEqual(self.service.flush(), 2)
+        self.assertEqual(self.fake.stats()['calls']['values.append'], 1)
+        self.assertEqual(
+            self.fake.rows[1:],
+            [[1, 'first', 'one', 'u@example.com'],
+             [3, 'third', 'three', 'u@example.com'],
+             [4, 'renamed', '', 'u@example.com']]
+        )
+
+    def test_failed_flush_is_replayed_without_duplicates(self):
+        self.service.get_all_rows()
+        self.service.create_row({'name': 'new'})
+        self.service.update_row(2, {'name': 'renamed'})
+        self.queue.max_batch_size = 1  # The append lands, then the update fails
+        with mock.patch.object(self.service, '_write_updates', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.service.flush()
+        self.assertEqual(self.sheet_ids(), [1, 2, 3, 4])
+
+        self.assertEqual(self.service.flush(), 2)
+        self.assertEqual(self.sheet_ids(), [1, 2, 3, 4])
+        self.assertEqual(self.fake.rows[2][1], 'renamed')
+        self.assertEqual(self.service.flush(), 0)
+
+    def test_update_below_deleted_rows(self):
+        self.service.delete_rows([1, 2])
+        self.service.update_row(3, {'name': 'renamed'})
+        self.service.flush()
+        self.assertEqual(self.fake.rows[1:], [[3, 'renamed', 'three', 'u@example.com']])
+
+    def test_read_taken_before_the_flush_sees_pending_writes(self):
+        stale = [dict(zip(HEADER, row)) for row in self.fake.rows[1:]]
+        self.service.create_row({'name': 'new'})
+        self.service.update_row(1, {'name': 'renamed'})
+        self.service.delete_row(3)
+        expected = [(1, 'renamed'), (2, 'second'), (4, 'new')]
+        seen = []
+        write_batch = self.queue._write_batch
+
+        def read_then_write(mutations):
+            seen.append(self.queue.apply_pending(stale))
+            write_batch(mutations)
+
+        with mock.patch.object(self.queue, '_write_batch', side_effect=read_then_write):
+            self.service.flush()
+        # Mid-flush, and once more for a read that started before it finished
+        seen.append(self.queue.apply_pending(stale))
+        for records in seen:
+            self.assertEqual([(row['id'], row['name']) for row in records], expected)
+
+
+class SheetMirrorTests(TransactionTestCase):
+    """
+    Reads are served from the database mirror while the snapshot is stale.
+
+    The mirror writes on its own thread (another connection), so this can't
+    be wrapped in a test transaction.
+    """
+
+    def setUp(self):
+        with override_settings(GOOGLE_SHEETS_MIRROR=True):
+            self.service = make_service()
+        self.fake = self.service._api
+        self.mirror = self.service._mirror
+        # Let the writer finish before the tables are flushed
+        self.addCleanup(self.mirror.wait, 5)
+
+    def mirrored_ids(self):
+        self.assertTrue(self.mirror.wait(timeout=5))
+        rows = SheetRow.objects.filter(sheet=self.service.name).order_by('position')
+        return [row.row_id for row in rows]
+
+    def test_stale_reads_are_served_from_the_mirror(self):
+        self.service.get_all_rows()
+        self.assertEqual(self.mirrored_ids(), ['1', '2', '3'])
+        self.assertTrue(self.mirror.is_fresh())
+
+        self.service.invalidate_cache()
+        self.fake.reset_stats()
+        rows = self.service.get_all_rows(user_email='u@example.com')
+        self.assertEqual([row['id'] for row in rows], [1, 3])
+        self.assertEqual(self.service.get_row(2)['name'], 'second')
+        self.assertIsNone(self.service.get_row(2, user_email='u@example.com'))
+        self.assertEqual(self.fake.stats()['total_calls'], 0)
+
+    def test_writes_reach_the_mirror(self):
+        self.service.get_all_rows()
+        self.assertEqual(self.mirrored_ids(), ['1', '2', '3'])
+        self.service.create_row({'name': 'new'}, user_email='v@example.com')
+        self.service.update_row(2, {'name': 'renamed'})
+        self.assertTrue(self.service.delete_row(1))
+        self.assertEqual(self.mirrored_ids(), ['2', '3', '4'])
+
+        self.service.invalidate_cache()
+        self.assertIsNone(self.service.get_row(1))
+        self.assertEqual(self.service.get_row(2)['name'], 'renamed')
+        rows = self.service.get_all_rows(user_email='v@example.com')
+        self.assertEqual([row['name'] for row in rows], ['renamed', 'new'])
+
+    def test_stale_mirror_is_not_used(self):
+        self.service.get_all_rows()
+        self.mirror.wait()
+        self.mirror.max_staleness = 0
+        self.service.invalidate_cache()
+        self.fake.rows[1][1] = 'edited elsewhere'
+        self.assertEqual(self.service.get_row(1)['name'], 'edited elsewhere')
+
+
+class TokenStoreTests(TestCase):
+    """token.json is refreshed once per expiry across threads and processes."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.token_file = os.path.join(directory.name, 'token.json')
+        with open(self.token_file, 'w') as f:
+            json.dump({
+                'token': 'expired', 'refresh_token': 'refresh', 'client_id': 'id',
+                'client_secret': 'secret', 'expiry': '2000-01-01T00:00:00Z',
+            }, f)
+        self.issued = 0
+
+        def refresh(credentials, request):
+            time.sleep(0.05)  # Give other threads time to pile up
+            self.issued += 1
+            credentials.token = f'token-{self.issued}'
+            credentials.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+        patcher = mock.patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def store(self):
+        return TokenStore(self.token_file, 'client_secrets.json', GoogleSheetsService.SCOPES)
+
+    def test_threads_share_one_refresh(self):
+        store = self.store()
+        credentials = store.credentials()
+        self.assertFalse(credentials.valid)
+        barrier = threading.Barrier(5)
+
+        def refresh():
+            barrier.wait()
+            credentials.refresh(None)
+
+        threads = [threading.Thread(target=refresh) for _ in range(5)]
+        # Hold the lock file like another process would, so every thread queues up
+        with file_lock(store.token_file + '.lock'):
+            for thread in threads:
+                thread.start()
+            time.sleep(0.1)
+            self.assertEqual(self.issued, 0)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((self.issued, store.refreshes), (1, 1))
+        self.assertEqual(credentials.token, 'token-1')
+
+    def test_other_process_picks_up_the_saved_token(self):
+        first, second = self.store(), self.store()
+        stale = second.credentials()
+        first.credentials().refresh(None)
+        stale.refresh(None)
+        self.assertEqual((self.issued, second.refreshes), (1, 0))
+        self.assertEqual(stale.token, 'token-1')
+        self.assertTrue(stale.valid)
+        with open(self.token_file) as f:
+            self.assertEqual(json.load(f)['token'], 'token-1')
+
+
+class RateLimitTests(TestCase):
+    """Injected errors and quotas reach the rate limiter like Google's."""
+
+    def test_injected_429_is_retried(self):
+        service = make_service()
+        service._api.fail_next(2)
+        self.assertEqual(len(service.get_all_rows()), 3)
+        self.assertEqual(service.rate_limit_stats()['retries'], 2)
+
+    def test_exhausted_quota_raises_sheets_unavailable(self):
+        service = make_service()
+        service.get_all_rows()
+        service._api.reads_per_minute = 0
+        service.invalidate_cache()
+        with self.assertRaises(SheetsUnavailable):
+            service.get_all_rows()
+
+    def test_latency_is_injected(self):
+        service = make_service(latency=0.05)
+        started = time.monotonic()
+        service.get_all_rows()
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_zero_quota_is_rejected(self):
+        with self.assertRaises(ValueError):
+            SheetsRateLimiter(read_per_minute=0)
+
+    def test_failed_wakeup_does_not_strand_other_waiters(self):
+        bucket = TokenBucket(per_minute=6000, burst=1)
+        bucket.acquire()
+        woken = threading.Event()
+
+        def broken():
+            raise RuntimeError('event loop is closed')
+
+        with bucket._condition:
+            bucket._enqueue(0, broken)
+            bucket._enqueue(1, woken.set)
+        with self.assertLogs('myapi.rate_limit', 'ERROR'):
+            self.assertTrue(woken.wait(2))
+        bucket.acquire()  # Still served after the failure
+
+    def test_cancelled_async_waiter_leaves_the_queue(self):
+        bucket = TokenBucket(per_minute=60, burst=1)
+        bucket.acquire()
+
+        async def run():
+            task = asyncio.create_task(bucket.acquire_async())
+            await asyncio.sleep(0.01)
+            self.assertEqual(bucket.stats()['waiting'], 1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(bucket.stats()['waiting'], 0)
+
+    def test_cancelled_async_waiter_returns_its_token(self):
+        bucket = TokenBucket(per_minute=6000, burst=1)
+        bucket.acquire()
+
+        async def run():
+            task = asyncio.create_task(bucket.acquire_async())
+            await asyncio.sleep(0)
+            time.sleep(0.05)  # Granted, but the loop can't resume the task yet
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(bucket.stats()['granted'], 1)
+        bucket.acquire()
+        self.assertEqual(bucket.stats()['queued'], 1)  # The token was free again
+
+
+class CoalescingTests(TestCase):
+    """Concurrent cache misses share one sheet read."""
+
+    def setUp(self):
+        self.service = make_service(latency=0.05)
+        self.fake = self.service._api
+
+    def read_concurrently(self, count, read):
+        """Run read() in count threads started together; return the results."""
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def run(idx):
+            barrier.wait()
+            try:
+                results[idx] = read()
+            except Exception as e:
+                results[idx] = e
+
+        threads = [threading.Thread(target=run, args=(idx,)) for idx in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_threads_share_one_fetch(self):
+        results = self.read_concurrently(20, self.service.get_all_rows)
+        self.assertEqual(self.fake.stats()['calls']['values.get'], 1)
+        self.assertTrue(all(len(rows) == 3 for rows in results))
+        self.assertGreater(self.service.cache_stats()['refills_shared'], 0)
+
+    def test_concurrent_tasks_share_one_fetch(self):
+        async_service = AsyncGoogleSheetsService(self.service)
+
+        async def run():
+            views = await asyncio.gather(*[async_service.get_ordered_view() for _ in range(20)])
+            await async_service.aclose()
+            return views
+
+        views = asyncio.run(run())
+        self.assertEqual(self.fake.stats()['calls']['values.get'], 1)
+        self.assertTrue(all(len(view.rows) == 3 for view in views))
+
+    def test_failure_is_shared(self):
+        self.service._limiter.max_retries = 0
+        self.fake.fail_next(1, status=503)
+        results = self.read_concurrently(10, self.service.get_all_rows)
+        self.assertTrue(all(isinstance(result, SheetsUnavailable) for result in results))
+        self.assertEqual(self.fake.stats()['rejected'], {503: 1})
+        self.assertEqual(len(self.service.get_all_rows()), 3)
+
+
+class AsyncSheetsServiceTests(TransactionTestCase):
+    """
+    AsyncGoogleSheetsService reaches the fake through its httpx transport.
+
+    Database work runs on sync_to_async's thread (another connection), so
+    this can't be wrapped in a test transaction.
+    """
+
+    def test_crud_round_trip(self):
+        service = make_service()
+        async_service = AsyncGoogleSheetsService(service)
+
+        async def run():
+            created = await async_service.create_row({'name': 'new'}, 'v@example.com')
+            await async_service.update_row(2, {'name': 'renamed'})
+            deleted = await async_service.delete_row(1)
+            view = await async_service.get_ordered_view(user_email='v@example.com')
+            await async_service.aclose()
+            return created, deleted, view.rows
+
+        created, deleted, rows = asyncio.run(run())
+        self.assertEqual(created['id'], 4)
+        self.assertTrue(deleted)
+        self.assertEqual([row['name'] for row in rows], ['renamed', 'new'])
+        self.assertEqual([row[0] for row in service._api.rows[1:]], [2, 3, 4])
+
+
+class BackendContractTests(TestCase):
+    """Every SHEET_ITEMS_BACKEND honours the StorageBackend contract."""
+
+    NAMES = ('sheets', 'database', 'memory', 'myapi.backends.MemoryBackend')
+
+    def get_backend(self, name):
+        """Build a fresh backend through get_backend, as the views do."""
+        with override_settings(SHEET_ITEMS_BACKEND=name), \
+                mock.patch.object(backends, '_backend', None), \
+                mock.patch.object(google_sheets, 'sheets_service', make_service(rows=[HEADER])):
+            return backends.get_backend()
+
+    def test_contract(self):
+        for name in self.NAMES:
+            with self.subTest(backend=name):
+                self.check_contract(self.get_backend(name))
+
+    def check_contract(self, backend):
+        mine = backend.create_row({'name': 'a', 'description': 'x'}, user_email='u@example.com')
+        theirs = backend.create_row({'name': 'b'}, user_email='v@example.com')
+        self.assertEqual([row['name'] for row in backend.get_all_rows()], ['a', 'b'])
+        self.assertEqual(
+            [row['id'] for row in backend.get_all_rows(user_email='u@example.com')], [mine['id']]
+        )
+        self.assertEqual(backend.get_row(mine['id'])['description'], 'x')
+
+        # Other owners' rows are invisible to a regular user
+        self.assertIsNone(backend.get_row(theirs['id'], user_email='u@example.com'))
+        self.assertIsNone(backend.update_row(theirs['id'], {'name': 'x'}, user_email='u@example.com'))
+        self.assertFalse(backend.delete_row(theirs['id'], user_email='u@example.com'))
+
+        etag = backend.row_etag(backend.get_row(mine['id']))
+        updated = backend.update_row(mine['id'], {'name': 'a2'}, if_match=[etag])
+        self.assertEqual((updated['name'], updated['email']), ('a2', 'u@example.com'))
+        with self.assertRaises(PreconditionFailed):
+            backend.update_row(mine['id'], {'name': 'a3'}, if_match=[etag])
+        with self.assertRaises(PreconditionFailed):
+            backend.delete_row(mine['id'], if_match=[etag])
+        self.assertTrue(backend.delete_row(mine['id'], if_match=[backend.row_etag(updated)]))
+        self.assertIsNone(backend.get_row(mine['id']))
+        self.assertEqual([row['id'] for row in backend.get_all_rows()], [theirs['id']])
+
+
+class ShardingTests(TestCase):
+    """ShardedSheetsBackend routes rows to shards and merges listings."""
+
+    def fake_ids(self, backend):
+        """Get the row ids held by each shard's fake sheet."""
+        return {
+            name: sorted(row[0] for row in service._api.rows[1:])
+            for name, service in backend.services.items()
+        }
+
+    def test_adding_a_shard_only_moves_rows_to_it(self):
+        before = ShardMap([{'name': 'a'}, {'name': 'b'}, {'name': 'c'}])
+        after = ShardMap([{'name': 'a'}, {'name': 'b'}, {'name': 'c'}, {'name': 'd'}])
+        moved = [i for i in range(1000) if before.shard_for_key(i) != after.shard_for_key(i)]
+        self.assertTrue(all(after.shard_for_key(i) == 'd' for i in moved))
+        self.assertTrue(150 < len(moved) < 350)
+        self.assertEqual(before.shard_for_key('7'), before.shard_for_key(7))
+
+    def test_rows_are_routed_and_listings_merged(self):
+        backend = make_sharded(['a', 'b', 'c'])
+        created = backend.create_rows([{'name': str(i)} for i in range(30)], 'u@example.com')
+        self.assertEqual([row['id'] for row in created], list(range(1, 31)))
+        for name, ids in self.fake_ids(backend).items():
+            self.assertTrue(ids)
+            self.assertTrue(all(backend.map.shard_for_key(i) == name for i in ids))
+
+        self.assertEqual([row['id'] for row in backend.get_all_rows()], list(range(1, 31)))
+        self.assertEqual(backend.update_row(7, {'name': 'seven'})['name'], 'seven')
+        self.assertEqual(backend.delete_rows([3, 99, 4]), [True, False, True])
+        self.assertEqual(backend.update_rows([{'id': 5, 'name': 'x'}, {'id': 99}])[1], None)
+        view = backend.get_ordered_view(ordering=(('name', True),))
+        self.assertEqual(view.rows[0]['name'], 'x')
+        self.assertEqual(len(view), 28)
+        self.assertEqual(backend.get_row(7)['name'], 'seven')
+
+    def test_users_read_one_shard_when_sharded_by_email(self):
+        backend = make_sharded(['a', 'b', 'c'], key='email')
+        for user in range(6):
+            backend.create_rows([{'name': 'item'}] * 3, f'user{user}@example.com')
+        backend.invalidate_cache()
+        for service in backend.services.values():
+            service._api.reset_stats()
+
+        rows = backend.get_all_rows(user_email='user1@example.com')
+        self.assertEqual(len(rows), 3)
+        read = [
+            name for name, service in backend.services.items()
+            if service._api.stats()['total_calls']
+        ]
+        self.assertEqual(read, [backend.map.shard_for_key('user1@example.com')])
+
+    def test_reshard_moves_rows_while_both_placements_serve(self):
+        old = make_sharded(['a', 'b'])
+        old.create_rows([{'name': str(i)} for i in range(40)])
+        fakes = {name: service._api for name, service in old.services.items()}
+        new = make_sharded(['a', 'b', 'c'], previous=['a', 'b'], fakes=fakes)
+
+        self.assertTrue(all(new.get_row(i) is not None for i in range(1, 41)))
+        subscription, _ = new.change_feed().subscribe()
+        with mock.patch.object(backends, '_backend', new):
+            call_command('reshard_sheet', settle=0, batch_size=5, stdout=open(os.devnull, 'w'))
+
+        placed = self.fake_ids(new)
+        self.assertEqual(sorted(sum(placed.values(), [])), list(range(1, 41)))
+        for name, ids in placed.items():
+            self.assertTrue(all(new.map.shard_for_key(i) == name for i in ids))
+        self.assertTrue(placed['c'])
+        events = subscription.drain()
+        subscription.close()
+        self.assertFalse([event for event in events if event['type'] != 'update'])
+
+
+class RequestMetricsTests(TestCase):
+    """Per-request spans reach Server-Timing and /metrics."""
+
+    def test_spans_are_reported_in_server_timing(self):
+        def view(request):
+            with span('filter'):
+                pass
+            for _ in range(2):
+                with sheets_call('get_all_records', 'read'):
+                    pass
+            return HttpResponse('ok')
+
+        with self.assertLogs('myapi.requests', 'INFO') as logs:
+            response = RequestMetricsMiddleware(view)(RequestFactory().get('/api/sheet-items/'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['path'], entry['status']), ('/api/sheet-items/', 200))
+        header = response['Server-Timing']
+        self.assertRegex(header, r'^filter;dur=[\d.]+, ')
+        self.assertIn('desc="2 calls"', header.split(', ')[1])
+        self.assertTrue(header.split(', ')[-1].startswith('total;dur='))
+
+    @override_settings(METRICS_INCLUDE_BACKEND_STATS=False)
+    def test_sheets_calls_are_counted_by_outcome(self):
+        error = Exception('quota')
+        error.response = type('Response', (), {'status_code': 429})()
+        with self.assertRaises(Exception):
+            with sheets_call('metrics_test', 'write'):
+                raise error
+        self.assertIn(
+            'sheets_api_calls_total{operation="metrics_test",kind="write",outcome="429"} 1',
+            render_metrics()
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'], METRICS_TOKEN='s3cret')
+    def test_metrics_page_needs_an_allowed_address_or_the_token(self):
+        def scrape(address, **headers):
+            return metrics_view(RequestFactory().get('/metrics', REMOTE_ADDR=address, **headers))
+
+        self.assertEqual(scrape('10.0.0.1').status_code, 200)
+        self.assertEqual(scrape('10.0.0.2').status_code, 403)
+        self.assertEqual(scrape('10.0.0.2', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = scrape('10.0.0.2', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'sheet_items_', response.content)  # Backend gauges are opt-in
+
+
+class BulkViewTests(TestCase):
+    """Per-item results of the bulk endpoint."""
+
+    def setUp(self):
+        self.service = make_service()
+        patcher = mock.patch.object(backends, '_backend', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, data):
+        request = getattr(APIRequestFactory(), method)('/api/sheet-items/bulk/', data, format='json')
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        response = SheetItemBulkAPIView.as_view()(request)
+        response.render()
+        return response
+
+    def test_invalid_ids_are_rejected_per_item(self):
+        response = self.request('delete', [{'id': 1}, [3], 3, None, 2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], [400, 400, 204, 400, 404]
+        )
+        self.assertEqual(response.data['results'][0], {'id': {'id': 1}, 'status': 400, 'error': 'Invalid ID'})
+        self.assertIsNotNone(self.service.get_row(1))
+        self.assertIsNone(self.service.get_row(3))
+        self.assertEqual(self.request('delete', {'ids': [1]}).status_code, 400)
+
+
+class ListQueryTests(TestCase):
+    """Ordering, field projection and limit/offset or cursor pagination of the list view."""
+
+    def setUp(self):
+        self.service = make_service(rows=[HEADER] + [
+            [i, f'item {i}', '', 'u@example.com'] for i in range(1, 6)
+        ] + [[6, 'not yours', '', 'v@example.com']])
+        patcher = mock.patch.object(backends, '_backend', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        response = SheetItemListCreateAPIView.as_view()(request)
+        response.render()
+        return response
+
+    def follow(self, url):
+        """Fetch every page from url on, returning the ids of each page."""
+        pages = []
+        while url:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_ordering_and_fields(self):
+        response = self.get('/api/sheet-items/?ordering=-id&fields=id,name')
+        self.assertEqual(response.data[:2], [{'id': 5, 'name': 'item 5'}, {'id': 4, 'name': 'item 4'}])
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(self.get('/api/sheet-items/?ordering=color').status_code, 400)
+
+    def test_limit_offset_links(self):
+        response = self.get('/api/sheet-items/?limit=2&offset=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([row['id'] for row in response.data['results']], [3, 4])
+        self.assertEqual(response.data['next'], 'http://testserver/api/sheet-items/?limit=2&offset=4')
+        self.assertEqual(response.data['previous'], 'http://testserver/api/sheet-items/?limit=2')
+        self.assertEqual(self.follow('/api/sheet-items/?limit=2'), [[1, 2], [3, 4], [5]])
+        self.assertEqual(self.get('/api/sheet-items/?limit=0').status_code, 400)
+
+    def test_cursor_pages(self):
+        self.assertEqual(self.follow('/api/sheet-items/?cursor=&limit=2&ordering=-id'), [[5, 4], [3, 2], [1]])
+        first = self.get('/api/sheet-items/?cursor=&limit=2')
+        self.assertIsNone(first.data['previous'])
+        # Rows removed before the cursor don't shift the next page
+        self.service.delete_row(1)
+        self.assertEqual(self.follow(first.data['next']), [[3, 4], [5]])
+
+    def test_cursor_is_tied_to_its_ordering(self):
+        next_url = self.get('/api/sheet-items/?cursor=&limit=2').data['next']
+        response = self.get(next_url + '&ordering=-id')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Invalid cursor'})
+        self.assertEqual(self.get('/api/sheet-items/?cursor=garbage').status_code, 400)
+
+
+class ConditionalRequestTests(TestCase):
+    """ETag/Last-Modified revalidation, and If-Match on detail writes."""
+
+    def setUp(self):
+        self.service = make_service()
+        patcher = mock.patch.object(backends, '_backend', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, row_id=None, data=None, **headers):
+        url = '/api/sheet-items/' + (f'{row_id}/' if row_id else '')
+        request = getattr(APIRequestFactory(), method)(url, data, format='json', **headers)
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        if row_id is None:
+            response = SheetItemListCreateAPIView.as_view()(request)
+        else:
+            response = SheetItemDetailAPIView.as_view()(request, row_id=row_id)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_list_revalidation(self):
+        response = self.request('get')
+        etag = response['ETag']
+        self.assertEqual(self.request('get', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.request('get', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        # Other query parameters and other users' writes change the tag
+        self.assertNotEqual(self.request('get', data={'ordering': '-id'})['ETag'], etag)
+        self.service.update_row(1, {'name': 'renamed'})
+        self.assertEqual(self.request('get', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_revalidation(self):
+        response = self.request('get', 1)
+        self.assertEqual(response.data['name'], 'first')
+        self.assertIn('no-cache', response['Cache-Control'])
+        not_modified = self.request('get', 1, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        # Writes to other rows leave this row's tag alone
+        self.service.update_row(3, {'name': 'renamed'})
+        self.assertEqual(self.request('get', 1, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.service.update_row(1, {'name': 'renamed'})
+        self.assertEqual(self.request('get', 1, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.request('get', 2).status_code, 404)
+
+    def test_writes_with_a_stale_if_match_fail(self):
+        etag = self.request('get', 1)['ETag']
+        self.service.update_row(1, {'name': 'changed elsewhere'})
+        response = self.request('put', 1, {'name': 'mine'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.request('delete', 1, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.service.get_row(1)['name'], 'changed elsewhere')
+
+        current = self.request('get', 1)['ETag']
+        response = self.request('put', 1, {'name': 'mine'}, HTTP_IF_MATCH=current)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], current)
+        self.assertEqual(self.request('delete', 1, HTTP_IF_MATCH=response['ETag']).status_code, 204)
+        self.assertIsNone(self.service.get_row(1))
+
+
+class StreamingListTests(TestCase):
+    """?stream=json|ndjson sends the list rows incrementally."""
+
+    def setUp(self):
+        patcher = mock.patch.object(backends, '_backend', make_service())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, query='', **headers):
+        request = APIRequestFactory().get('/api/sheet-items/' + query, **headers)
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        response = SheetItemListCreateAPIView.as_view()(request)
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        if hasattr(response, 'render'):
+            response.render()
+        return response, response.content
+
+    def test_json_stream_matches_buffered_response(self):
+        buffered, expected = self.get('?ordering=-id')
+        streamed, body = self.get('?ordering=-id&stream=json')
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(body), json.loads(expected))
+        self.assertEqual([row['id'] for row in json.loads(body)], [3, 1])
+        self.assertNotEqual(streamed['ETag'], buffered['ETag'])
+
+    def test_ndjson_is_chosen_by_accept_header(self):
+        response, body = self.get('?fields=id,name', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(body, b'{"id":1,"name":"first"}\n{"id":3,"name":"third"}\n')
+        self.assertIn('Accept', response['Vary'])
+        revalidated, _ = self.get(
+            '?fields=id,name', HTTP_ACCEPT='application/x-ndjson',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(revalidated.status_code, 304)
+        buffered, _ = self.get('?fields=id,name', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(buffered.status_code, 200)
+
+    def test_invalid_stream_requests_are_rejected(self):
+        self.assertEqual(self.get('?stream=xml')[0].status_code, 400)
+        response, body = self.get('?limit=1', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(body), {'error': 'stream cannot be combined with limit, offset or cursor'})
+
+    def test_body_is_encoded_in_chunks(self):
+        rows = ({'id': i, 'name': 'n\u00e9'} for i in range(50))
+        chunks = list(iter_body(rows, ('id',), 'json', chunk_size=32))
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual(json.loads(b''.join(chunks)), [{'id': i} for i in range(50)])
+
+        async def collect():
+            return [chunk async for chunk in aiter_body([{'name': 'n\u00e9'}], None, 'ndjson')]
+        self.assertEqual(asyncio.run(collect()), ['{"name":"n\u00e9"}\n'.encode()])
+
+
+class SearchTests(TestCase):
+    """Name/description filters and ?q= word search."""
+
+    def setUp(self):
+        self.service = make_service(rows=[
+            HEADER,
+            [1, 'Blue widget', 'Small and round', 'u@example.com'],
+            [2, 'Blue gadget', 'Large', 'u@example.com'],
+            [3, 'Red widget', 'Round and large', 'u@example.com'],
+            [4, 'Blue widget', 'Not yours', 'v@example.com'],
+        ])
+        patcher = mock.patch.object(backends, '_backend', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/sheet-items/', params)
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        response = SheetItemListCreateAPIView.as_view()(request)
+        response.render()
+        return response
+
+    def ids(self, **params):
+        response = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_exact_match(self):
+        self.assertEqual(self.ids(name='Blue widget'), [1])
+        self.assertEqual(self.ids(name='blue widget'), [])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.ids(name__startswith='blue'), [1, 2])
+        self.assertEqual(self.ids(name__startswith='blue', description='Large'), [2])
+
+    def test_substring_match(self):
+        self.assertEqual(self.ids(description__contains='ROUND'), [1, 3])
+        self.assertEqual(self.ids(name__contains='adg'), [2])
+
+    def test_every_word_of_q_must_match(self):
+        self.assertEqual(self.ids(q='widget round'), [1, 3])
+        self.assertEqual(self.ids(q='Blue, large!'), [2])
+        self.assertEqual(self.ids(q='blue red'), [])
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.ids(q='widget'), [1, 3])
+        created = self.service.create_row({'name': 'Green widget'}, user_email='u@example.com')
+        self.service.update_row(1, {'name': 'Blue gizmo'})
+        self.service.delete_row(3)
+        self.assertEqual(self.ids(q='widget'), [created['id']])
+        self.assertEqual(self.ids(name__startswith='blue g'), [1, 2])
+        self.assertEqual(
+            [row['id'] for row in self.service.search_rows(parse_filters({'q': 'widget'}))],
+            [4, created['id']]
+        )
+
+    def test_unknown_lookup_is_rejected(self):
+        response = self.get(name__endswith='widget')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {'error': 'Unknown filter name__endswith; '
+                      'use name, name__startswith or name__contains'}
+        )
+
+
+class ChangeFeedTests(TestCase):
+    """Row events fanned out to subscribers, and the SSE stream."""
+
+    def setUp(self):
+        self.service = make_service()
+        self.service.get_all_rows()
+        self.feed = self.service.change_feed()
+
+    def changes(self, subscription):
+        return [(event['type'], event['id']) for event in subscription.drain()]
+
+    def test_subscribers_see_their_own_rows(self):
+        mine, resumed = self.feed.subscribe(user_email='u@example.com')
+        everything, _ = self.feed.subscribe()
+        self.assertTrue(resumed)
+        self.service.create_row({'name': 'new'}, user_email='u@example.com')
+        self.service.update_row(2, {'name': 'renamed'})
+        self.service.delete_row(1)
+        self.service._api.rows[2][1] = 'edited elsewhere'  # Row 3, outside the service
+        self.service.refresh()
+        self.assertEqual(self.changes(mine), [('create', 4), ('delete', 1), ('update', 3)])
+        self.assertEqual(
+            self.changes(everything),
+            [('create', 4), ('update', 2), ('delete', 1), ('update', 3)]
+        )
+        for subscription in (mine, everything):
+            subscription.close()
+        self.assertEqual(self.feed.stats()['subscribers'], 0)
+
+    def test_resume_after_last_event_id(self):
+        subscription, _ = self.feed.subscribe()
+        self.service.update_row(1, {'name': 'a'})
+        last_seen = self.feed.event_id(subscription.drain()[-1])
+        subscription.close()
+        self.service.update_row(2, {'name': 'b'})
+        self.service.delete_row(3)
+
+        resumed, ok = self.feed.subscribe(last_event_id=last_seen)
+        self.assertTrue(ok)
+        self.assertEqual(self.changes(resumed), [('update', 2), ('delete', 3)])
+        _, ok = self.feed.subscribe(last_event_id='other-1')
+        self.assertFalse(ok)
+
+    def test_missed_events_past_the_history_need_a_reset(self):
+        feed = ChangeFeed(history=2)
+        feed.on_load([])
+        subscription, _ = feed.subscribe()
+        for row_id in (1, 2, 3, 4):
+            feed.on_add({'id': row_id, 'email': 'u@example.com'})
+        last_seen = feed.event_id(subscription.drain()[0])
+        _, ok = feed.subscribe(last_event_id=last_seen)
+        self.assertFalse(ok)
+
+    def test_overflow_turns_into_a_reset(self):
+        subscription, _ = self.feed.subscribe()
+        subscription.max_events = 2
+        for row_id in (1, 2, 3):
+            self.service.update_row(row_id, {'name': 'x'})
+        self.assertIsNone(subscription.drain())
+        self.assertEqual(sse_messages(self.feed, None), ['event: reset\ndata: {}\n\n'])
+        self.service.delete_row(1)
+        self.assertEqual(self.changes(subscription), [('delete', 1)])
+
+    def test_poller_stops_with_the_last_subscriber(self):
+        polled = threading.Semaphore(0)
+        feed = ChangeFeed(poll=polled.release, poll_interval=0.01)
+        subscription, _ = feed.subscribe()
+        self.assertTrue(polled.acquire(timeout=2))
+        poller = feed._poller
+        subscription.close()
+        poller.join(timeout=2)
+        self.assertFalse(poller.is_alive())
+        self.assertIsNone(feed._poller)
+
+        subscription, _ = feed.subscribe()
+        self.assertTrue(polled.acquire(timeout=2))
+        subscription.close()
+
+    def test_event_stream(self):
+        backend = backends.MemoryBackend(rows=[dict(zip(HEADER, row)) for row in ROWS[1:]])
+        backend.get_all_rows()
+        user = User(username='u', email='u@example.com')
+        authenticate = mock.patch.object(
+            SheetItemEventsView.authenticator, 'authenticate', return_value=(user, None)
+        )
+        with override_settings(SHEET_ITEMS_BACKEND='memory'), \
+                mock.patch.object(backends, '_backend', backend), authenticate:
+            feed = backend.change_feed()
+            request = RequestFactory().get('/api/sheet-items/events/')
+            response = asyncio.run(SheetItemEventsView.as_view()(request))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        backend.update_row(1, {'name': 'renamed'})
+        backend.update_row(2, {'name': 'not mine'})
+        backend.delete_row(3)
+        messages = iter(response.streaming_content)
+        self.assertEqual(next(messages), b'retry: 3000\n\n')
+        self.assertEqual(next(messages), (
+            f'id: {feed.epoch}-1\nevent: update\n'
+            'data: {"id":1,"row":{"id":1,"name":"renamed","description":"one","email":"u@example.com"}}\n\n'
+        ).encode())
+        self.assertEqual(
+            next(messages), f'id: {feed.epoch}-3\nevent: delete\ndata: {{"id":3,"row":null}}\n\n'.encode()
+        )
+        response.close()
+        self.assertEqual(feed.stats()['subscribers'], 0)
+
+
+class TransferTests(TestCase):
+    """CSV/NDJSON imports write in chunks; exports read in chunks."""
+
+    def test_import_updates_known_ids_and_creates_the_rest(self):
+        backend = backends.MemoryBackend(rows=[dict(zip(HEADER, row)) for row in ROWS[1:]])
+        lines = [
+            'id,name,description,email\n', '2,renamed,,\n', ',new,"a, b",w@example.com\n',
+            '99,unknown id,,\n', '1,,missing name,\n',
+        ]
+        importer = SheetImport(backend, default_email='d@example.com', chunk_size=2)
+        with mock.patch.object(backend, 'create_rows', wraps=backend.create_rows) as create_rows:
+            stats = importer.run(read_records(lines, 'csv'))
+        self.assertEqual(create_rows.call_count, 2)  # One append per chunk
+        self.assertEqual(
+            stats, {'processed': 4, 'created': 2, 'updated': 1, 'failed': 1,
+                    'errors': [{'line': 5, 'error': 'Name is required'}]}
+        )
+        self.assertEqual(backend.get_row(2)['name'], 'renamed')
+        self.assertEqual(backend.get_row(2)['email'], 'v@example.com')
+        self.assertEqual(
+            [(row['name'], row['description'], row['email']) for row in backend.get_all_rows()[3:]],
+            [('new', 'a, b', 'w@example.com'), ('unknown id', '', 'd@example.com')]
+        )
+
+    def test_interrupted_import_command_resumes_from_its_checkpoint(self):
+        backend = backends.MemoryBackend()
+        create_rows = backend.create_rows
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'items.ndjson')
+            with open(path, 'w') as f:
+                f.writelines(json.dumps({'name': f'item {i}'}) + '\n' for i in range(5))
+                f.write('not json\n')
+            calls = []
+
+            def flaky(items, user_email=None):
+                calls.append(len(items))
+                if len(calls) == 2:
+                    raise RuntimeError('interrupted')
+                return create_rows(items, user_email=user_email)
+
+            with mock.patch.object(backends, '_backend', backend), \
+                    mock.patch.object(backend, 'create_rows', flaky):
+                with self.assertRaises(RuntimeError):
+                    call_command('import_sheet_items', path, '--chunk-size', '2', stdout=open(os.devnull, 'w'))
+                self.assertTrue(os.path.exists(path + '.checkpoint'))
+                call_command(
+                    'import_sheet_items', path, '--chunk-size', '2',
+                    stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w')
+                )
+            self.assertFalse(os.path.exists(path + '.checkpoint'))
+        self.assertEqual(calls, [2, 2, 2, 1])
+        self.assertEqual([row['name'] for row in backend.get_all_rows()], [f'item {i}' for i in range(5)])
+
+    def test_sheet_rows_are_read_range_by_range(self):
+        service = make_service()
+        service._api.reset_stats()
+        rows = list(service.iter_rows(chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0], {'id': 1, 'name': 'first', 'description': 'one', 'email': 'u@example.com'})
+        self.assertEqual(service._api.stats()['calls']['values.get'], 3)
+        self.assertFalse(service._cache.is_fresh())
+        self.assertEqual([row['id'] for row in service.iter_rows('u@example.com', 1)], [1, 3])
+
+    def test_import_endpoint_streams_the_request_body(self):
+        service = make_service()
+        request = APIRequestFactory().post(
+            '/api/sheet-items/import/?skip=1', '{"name":"skipped"}\n{"name":"kept","email":"x@example.com"}\n',
+            content_type='application/x-ndjson'
+        )
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        with mock.patch.object(backends, '_backend', service):
+            response = SheetItemImportAPIView.as_view()(request)
+        self.assertEqual(response.data['processed'], 2)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(service.get_all_rows()[-1]['name'], 'kept')
+        self.assertEqual(service.get_all_rows()[-1]['email'], 'u@example.com')
+
+    def test_import_endpoint_accepts_content_type_parameters(self):
+        service = make_service()
+        body = 'name,description\ncaf\u00e9,latin-1\n'
+        for content_type, data in (
+            ('text/csv; charset=utf-8', body.encode()),
+            ('Text/CSV; charset=ISO-8859-1', body.encode('latin-1')),
+        ):
+            request = APIRequestFactory().post('/api/sheet-items/import/', data, content_type=content_type)
+            force_authenticate(request, user=User(username='u', email='u@example.com'))
+            with mock.patch.object(backends, '_backend', service):
+                response = SheetItemImportAPIView.as_view()(request)
+            self.assertEqual(response.status_code, 200, content_type)
+            self.assertEqual(service.get_all_rows()[-1]['name'], 'caf\u00e9')
+        request = APIRequestFactory().post(
+            '/api/sheet-items/import/', body, content_type='text/csv; charset=bogus'
+        )
+        force_authenticate(request, user=User(username='u', email='u@example.com'))
+        self.assertEqual(SheetItemImportAPIView.as_view()(request).status_code, 415)
@@ -1,13 +1,32 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ItemViewSet
-from .sheets_views import SheetItemListCreateAPIView, SheetItemDetailAPIView
+from .sheets_views import (
+    SheetItemListCreateAPIView, SheetItemDetailAPIView, SheetItemBulkAPIView,
+    SheetItemExportAPIView, SheetItemImportAPIView
+)
+from .async_sheets_views import (
+    AsyncSheetItemListCreateView, AsyncSheetItemDetailView, SheetItemEventsView
+)
 
 router = DefaultRouter()
 router.register(r'items', ItemViewSet, basename='item')
 
+if getattr(settings, 'GOOGLE_SHEETS_ASYNC_VIEWS', False):
+    # Serve list/detail with the asyncio Sheets client (run under ASGI)
+    sheet_item_list_view = AsyncSheetItemListCreateView.as_view()
+    sheet_item_detail_view = AsyncSheetItemDetailView.as_view()
+else:
+    sheet_item_list_view = SheetItemListCreateAPIView.as_view()
+    sheet_item_detail_view = SheetItemDetailAPIView.as_view()
+
 urlpatterns = [
     path('', include(router.urls)),
-    path('sheet-items/', SheetItemListCreateAPIView.as_view(), name='sheet-item-list'),
-    path('sheet-items/<int:row_id>/', SheetItemDetailAPIView.as_view(), name='sheet-item-detail'),
+    path('sheet-items/', sheet_item_list_view, name='sheet-item-list'),
+    path('sheet-items/bulk/', SheetItemBulkAPIView.as_view(), name='sheet-item-bulk'),
+    path('sheet-items/export/', SheetItemExportAPIView.as_view(), name='sheet-item-export'),
+    path('sheet-items/import/', SheetItemImportAPIView.as_view(), name='sheet-item-import'),
+    path('sheet-items/events/', SheetItemEventsView.as_view(), name='sheet-item-events'),
+    path('sheet-items/<int:row_id>/', sheet_item_detail_view, name='sheet-item-detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""
+Write-Behind Queue Module
+
+This module buffers sheet mutations in a durable local journal and flushes
+them to Google Sheets in coalesced batches from a background thread, so
+bursts of writes cost one batch request per interval instead of one
+request per mutation.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+
+from .file_lock import file_lock
+from .rate_limit import BATCH, set_priority
+from .sheet_cache import normalize_id
+
+logger = logging.getLogger(__name__)
+
+
+def coalesce(entries):
+    """
+    Merge journal entries so each row id ends up with a single mutation.
+
+    Repeated updates keep the latest row, an update after a create stays a
+    create, and anything followed by a delete becomes a delete.
+
+    Args:
+        entries: Journal entries ({'op': ..., 'row': ...}) in write order.
+
+    Returns:
+        list: Coalesced (op, row) pairs in order of first appearance.
+    """
+    merged = {}
+    for entry in entries:
+        op, row = entry['op'], entry['row']
+        key = normalize_id(row.get('id'))
+        previous = merged.get(key)
+        if previous is not None and op == 'update' and previous[0] == 'create':
+            op = 'create'
+        merged[key] = (op, row)
+    return list(merged.values())
+
+
+class WriteBehindQueue:
+    """Durable journal of pending sheet mutations flushed in batches."""
+
+    def __init__(self, service, journal_file, flush_interval=5, max_batch_size=500):
+        """
+        Initialize the queue.
+
+        Args:
+            service: The GoogleSheetsService whose sheet receives the writes.
+            journal_file: Path of the append-only journal file.
+            flush_interval: Seconds between background flushes.
+            max_batch_size: Maximum coalesced mutations sent per batch.
+        """
+        self.service = service
+        self.journal_file = str(journal_file)
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._flushing_file = self.journal_file + '.flushing'
+        self._flushed_file = self.journal_file + '.flushed'
+        self._lock_file = self.journal_file + '.lock'
+        self._flush_lock_file = self.journal_file + '.flush.lock'
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _ensure_started(self):
+        """Start the background flusher on first use."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name='sheets-write-behind', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        """Flush periodically until stopped."""
+        set_priority(BATCH)
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Write-behind flush failed, retrying next interval')
+
+    def stop(self):
+        """Stop the flusher and synchronously flush what is left."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 30)
+        self.flush()
+
+    def enqueue(self, op, rows):
+        """
+        Record mutations in the journal.
+
+        Args:
+            op: 'create', 'update' or 'delete'.
+            rows: Row dictionaries (only 'id' is needed for deletes).
+        """
+        lines = ''.join(json.dumps({'op': op, 'row': row}) + '\n' for row in rows)
+        with self._lock:
+            self._ensure_started()
+            with file_lock(self._lock_file):
+                with open(self.journal_file, 'a') as journal:
+                    journal.write(lines)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+            self._pending += len(rows)
+            if self._pending >= self.max_batch_size:
+                self._wake.set()
+
+    def _read(self, path):
+        """Read journal entries from a file, ignoring a torn last line."""
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path) as journal:
+            for line in journal:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+        return entries
+
+    def pending(self):
+        """
+        Get the coalesced mutations that a sheet read may not reflect yet.
+
+        This includes the most recently flushed batch, since a read that
+        started before that flush finished would miss it. Re-applying an
+        already written mutation is harmless.
+
+        Returns:
+            list: (op, row) pairs.
+        """
+        with file_lock(self._lock_file):
+            entries = (
+                self._read(self._flushed_file)
+                + self._read(self._flushing_file)
+                + self._read(self.journal_file)
+            )
+        return coalesce(entries)
+
+    def apply_pending(self, records):
+        """
+        Re-apply unflushed mutations to records freshly read from the sheet.
+
+        Patching the records before they are loaded into the snapshot means
+        listeners never see pending rows briefly disappear.
+
+        Args:
+            records: Row dictionaries read from the sheet.
+
+        Returns:
+            list: The records with pending mutations applied.
+        """
+        pending = self.pending()
+        if not pending:
+            return records
+        changes = {normalize_id(row.get('id')): (op, row) for op, row in pending}
+        patched = []
+        for record in records:
+            change = changes.pop(normalize_id(record.get('id')), None)
+            if change is None:
+                patched.append(record)
+            elif change[0] != 'delete':
+                patched.append(change[1])
+        # Creates not in the sheet yet go at the end, where they'll be appended
+        patched.extend(row for op, row in changes.values() if op == 'create')
+        return patched
+
+    def _take(self):
+        """Move the journal into the in-flight file and return all in-flight entries."""
+        with file_lock(self._lock_file):
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file) as journal:
+                    text = journal.read()
+                if text:
+                    with open(self._flushing_file, 'a') as flushing:
+                        flushing.write(text)
+                        flushing.flush()
+                        os.fsync(flushing.fileno())
+                    open(self.journal_file, 'w').close()
+            entries = self._read(self._flushing_file)
+        with self._lock:
+            self._pending = 0
+        return entries
+
+    def flush(self):
+        """
+        Write all journaled mutations to the sheet.
+
+        Only one process flushes at a time; others skip the round. A flush
+        that fails leaves its entries in the in-flight file to be retried.
+
+        Returns:
+            int: Number of coalesced mutations written.
+        """
+        with file_lock(self._flush_lock_file, blocking=False) as acquired:
+            if not acquired:
+                return 0
+            mutations = coalesce(self._take())
+            for start in range(0, len(mutations), self.max_batch_size):
+                self._write_batch(mutations[start:start + self.max_batch_size])
+            with file_lock(self._lock_file):
+                if os.path.exists(self._flushing_file):
+                    os.replace(self._flushing_file, self._flushed_file)
+                elif os.path.exists(self._flushed_file):
+                    # An idle interval has passed, no read can still miss it
+                    os.remove(self._flushed_file)
+            return len(mutations)
+
+    def _write_batch(self, mutations):
+        """
+        Send one batch of coalesced mutations to the sheet.
+
+        Row positions are resolved from one read of the id column, which
+        also makes replaying a partially flushed batch idempotent: creates
+        of rows already present become updates, and updates or deletes of
+        missing rows are skipped.
+
+        Args:
+            mutations: (op, row) pairs.
+        """
+        column = self.service._with_sheet(
+            'read', 'col_values', lambda sheet: sheet.col_values(1)
+        )
+        sheet_ids = [normalize_id(v) for v in column[1:]]
+        positions = {}
+        for idx, row_id in enumerate(sheet_ids):
+            positions.setdefault(row_id, idx + 2)  # +2 for header row and 0-indexing
+
+        deletes = set()
+        updates = []
+        creates = []
+        for op, row in mutations:
+            key = normalize_id(row.get('id'))
+            if op == 'delete':
+                if key in positions:
+                    deletes.add(positions[key])
+            elif key in positions:
+                updates.append((key, row))
+            elif op == 'create':
+                creates.append(row)
+
+        if deletes:
+            self.service._write_deletes(deletes)
+            # Later rows shift up by one for every deleted row above them
+            positions = {}
+            remaining = [
+                row_id for idx, row_id in enumerate(sheet_ids) if idx + 2 not in deletes
+            ]
+            for idx, row_id in enumerate(remaining):
+                positions.setdefault(row_id, idx + 2)
+        if updates:
+            self.service._write_updates([(positions[key], row) for key, row in updates])
+        if creates:
+            self.service._write_appends(creates)